@@ -0,0 +1,126 @@
+"""Benchmark: per-line C highlighting cost, old multi-pass regex sweeps vs. CLexer.
+
+"before" is the old CHighlighter.highlightBlock logic (seven finditer passes
+per line, arg_id_pattern recompiled per call, then the /* */ scan), producing
+spans instead of Qt formats. "after" is lexers.CLexer.
+
+Run from the repository root:
+
+    python benchmarks/bench_c_highlight.py
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexers import C_KEYWORDS, C_TYPES, CLexer  # noqa: E402
+
+LINES = 50_000
+
+SAMPLE_LINES = [
+    '#include <stdio.h>',
+    '#define MAX(a, b) ((a) > (b) ? (a) : (b))',
+    'static unsigned long counter = 0x10;',
+    'int compute(int argc, char *argv[], double scale) {',
+    '    printf("value %d of %s\\n", compute_value(x, y), name);',
+    '    for (int i = 0; i < count; i++) { total += items[i] * 2.5; }',
+    '    /* a block comment that runs',
+    '       over two lines */ result = helper(a, b, c);',
+    '    return foo(a, b) + bar(c); // trailing comment with int and for',
+    '    char *s = "a string with /* no comment */ inside";',
+    '}',
+    '',
+]
+
+
+class LegacyCLexer:
+    """The old CHighlighter passes, returning (start, length, kind) spans."""
+
+    def __init__(self):
+        self.directive_pattern = re.compile(r'^\s*#\s*\w+.*', re.MULTILINE)
+        self.single_comment_pattern = re.compile(r'//[^\n]*')
+        self.string_pattern = re.compile(r'"[^"\\]*(\\.[^"\\]*)*"')
+        self.number_pattern = re.compile(r'\b\d+(\.\d+)?\b')
+        self.keyword_pattern = re.compile(r'\b(' + "|".join(sorted(C_KEYWORDS, key=len, reverse=True)) + r')\b')
+        self.type_pattern = re.compile(r'\b(' + "|".join(sorted(C_TYPES, key=len, reverse=True)) + r')\b')
+        self.function_call_pattern = re.compile(r'\b([A-Za-z_]\w*)\s*\(')
+
+    def lex_line(self, text, state):
+        spans = []
+        for pattern, kind in ((self.directive_pattern, "directive"),
+                              (self.single_comment_pattern, "comment"),
+                              (self.string_pattern, "string"),
+                              (self.number_pattern, "number")):
+            for match in pattern.finditer(text):
+                start, end = match.span()
+                spans.append((start, end - start, kind))
+        for pattern, kind in ((self.keyword_pattern, "keyword"), (self.type_pattern, "type")):
+            for match in pattern.finditer(text):
+                start, end = match.span(1)
+                spans.append((start, end - start, kind))
+        for match in self.function_call_pattern.finditer(text):
+            name_start, name_end = match.span(1)
+            spans.append((name_start, name_end - name_start, "function"))
+            paren_start = match.end() - 1
+            end_paren_index = text.find(')', paren_start)
+            if end_paren_index != -1:
+                arg_text = text[paren_start + 1:end_paren_index]
+                arg_id_pattern = re.compile(r'\b[A-Za-z_]\w*\b')
+                for arg_match in arg_id_pattern.finditer(arg_text):
+                    spans.append((paren_start + 1 + arg_match.start(),
+                                  arg_match.end() - arg_match.start(), "argument"))
+
+        in_comment = state == 1
+        start_idx = 0
+        if in_comment:
+            close_idx = text.find("*/")
+            if close_idx == -1:
+                spans.append((0, len(text), "comment"))
+                return spans, 1
+            spans.append((0, close_idx + 2, "comment"))
+            start_idx = close_idx + 2
+        while True:
+            open_idx = text.find("/*", start_idx)
+            if open_idx == -1:
+                return spans, 0
+            close_idx = text.find("*/", open_idx + 2)
+            if close_idx == -1:
+                spans.append((open_idx, len(text) - open_idx, "comment"))
+                return spans, 1
+            spans.append((open_idx, close_idx + 2 - open_idx, "comment"))
+            start_idx = close_idx + 2
+
+
+def run(lexer, lines):
+    state = 0
+    lex_line = lexer.lex_line
+    for line in lines:
+        _, state = lex_line(line, state)
+
+
+def best_of(lexer, lines, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(lexer, lines)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    random.seed(0)
+    lines = [random.choice(SAMPLE_LINES) for _ in range(LINES)]
+    before = best_of(LegacyCLexer(), lines)
+    after = best_of(CLexer(), lines)
+    print(f"{LINES} lines")
+    print(f"before: {before * 1e6 / LINES:8.2f} us/line  ({before:.3f} s)")
+    print(f"after:  {after * 1e6 / LINES:8.2f} us/line  ({after:.3f} s)")
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark: Python highlighting time vs. number and size of triple-quoted strings.
+
+"before" is the old whole-document algorithm from PythonHighlighter (tokenize
+the document, then split every multiline token with ``doc_text.splitlines()``
+per line). "after" builds one LineIndex for the snapshot and runs the line
+lexer over it with lex_document.
+
+Run from the repository root:
+
+    python benchmarks/bench_python_highlight.py
+"""
+import io
+import os
+import sys
+import time
+import tokenize
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexers import LineIndex, PythonLexer, lex_document  # noqa: E402
+
+CASES = [
+    # (number of triple-quoted strings, lines per string)
+    (10, 10),
+    (10, 100),
+    (100, 10),
+    (100, 50),
+    (300, 50),
+]
+
+
+def make_document(count, size):
+    parts = []
+    for n in range(count):
+        body = "\n".join(f"    docstring line {i} of function {n}" for i in range(size))
+        parts.append(f'def func_{n}(a, b):\n    """\n{body}\n    """\n    return a + b\n')
+    return "\n".join(parts)
+
+
+def legacy_highlight(doc_text):
+    """The old PythonHighlighter._parse_and_format_entire_doc, minus Qt formats
+    and the call-colouring pass (which does not touch the line splitting)."""
+    results = {}
+    tokens_list = list(tokenize.generate_tokens(io.StringIO(doc_text).readline))
+    for ttype, tstring, start, end, _ in tokens_list:
+        start_line, start_col = start
+        end_line, end_col = end
+        fmt = ttype
+        for line_no in range(start_line - 1, end_line):
+            if line_no not in results:
+                results[line_no] = []
+            if start_line != end_line:
+                if line_no == (start_line - 1):
+                    length = len(doc_text.splitlines()[line_no]) - start_col
+                    results[line_no].append((start_col, length, fmt))
+                elif line_no == (end_line - 1):
+                    results[line_no].append((0, end_col, fmt))
+                else:
+                    line_len = len(doc_text.splitlines()[line_no])
+                    results[line_no].append((0, line_len, fmt))
+            else:
+                results[line_no].append((start_col, end_col - start_col, fmt))
+    return results
+
+
+def incremental_highlight(doc_text):
+    return lex_document(PythonLexer(), LineIndex(doc_text))
+
+
+def best_of(func, arg, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(arg)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print(f"{'strings':>8} {'lines/str':>10} {'doc lines':>10} {'before (s)':>12} {'after (s)':>12} {'speedup':>9}")
+    for count, size in CASES:
+        doc_text = make_document(count, size)
+        before = best_of(legacy_highlight, doc_text)
+        after = best_of(incremental_highlight, doc_text)
+        lines = doc_text.count("\n") + 1
+        print(f"{count:>8} {size:>10} {lines:>10} {before:>12.4f} {after:>12.4f} {before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark: terminal throughput for a process that prints as fast as it can.
+
+"before" is the old terminal's output path, reproduced here: a /bin/sh -c
+QProcess per command, every chunk inserted as it is read, all output kept.
+"after" is a TerminalWidget: the command goes to its shell session, output is
+collected and written to the session's log on disk once per
+OUTPUT_FLUSH_INTERVAL_MS, and the view reads back only the lines on screen,
+so all output is kept. Each case runs a Python child printing N lines, flushing every line like a
+chatty build or test runner, and reports the lines rendered per second, from
+sending the command until its last line is in, the longest the event loop was
+stuck in one go (what a user would feel as a freeze), and how many lines the
+view holds at the end. POSIX only (the old path ran /bin/sh).
+
+Run from the repository root (no display needed):
+
+    python benchmarks/bench_terminal_output.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication, QPlainTextEdit  # noqa: E402
+from PySide6.QtCore import QProcess, Signal  # noqa: E402
+from PySide6.QtGui import QTextCursor  # noqa: E402
+from terminal import TerminalWidget  # noqa: E402
+
+LINE_COUNTS = [10_000, 50_000, 200_000]
+DONE_MARKER = "benchmark-command-done"
+
+
+class LegacyTerminal(QPlainTextEdit):
+    """The old terminal output path: a process per command, one insert per read, unbounded scrollback."""
+    output = Signal(bytes)  # each read, for run()
+
+    def __init__(self):
+        super().__init__()
+        self.setReadOnly(True)
+        self.process = QProcess(self)
+        self.process.setProcessChannelMode(QProcess.MergedChannels)
+        self.process.readyReadStandardOutput.connect(self.on_read_output)
+
+    def execute_command(self, command):
+        self.moveCursor(QTextCursor.End)
+        self.insertPlainText("> " + command + "\n")
+        self.process.start("/bin/sh", ["-c", command])
+
+    def on_read_output(self):
+        raw = self.process.readAllStandardOutput().data()
+        self.output.emit(raw)
+        self.moveCursor(QTextCursor.End)
+        self.insertPlainText(raw.decode(errors='replace'))
+
+
+def chatty_command(lines):
+    script = (f"for i in range({lines}): print(f'output line {{i}} of some chatty process', flush=True)\n"
+              f"print('{DONE_MARKER}')")
+    return f'"{sys.executable}" -c "{script}"'
+
+
+def run(app, terminal, view, output_signal, lines):
+    """Time one command; output_signal carries the raw output, to spot the marker without reading the view."""
+    done = []
+    tail = [b""]
+
+    def watch(data):
+        text = tail[0] + bytes(data)
+        if DONE_MARKER.encode() in text:
+            done.append(True)
+        tail[0] = text[-len(DONE_MARKER):]
+    output_signal.connect(watch)
+    terminal.show()
+    started = time.perf_counter()
+    terminal.execute_command(chatty_command(lines))
+    worst_stall = 0.0
+    while not done:
+        before = time.perf_counter()
+        app.processEvents()
+        worst_stall = max(worst_stall, time.perf_counter() - before)
+    if hasattr(terminal, "_flush_output"):
+        terminal._flush_output()  # what the flush timer would append next
+    app.processEvents()
+    elapsed = time.perf_counter() - started
+    kept = view.log.line_count() if hasattr(view, "log") else view.document().blockCount()
+    terminal.close()
+    return elapsed, worst_stall, kept
+
+
+def main():
+    app = QApplication.instance() or QApplication([])
+    print(f"{'lines':>8} | {'before lines/s':>14} {'stall ms':>9} {'kept':>8} | "
+          f"{'after lines/s':>14} {'stall ms':>9} {'kept':>8}")
+    for lines in LINE_COUNTS:
+        legacy = LegacyTerminal()
+        before, before_stall, before_kept = run(app, legacy, legacy, legacy.output, lines)
+        terminal = TerminalWidget()
+        # Time the commands, not starting the shell (once per terminal, not per command)
+        run(app, terminal, terminal.output_view, terminal.session.output, 0)
+        terminal.log.clear()
+        terminal.output_view.reset()
+        after, after_stall, after_kept = run(app, terminal, terminal.output_view, terminal.session.output, lines)
+        terminal.close_session()
+        terminal.close_log()
+        print(f"{lines:>8} | {lines / before:>14.0f} {before_stall * 1000:>9.1f} {before_kept:>8} | "
+              f"{lines / after:>14.0f} {after_stall * 1000:>9.1f} {after_kept:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Builds and runs a C program for the Run action, compiling only what changed.
+
+Run in the terminal as
+
+    python buildcache.py main.c [program arguments...]
+
+The program is main.c plus every other .c file in its directory that doesn't
+define main() itself. Each source compiles to an object file in BUILD_DIR
+named after a hash of everything that goes into it: the source, the project
+headers it includes (followed through other headers, found next to the
+including file or in a -I directory), the compiler and the flags. The
+program is named after the hash of its objects and the link flags. So an
+unchanged program runs straight away, and after an edit only the objects
+that depend on the edited file are compiled again, in parallel on all cores.
+The compiler's messages are printed as they come, so the terminal's Problems
+matcher picks them up.
+
+The compiler and flags come from CC, CPPFLAGS, CFLAGS, LDFLAGS and LDLIBS,
+as with make. System headers (#include <...> not found in a -I directory)
+aren't hashed; a compiler upgrade is noticed through the compiler's binary.
+
+This module runs as a script in its own process, so it must not import Qt.
+"""
+import os
+import re
+import sys
+import time
+import shlex
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+BUILD_DIR = os.path.join(os.path.expanduser("~"), ".ide_build")
+PROGRAM_SUFFIX = ".exe" if os.name == "nt" else ""
+# Builds of a source (or program) kept, most recently used first. More than one,
+# so programs sharing a source with different flags don't keep evicting each other
+KEEP_VERSIONS = 4
+
+_INCLUDE = re.compile(rb'^[ \t]*#[ \t]*include[ \t]*([<"])([^">\n]+)[">]', re.MULTILINE)
+_DEFINES_MAIN = re.compile(rb'^[ \t]*(?:int|void)[ \t\r\n]+main[ \t\r\n]*\(', re.MULTILINE)
+
+
+def project_sources(main_source):
+    """main_source and the other .c files of its directory that don't define main() themselves."""
+    directory = os.path.dirname(main_source)
+    sources = [main_source]
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.lower().endswith('.c') or path == main_source or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            if not _DEFINES_MAIN.search(f.read()):
+                sources.append(path)
+    return sources
+
+
+def _include_dirs(flags):
+    """The -I directories in a list of compiler flags."""
+    dirs = []
+    for i, flag in enumerate(flags):
+        if flag == '-I' and i + 1 < len(flags):
+            dirs.append(flags[i + 1])
+        elif flag.startswith('-I') and len(flag) > 2:
+            dirs.append(flag[2:])
+    return [os.path.abspath(path) for path in dirs]
+
+
+class BuildCache:
+    """Hashes of sources and headers for one build, each file read once."""
+    def __init__(self, compiler, cppflags, cflags, ldflags, ldlibs):
+        self.compiler = compiler
+        self.cppflags = cppflags
+        self.cflags = cflags
+        self.ldflags = ldflags
+        self.ldlibs = ldlibs
+        self.include_dirs = _include_dirs(cppflags + cflags)
+        self._digests = {}   # path: digest of its contents
+        self._includes = {}  # path: project headers it includes directly
+        stat = os.stat(compiler)
+        # What the compiler does to a source, besides the source itself
+        settings = [compiler, str(stat.st_size), str(stat.st_mtime_ns)] + cppflags + ['--'] + cflags
+        self.settings_digest = hashlib.blake2b('\0'.join(settings).encode('utf-8')).hexdigest()
+
+    def file_digest(self, path):
+        if path not in self._digests:
+            with open(path, 'rb') as f:
+                data = f.read()
+            self._digests[path] = hashlib.blake2b(data).hexdigest()
+            self._includes[path] = self._resolve_includes(path, data)
+        return self._digests[path]
+
+    def _resolve_includes(self, path, data):
+        headers = []
+        for quote, name in _INCLUDE.findall(data):
+            name = os.fsdecode(name)
+            # "..." is looked up next to the including file first, <...> only in -I directories
+            candidates = ([os.path.dirname(path)] if quote == b'"' else []) + self.include_dirs
+            for directory in candidates:
+                header = os.path.normpath(os.path.join(directory, name))
+                if os.path.isfile(header):
+                    headers.append(header)
+                    break
+        return headers
+
+    def object_key(self, source):
+        """Hash of what goes into source's object file: its text, its headers', compiler and flags."""
+        digest = hashlib.blake2b(self.settings_digest.encode('ascii'))
+        digest.update(source.encode('utf-8', errors='surrogateescape'))
+        seen = set()
+        pending = [source]
+        while pending:
+            path = pending.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            self.file_digest(path)
+            pending.extend(self._includes[path])
+        for path in sorted(seen):
+            digest.update(f"\0{path}\0{self._digests[path]}".encode('utf-8', errors='surrogateescape'))
+        return digest.hexdigest()[:32]
+
+    def program_key(self, object_paths):
+        parts = object_paths + ['--'] + self.ldflags + ['--'] + self.ldlibs
+        return hashlib.blake2b('\0'.join(parts).encode('utf-8', errors='surrogateescape')).hexdigest()[:32]
+
+    def compile(self, source, object_path):
+        """Compile source to object_path; (exit code, compiler output)."""
+        fd, temp_path = tempfile.mkstemp(suffix='.o', dir=os.path.dirname(object_path))
+        os.close(fd)
+        try:
+            result = subprocess.run([self.compiler] + self.cppflags + self.cflags + ['-c', source, '-o', temp_path],
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            if result.returncode == 0:
+                os.replace(temp_path, object_path)  # whole or not at all, even if a second build races us
+            return result.returncode, result.stdout
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def link(self, object_paths, program_path):
+        fd, temp_path = tempfile.mkstemp(suffix=PROGRAM_SUFFIX, dir=os.path.dirname(program_path))
+        os.close(fd)
+        try:
+            result = subprocess.run([self.compiler] + self.cflags + self.ldflags + object_paths +
+                                    ['-o', temp_path] + self.ldlibs,
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            if result.returncode == 0:
+                os.replace(temp_path, program_path)
+            return result.returncode, result.stdout
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def _prune(directory, prefix, suffix=''):
+    """Remove all but the KEEP_VERSIONS most recently used files named prefix*suffix in directory."""
+    versions = []
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(suffix) and '-' not in name[len(prefix):-len(suffix) or None]:
+            path = os.path.join(directory, name)
+            try:
+                versions.append((os.stat(path).st_mtime_ns, path))
+            except OSError:
+                pass
+    versions.sort(reverse=True)
+    for _, path in versions[KEEP_VERSIONS:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # e.g. a program still running on Windows
+
+
+def _touch(paths):
+    """Mark cached files as used now, for _prune()."""
+    for path in paths:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+
+def build(main_source, cache):
+    """Build main_source's program if needed; (path of the program, or None on failure, message)."""
+    started = time.perf_counter()
+    main_source = os.path.abspath(main_source)
+    directory = os.path.dirname(main_source)
+    # One cache directory per source directory
+    cache_dir = os.path.join(BUILD_DIR, hashlib.blake2b(directory.encode('utf-8', errors='surrogateescape'),
+                                                        digest_size=8).hexdigest())
+    object_dir = os.path.join(cache_dir, 'obj')
+    program_dir = os.path.join(cache_dir, 'bin')
+    os.makedirs(object_dir, exist_ok=True)
+    os.makedirs(program_dir, exist_ok=True)
+
+    sources = project_sources(main_source)
+    stems = [os.path.splitext(os.path.basename(source))[0] for source in sources]
+    object_paths = [os.path.join(object_dir, f"{stem}-{cache.object_key(source)}.o")
+                    for stem, source in zip(stems, sources)]
+    program_name = stems[0]
+    program_path = os.path.join(program_dir, f"{program_name}-{cache.program_key(object_paths)}{PROGRAM_SUFFIX}")
+    if os.path.exists(program_path):
+        _touch(object_paths + [program_path])
+        return program_path, f"{program_name} is up to date"
+
+    stale = [(source, path) for source, path in zip(sources, object_paths) if not os.path.exists(path)]
+    if stale:
+        print(f"Compiling {', '.join(os.path.basename(source) for source, _ in stale)}", flush=True)
+        failed = False
+        with ThreadPoolExecutor(max_workers=min(len(stale), os.cpu_count() or 1)) as executor:
+            # In source order, so messages don't come out in a different order each time
+            for code, output in executor.map(lambda job: cache.compile(*job), stale):
+                if output:
+                    sys.stdout.buffer.write(output)
+                    sys.stdout.flush()
+                failed = failed or code != 0
+        if failed:
+            return None, "Compilation failed"
+
+    code, output = cache.link(object_paths, program_path)
+    if output:
+        sys.stdout.buffer.write(output)
+        sys.stdout.flush()
+    if code != 0:
+        return None, "Linking failed"
+    _touch(object_paths)
+    for stem in stems:
+        _prune(object_dir, f"{stem}-", '.o')
+    _prune(program_dir, f"{program_name}-", PROGRAM_SUFFIX)
+    return program_path, (f"Built {program_name}: compiled {len(stale)} of {len(sources)} files "
+                          f"in {time.perf_counter() - started:.2f} s")
+
+
+def main(argv):
+    if not argv:
+        print("usage: buildcache.py main.c [program arguments...]", file=sys.stderr)
+        return 2
+    compiler = shutil.which(os.environ.get("CC") or "gcc")
+    if compiler is None:
+        print(f"Compiler not found: {os.environ.get('CC') or 'gcc'}", file=sys.stderr)
+        return 127
+    cache = BuildCache(compiler, *(shlex.split(os.environ.get(name, ""))
+                                   for name in ("CPPFLAGS", "CFLAGS", "LDFLAGS", "LDLIBS")))
+    try:
+        program, message = build(argv[0], cache)
+    except OSError as e:
+        print(f"Build failed: {e}", file=sys.stderr)
+        return 1
+    print(f"[{message}]", file=sys.stderr, flush=True)
+    if program is None:
+        return 1
+    if os.name == "nt":
+        return subprocess.call([program] + argv[1:])
+    # Become the program, so it has the terminal to itself (input, Ctrl+C, exit code)
+    os.execv(program, [program] + argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
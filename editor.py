@@ -1,16 +1,491 @@
-from PySide6.QtWidgets import QTabWidget, QPlainTextEdit, QMenu, QApplication
+from PySide6.QtWidgets import QTabWidget, QPlainTextEdit, QMenu, QApplication, QMessageBox
 from PySide6.QtGui import QTextCursor, QSyntaxHighlighter, QTextCharFormat, QColor, QFont
-from PySide6.QtCore import Qt, QPoint
+from PySide6.QtCore import Qt, QPoint, QTimer, QObject, QRunnable, QThreadPool, QFileSystemWatcher, Signal
 import os
-import re
-import tokenize
 import io
+import time
+import codecs
+import difflib
+import hashlib
+import tempfile
+import struct
+import itertools
+import threading
+from lexers import PythonLexer, CLexer, LexCache, LineIndex, lex_document
+from largefile import PagedFileView, LargeFileView, LARGE_FILE_BYTES
+from hexviewer import HexView
+from filesniff import looks_binary, BINARY_SNIFF_BYTES
+from journal import EditJournal, list_journals, replay
+
+class _HighlightJobSignals(QObject):
+    finished = Signal(int, int, int, object)  # revision, first line, entry state, [(spans, state), ...]
+
+class _HighlightJob(QRunnable):
+    """Lexes a snapshot of a document on a QThreadPool thread."""
+    def __init__(self, lexer, cache, text, revision, first_line, entry_state, signals):
+        super().__init__()
+        self.lexer = lexer
+        self.cache = cache
+        self.text = text
+        self.revision = revision
+        self.first_line = first_line
+        self.entry_state = entry_state
+        self.signals = signals
+
+    def run(self):
+        index = LineIndex(self.text, self.revision)
+        results = lex_document(self.lexer, index, self.first_line, self.entry_state, self.cache)
+        try:
+            self.signals.finished.emit(self.revision, self.first_line, self.entry_state, results)
+        except RuntimeError:
+            pass  # the highlighter was deleted while we were lexing
+
+class _FileLoadSignals(QObject):
+    chunk_loaded = Signal(str, int)  # decoded text, bytes read so far
+    finished = Signal(str, object)   # error message (empty on success), (size, mtime_ns, digest) of what was read
+    binary = Signal()                # the file isn't text; nothing was loaded, finished isn't emitted
+
+class _FileLoadJob(QRunnable):
+    """Reads and decodes a file on a QThreadPool thread, handing it over in chunks.
+
+    The first chunk is sniffed before anything is decoded; a binary file is
+    reported with the binary signal instead, for the tab to become a hex view.
+    """
+    CHUNK_BYTES = 1024 * 1024
+
+    def __init__(self, file_path, cancelled, signals):
+        super().__init__()
+        self.file_path = file_path
+        self.cancelled = cancelled  # threading.Event set by EditorTabs
+        self.signals = signals
+
+    def run(self):
+        # Same decoding as open(..., 'r', encoding='utf-8'): strict UTF-8, universal newlines
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+        # Hashed on the way, so changes on disk can be told from a mere touch later
+        digest = hashlib.blake2b()
+        disk_state = None
+        try:
+            with open(self.file_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                while not self.cancelled.is_set():
+                    data = f.read(self.CHUNK_BYTES)
+                    if f.tell() == len(data) and looks_binary(data[:BINARY_SNIFF_BYTES]):  # the first chunk
+                        self.signals.binary.emit()
+                        return
+                    digest.update(data)
+                    text = decoder.decode(data, final=not data)
+                    if text:
+                        self.signals.chunk_loaded.emit(text, f.tell())
+                    if not data:
+                        disk_state = (stat.st_size, stat.st_mtime_ns, digest.digest())
+                        _FileSaveJob.remember(self.file_path, disk_state)
+                        break
+            self.signals.finished.emit("", disk_state)
+        except (OSError, UnicodeDecodeError) as e:
+            try:
+                self.signals.finished.emit(str(e), None)
+            except RuntimeError:
+                pass
+        except RuntimeError:
+            pass  # the tab was closed while we were reading
+
+class _FileSaveSignals(QObject):
+    finished = Signal(str, int, bool, float, str)  # path, text revision, written, seconds, error
+
+class _FileSaveJob(QRunnable):
+    """Writes a file on a QThreadPool thread: temp file, fsync, then rename over the original.
+
+    A crash halfway leaves either the old file or the new one, never a truncated
+    mix. If the file on disk already holds exactly these bytes nothing is written.
+    """
+    # path -> (size, mtime_ns, digest) of what we last saw on disk, so an
+    # unchanged file doesn't have to be re-read to be compared
+    disk_digests = {}
+    disk_digests_lock = threading.Lock()
+
+    def __init__(self, file_path, text, revision, signals):
+        super().__init__()
+        self.file_path = file_path
+        self.text = text
+        self.revision = revision
+        self.signals = signals
+
+    def run(self):
+        start = time.perf_counter()
+        written = False
+        error = ""
+        try:
+            # What open(..., 'w', encoding='utf-8') would have written
+            data = self.text.replace('\n', os.linesep).encode('utf-8') if os.linesep != '\n' \
+                else self.text.encode('utf-8')
+            digest = hashlib.blake2b(data).digest()
+            if digest != self._disk_digest():
+                self._write(data)
+                written = True
+            self._remember(digest)
+        except (OSError, UnicodeError) as e:
+            error = str(e)
+        try:
+            self.signals.finished.emit(self.file_path, self.revision, written,
+                                       time.perf_counter() - start, error)
+        except RuntimeError:
+            pass  # the tabs went away while we were saving
+
+    def _disk_digest(self):
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        with self.disk_digests_lock:
+            known = self.disk_digests.get(self.file_path)
+        if known and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return known[2]
+        digest = hashlib.blake2b()
+        with open(self.file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.digest()
+
+    def _write(self, data):
+        directory, name = os.path.split(os.path.abspath(self.file_path))
+        fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.chmod(temp_path, os.stat(self.file_path).st_mode & 0o7777)
+            except FileNotFoundError:
+                pass
+            os.replace(temp_path, self.file_path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        if hasattr(os, 'O_DIRECTORY'):
+            # Make the rename itself durable
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _remember(self, digest):
+        stat = os.stat(self.file_path)
+        self.remember(self.file_path, (stat.st_size, stat.st_mtime_ns, digest))
+
+    @classmethod
+    def remember(cls, file_path, disk_state):
+        """Record (size, mtime_ns, digest) of what is on disk at file_path."""
+        with cls.disk_digests_lock:
+            cls.disk_digests[file_path] = disk_state
+
+class _DiskCheckSignals(QObject):
+    finished = Signal(object)  # [(path, disk state or None if gone, new text or None, error), ...]
+
+class _DiskCheckJob(QRunnable):
+    """Looks at open files the watcher flagged, on a QThreadPool thread.
+
+    A file whose size and mtime still match what the buffer was loaded from or
+    saved as isn't read at all; one that only got touched is read and hashed but
+    reported without text, so only real changes reach the buffers.
+    """
+    def __init__(self, checks, signals):
+        super().__init__()
+        self.checks = checks  # [(path, (size, mtime_ns, digest or None)), ...]
+        self.signals = signals
+
+    def run(self):
+        results = []
+        for file_path, (size, mtime_ns, digest) in self.checks:
+            try:
+                stat = os.stat(file_path)
+                if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns):
+                    continue
+                with open(file_path, 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    data = f.read()
+                disk_state = (stat.st_size, stat.st_mtime_ns, hashlib.blake2b(data).digest())
+                _FileSaveJob.remember(file_path, disk_state)
+                if disk_state[2] == digest:
+                    results.append((file_path, disk_state, None, ""))
+                    continue
+                # Decoded like _FileLoadJob: strict UTF-8, universal newlines
+                text = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+                results.append((file_path, disk_state, text, ""))
+            except FileNotFoundError:
+                results.append((file_path, None, None, ""))
+            except (OSError, UnicodeDecodeError) as e:
+                results.append((file_path, None, None, str(e)))
+        try:
+            self.signals.finished.emit(results)
+        except RuntimeError:
+            pass
+
+class _JournalCompactSignals(QObject):
+    finished = Signal(object, object)  # journal, temp file path (None if writing failed)
+
+class _JournalCompactJob(QRunnable):
+    """Writes the snapshot that replaces an edit journal, on a QThreadPool thread."""
+    def __init__(self, journal, text, signals):
+        super().__init__()
+        self.journal = journal
+        self.text = text
+        self.signals = signals
+
+    def run(self):
+        try:
+            temp_path = self.journal.write_compacted(self.text)
+        except OSError as e:
+            print(f"Error compacting edit journal: {e}")
+            temp_path = None
+        try:
+            self.signals.finished.emit(self.journal, temp_path)
+        except RuntimeError:
+            pass
 
-class PythonHighlighter(QSyntaxHighlighter):
-    def __init__(self, document):
+class LexerHighlighter(QSyntaxHighlighter):
+    """Base for highlighters that get their spans from a line lexer (see lexers.py).
+
+    Small documents are highlighted the usual QSyntaxHighlighter way. Documents of
+    BACKGROUND_MIN_BLOCKS blocks or more are painted lazily:
+
+    * a block keeps state -1 until it has been painted, and Qt is never allowed to
+      ripple from a painted block through the unpainted ones on the GUI thread;
+    * blocks in and near the viewport are painted first, everything else in
+      idle-time slices of at most SLICE_BUDGET seconds;
+    * an edit that changes a block's end state stops the ripple there and queues the
+      rest for the idle slices, while a worker thread lexes a snapshot of the document
+      tagged with our revision. Its results are dropped as soon as the document changes.
+
+    Lexer results go through one LexCache shared by every highlighter and worker, so
+    reopening a file or meeting familiar lines is mostly lookups. Even a stale worker
+    pass leaves its lines in the cache. Resize it with LexerHighlighter.cache.set_max_bytes().
+    """
+    BACKGROUND_MIN_BLOCKS = 2000
+    SLICE_BUDGET = 0.008   # seconds of GUI time per idle slice
+    VIEWPORT_MARGIN = 50   # blocks around the viewport that count as visible
+    cache = LexCache()
+
+    def __init__(self, document, lexer, editor=None):
         super().__init__(document)
+        self.lexer = lexer
+        self.editor = editor
         self._init_formats()
 
+        self._revision = 0
+        self._results = None    # (first line, entry state, results) for the current revision
+        self._repaint = []      # cursors on blocks where a repaint should start
+        self._deadline = None   # perf_counter() deadline while an idle slice runs
+        self._loading = False   # append_text() called, finish_load() not yet
+        self._job_running = False
+        self._job_first_line = None
+        self._job_signals = _HighlightJobSignals(self)
+        self._job_signals.finished.connect(self._on_job_finished)
+        self._job_timer = QTimer(self)
+        self._job_timer.setSingleShot(True)
+        self._job_timer.timeout.connect(self._start_job)
+        self._slice_timer = QTimer(self)
+        self._slice_timer.setSingleShot(True)
+        self._slice_timer.timeout.connect(self._paint_slice)
+        document.contentsChange.connect(self._on_contents_change)
+        if editor is not None:
+            editor.verticalScrollBar().valueChanged.connect(self._schedule_slice)
+        if self._lazy():
+            self._schedule_job(0)
+
+    def _init_formats(self):
+        self.formats = {'default': QTextCharFormat()}
+
+    def set_plain_text(self, text):
+        """Replace the document's text and highlight it.
+
+        Qt would otherwise run highlightBlock for every block of the new text before
+        the editor can paint, so the document's signals are blocked while the text
+        goes in. Large documents then get their viewport painted straight away and
+        the rest in idle slices; small ones are highlighted in one go.
+        """
+        document = self.document()
+        document.blockSignals(True)
+        try:
+            document.setPlainText(text)
+        finally:
+            document.blockSignals(False)
+        self.finish_load()
+
+    def append_text(self, text):
+        """Append text to the document without highlighting it, e.g. while a file streams in.
+
+        Call finish_load() once all of it is there.
+        """
+        self._loading = True
+        document = self.document()
+        cursor = QTextCursor(document)
+        cursor.movePosition(QTextCursor.End)
+        document.blockSignals(True)
+        try:
+            cursor.insertText(text)
+        finally:
+            document.blockSignals(False)
+
+    def finish_load(self):
+        """Start highlighting text that went in through set_plain_text() or append_text()."""
+        document = self.document()
+        self._loading = False
+        self._revision += 1
+        self._results = None
+        self._repaint = []
+        if self._lazy():
+            self._queue_repaint(document.firstBlock())
+            self._schedule_job(0)
+            self._paint_slice()
+        else:
+            self.rehighlight()
+
+    def highlightBlock(self, text):
+        block = self.currentBlock()
+        old_state = self.currentBlockState()
+        lazy = self._lazy()
+        if lazy and old_state < 0 and self._deadline is None:
+            # Not painted yet. Leave it to the idle slices rather than let Qt ripple
+            # through every unpainted block after it from here.
+            if not block.previous().isValid() or self.previousBlockState() >= 0:
+                self._queue_repaint(block)
+            return
+
+        result = self._worker_result(block) if self._deadline is not None else None
+        spans, state = result if result is not None else self.lex_block(block, text)
+        if lazy and state != old_state:
+            if self._deadline is not None:
+                if time.perf_counter() > self._deadline:
+                    # Out of time for this slice; the next one carries on from here
+                    self._queue_repaint(block)
+                    state = old_state
+            elif old_state >= 0:
+                # Don't ripple the new state through the rest of the document here;
+                # the idle slices (helped by the worker) take over from this block.
+                self._queue_repaint(block)
+                self._schedule_job(block.blockNumber())
+                state = old_state
+
+        self.setFormat(0, len(text), self.formats['default'])
+        for start, length, kind in spans:
+            self.setFormat(start, length, self.formats[kind])
+        self.setCurrentBlockState(state)
+
+    def lex_block(self, block, text):
+        """Lex one block on the GUI thread, starting from the previous block's state."""
+        return self.cache.lex_line(self.lexer, text, self.previousBlockState())
+
+    def _lazy(self):
+        return self.document().blockCount() >= self.BACKGROUND_MIN_BLOCKS
+
+    def _on_contents_change(self, position, chars_removed, chars_added):
+        if chars_removed or chars_added:
+            self._revision += 1
+            self._results = None
+
+    def _worker_result(self, block):
+        """The worker's spans and state for block, if they fit the block's entry state."""
+        if self._results is None:
+            return None
+        first_line, entry_state, results = self._results
+        index = block.blockNumber() - first_line
+        if not 0 <= index < len(results):
+            return None
+        expected = entry_state if index == 0 else results[index - 1][1]
+        initial = self.lexer.initial_state()
+        if max(expected, -1) == -1:
+            expected = initial
+        previous_state = self.previousBlockState()
+        if (previous_state if previous_state >= 0 else initial) != expected:
+            return None
+        return results[index]
+
+    def _queue_repaint(self, block):
+        block_number = block.blockNumber()
+        if not any(cursor.blockNumber() == block_number for cursor in self._repaint):
+            self._repaint.append(QTextCursor(block))
+        self._schedule_slice()
+
+    def _schedule_slice(self):
+        if not self._slice_timer.isActive():
+            self._slice_timer.start(0)
+
+    def _visible_blocks(self):
+        """Blocks in the editor's viewport, plus VIEWPORT_MARGIN on either side."""
+        if self.editor is None:
+            return
+        first = self.editor.firstVisibleBlock().blockNumber()
+        line_height = max(1, self.editor.fontMetrics().lineSpacing())
+        count = self.editor.viewport().height() // line_height + 2 * self.VIEWPORT_MARGIN
+        block = self.document().findBlockByNumber(max(0, first - self.VIEWPORT_MARGIN))
+        while block.isValid() and count > 0:
+            yield block
+            block = block.next()
+            count -= 1
+
+    def _paint_slice(self):
+        """Paint for at most SLICE_BUDGET seconds: the viewport first, then the queue."""
+        if self.document() is None or self._loading:
+            return
+        self._deadline = time.perf_counter() + self.SLICE_BUDGET
+        try:
+            for block in self._visible_blocks():
+                if time.perf_counter() > self._deadline:
+                    break
+                if block.userState() < 0:
+                    self.rehighlightBlock(block)  # Qt carries on while states keep changing
+            while self._repaint and time.perf_counter() < self._deadline:
+                cursor = min(self._repaint, key=QTextCursor.position)
+                self._repaint.remove(cursor)
+                self.rehighlightBlock(cursor.block())
+        finally:
+            self._deadline = None
+        if self._repaint:
+            self._slice_timer.start(0)
+        elif not self._job_running:
+            self._results = None  # all painted; let the worker output go
+
+    def _schedule_job(self, first_line):
+        if self._job_first_line is None or first_line < self._job_first_line:
+            self._job_first_line = first_line
+        if not self._job_running:
+            self._job_timer.start(0)
+
+    def _start_job(self):
+        document = self.document()
+        if document is None or self._job_first_line is None:
+            return
+        first_line = min(self._job_first_line, document.blockCount() - 1)
+        self._job_first_line = None
+        entry_state = document.findBlockByNumber(first_line).previous().userState()
+        self._job_running = True
+        job = _HighlightJob(self.lexer, self.cache, document.toPlainText(), self._revision,
+                            first_line, entry_state, self._job_signals)
+        QThreadPool.globalInstance().start(job)
+
+    def _on_job_finished(self, revision, first_line, entry_state, results):
+        self._job_running = False
+        if revision != self._revision:
+            # The document changed under the worker. Its lines are in the cache
+            # now, so another pass over the same region is cheap.
+            if self._repaint:
+                self._schedule_job(first_line)
+        elif self._repaint:
+            self._results = (first_line, entry_state, results)
+            self._schedule_slice()
+        if self._job_first_line is not None:
+            self._job_timer.start(0)
+
+class PythonHighlighter(LexerHighlighter):
+    def __init__(self, document, editor=None):
+        super().__init__(document, PythonLexer(), editor)
+
     def _init_formats(self):
         """Initialize QTextCharFormat objects for different token types."""
         self.formats = {}
@@ -40,157 +515,30 @@ class PythonHighlighter(QSyntaxHighlighter):
         default_format = QTextCharFormat()
         self.formats['default'] = default_format
 
-        # A minimal set of Python keywords (you can expand)
-        self.keywords = {
-            "False", "class", "finally", "is", "return", 
-            "None", "continue", "for", "lambda", "try",
-            "True", "def", "from", "nonlocal", "while",
-            "and", "del", "global", "not", "with",
-            "as", "elif", "if", "or", "yield",
-            "assert", "else", "import", "pass",
-            "break", "except", "in", "raise"
-        }
-
-        # Some builtins
-        self.builtins = {
-            "print", "range", "len", "dict", "list", "int", "float", 
-            "str", "bool", "set", "tuple", "input", "open"
-        }
-
-    def highlightBlock(self, text):
-        """Re-implemented from QSyntaxHighlighter. We highlight per line, 
-           but tokenize needs the entire document for context (multiline strings, etc.).
-        """
-        # We'll store line results in a buffer for later.
-        self.setFormat(0, len(text), self.formats['default'])
-
-        # We only highlight per line. But we need full doc to tokenize properly.
-        # So let's do: if we have a multi-line doc, we'll highlight everything once,
-        # storing results in an internal structure, and apply them line by line.
-        if self.currentBlock().blockNumber() == 0:
-            # This means we're at the first line, so let's do a full re-tokenize
-            self._all_formats = self._parse_and_format_entire_doc()
-
-        # Now apply any tokens that fall within this line’s range
-        block_num = self.currentBlock().blockNumber()
-        if block_num in self._all_formats:
-            for (start, length, fmt) in self._all_formats[block_num]:
-                self.setFormat(start, length, fmt)
-
-    def _parse_and_format_entire_doc(self):
-        doc_text = self.document().toPlainText()
-        results = {}  # line_index -> list of (start_col, length, QTextCharFormat)
-        
-        tokens_list = list(tokenize.generate_tokens(io.StringIO(doc_text).readline))
-        
-        # We'll do a single pass to assign each token a format initially
-        # as you do now:
-        basic_formats = []
-        for i, tok in enumerate(tokens_list):
-            ttype, tstring, start, end, _ = tok
-            start_line, start_col = start
-            end_line, end_col = end
-
-            fmt = self._choose_format(ttype, tstring)
-            
-            # We store the base info and also keep them in a list for the second pass
-            basic_formats.append((i, ttype, tstring, start_line, start_col, end_line, end_col, fmt))
-
-        # === SECOND PASS: detect function calls & arguments ===
-        i = 0
-        while i < len(basic_formats) - 1:
-            (idx, ttype, tstring, start_line, start_col,
-             end_line, end_col, fmt) = basic_formats[i]
-            
-            # If we see NAME followed by OP "(" => treat NAME as function
-            import token
-            if ttype == token.NAME and (i+1 < len(basic_formats)):
-                next_ttype = basic_formats[i+1][1]
-                next_tstring = basic_formats[i+1][2]
-                if next_ttype == token.OP and next_tstring == '(':
-                    # Mark this name as "function" color
-                    fmt = self.formats['builtin']  # or define self.formats['function_call'] separately
-                    # update the list record
-                    basic_formats[i] = (idx, ttype, tstring, start_line, start_col,
-                                        end_line, end_col, fmt)
-                    
-                    # Now we can optionally parse arguments up to the matching ")"
-                    # We'll skip real bracket matching for brevity, but let's do a naive approach:
-                    # track parentheses nesting
-                    paren_depth = 1
-                    j = i+2
-                    while j < len(basic_formats) and paren_depth > 0:
-                        j_tok = basic_formats[j]
-                        j_ttype = j_tok[1]
-                        j_tstring = j_tok[2]
-                        if j_ttype == token.OP and j_tstring == '(':
-                            paren_depth += 1
-                        elif j_ttype == token.OP and j_tstring == ')':
-                            paren_depth -= 1
-                        else:
-                            # If we want arguments in a special color, e.g. if it's a NAME
-                            if paren_depth == 1 and j_ttype == token.NAME:
-                                # color it as argument
-                                # We'll need to re-pack the record with a new format
-                                j_record = list(j_tok)
-                                j_record[-1] = self.formats['builtin']  # or self.formats['argument']
-                                basic_formats[j] = tuple(j_record)
-                        j += 1
-                    # i can jump to j-1 to skip scanning these tokens again
-                    i = j - 1
-            i += 1
-
-        # Now that we have final formats, let's break them into line-based segments
-        for (idx, ttype, tstring, start_line, start_col, end_line, end_col, fmt) in basic_formats:
-            # For each line from start_line to end_line, store highlight
-            for line_no in range(start_line-1, end_line):
-                if line_no not in results:
-                    results[line_no] = []
-                
-                if start_line != end_line:
-                    # multiline token
-                    # naive splitting code as you have now
-                    if line_no == (start_line-1):
-                        length = len(doc_text.splitlines()[line_no]) - start_col
-                        results[line_no].append((start_col, length, fmt))
-                    elif line_no == (end_line-1):
-                        length = end_col
-                        results[line_no].append((0, length, fmt))
-                    else:
-                        line_len = len(doc_text.splitlines()[line_no])
-                        results[line_no].append((0, line_len, fmt))
-                else:
-                    length = end_col - start_col
-                    results[line_no].append((start_col, length, fmt))
-
-        return results
-
-    def _choose_format(self, ttype, tstring):
-        """Decide which format to apply based on token type or content."""
-        import token
-        if ttype == token.COMMENT:
-            return self.formats['comment']
-        elif ttype == token.STRING:
-            return self.formats['string']
-        elif ttype == token.NUMBER:
-            return self.formats['number']
-        elif ttype == token.NAME:
-            # Might be a keyword, builtin, or normal identifier
-            if tstring in self.keywords:
-                return self.formats['keyword']
-            elif tstring in self.builtins:
-                return self.formats['builtin']
-            else:
-                return self.formats['default']
-        else:
-            # default
-            return self.formats['default']
-
-class CHighlighter(QSyntaxHighlighter):
-    def __init__(self, document):
-        super().__init__(document)
-        self._init_formats()
-        self._init_patterns()
+    def lex_block(self, block, text):
+        next_text = block.next().text() if text.endswith('\\') else None
+        result = self.cache.lex_line(self.lexer, text, self.previousBlockState(), next_text)
+
+        # A previous line ending in "name \\" peeked at this line to decide whether
+        # the name is a call. If the answer changed, repaint that line too.
+        previous = block.previous()
+        if previous.isValid() and previous.text().endswith('\\'):
+            _, previous_state = self.lexer.lex_line(
+                previous.text(), previous.previous().userState(), text)
+            if previous_state != self.previousBlockState():
+                block_number = previous.blockNumber()
+                QTimer.singleShot(0, lambda: self._rehighlight_block_number(block_number))
+        return result
+
+    def _rehighlight_block_number(self, block_number):
+        document = self.document()
+        block = document.findBlockByNumber(block_number) if document else None
+        if block is not None and block.isValid():
+            self.rehighlightBlock(block)
+
+class CHighlighter(LexerHighlighter):
+    def __init__(self, document, editor=None):
+        super().__init__(document, CLexer(), editor)
 
     def _init_formats(self):
         """Create and store QTextCharFormat objects for each token type."""
@@ -249,151 +597,6 @@ class CHighlighter(QSyntaxHighlighter):
         default_format = QTextCharFormat()
         self.formats["default"] = default_format
 
-        # Known C keywords
-        self.keywords = {
-            "auto","break","case","char","const","continue","default","do","double",
-            "else","enum","extern","float","for","goto","if","inline","int","long",
-            "register","restrict","return","short","signed","sizeof","static","struct",
-            "switch","typedef","union","unsigned","void","volatile","while"
-        }
-
-        # Built-in types or synonyms
-        self.types = {
-            "int","float","double","char","long","short","signed","unsigned","void"
-        }
-
-    def _init_patterns(self):
-        """Compile all the regex patterns we will use."""
-        # Preprocessor directives (start of line with #)
-        # e.g. "#include <stdio.h>"
-        self.directive_pattern = re.compile(r'^\s*#\s*\w+.*', re.MULTILINE)
-
-        # Single-line comment
-        self.single_comment_pattern = re.compile(r'//[^\n]*')
-
-        # String (naive)
-        self.string_pattern = re.compile(r'"[^"\\]*(\\.[^"\\]*)*"')
-
-        # Numbers
-        # Matches integers, floats, but very naive. 
-        self.number_pattern = re.compile(r'\b\d+(\.\d+)?\b')
-
-        # Keywords (word boundary)
-        kw_alts = "|".join(sorted(self.keywords, key=len, reverse=True))
-        self.keyword_pattern = re.compile(r'\b(' + kw_alts + r')\b')
-
-        # Types (similarly, we can highlight them distinctly)
-        type_alts = "|".join(sorted(self.types, key=len, reverse=True))
-        self.type_pattern = re.compile(r'\b(' + type_alts + r')\b')
-
-        # Function calls (simple approach):
-        # e.g. "myFunc(...)" capturing "myFunc"
-        # We'll color the name "myFunc" as a function. 
-        # This also might catch "if (...)" incorrectly if not careful, but let's keep it naive
-        self.function_call_pattern = re.compile(r'\b([A-Za-z_]\w*)\s*\(')
-
-        # For arguments, we do something naive: inside parentheses after a function,
-        # highlight [A-Za-z_]\w* as an argument. This is extremely naive.
-        self.argument_pattern = re.compile(r'\((.*?)\)')
-
-    def highlightBlock(self, text):
-        """Highlight a single line of text. Also handle multiline comments with block states."""
-        self.setFormat(0, len(text), self.formats["default"])
-
-        # 1) Preprocessor directives
-        for match in self.directive_pattern.finditer(text):
-            start, end = match.span()
-            self.setFormat(start, end - start, self.formats["directive"])
-
-        # 2) Single-line comments
-        for match in self.single_comment_pattern.finditer(text):
-            start, end = match.span()
-            self.setFormat(start, end - start, self.formats["comment"])
-
-        # 3) Strings
-        for match in self.string_pattern.finditer(text):
-            start, end = match.span()
-            self.setFormat(start, end - start, self.formats["string"])
-
-        # 4) Numbers
-        for match in self.number_pattern.finditer(text):
-            start, end = match.span()
-            self.setFormat(start, end - start, self.formats["number"])
-
-        # 5) Keywords
-        for match in self.keyword_pattern.finditer(text):
-            start, end = match.span(1)
-            self.setFormat(start, end - start, self.formats["keyword"])
-
-        # 6) Types
-        for match in self.type_pattern.finditer(text):
-            start, end = match.span(1)
-            self.setFormat(start, end - start, self.formats["type"])
-
-        # 7) Function calls (naive)
-        # We'll highlight the function name portion
-        for match in self.function_call_pattern.finditer(text):
-            func_name_start, func_name_end = match.span(1)
-            # check if it's not a keyword like 'if'
-            # but let's keep it simple
-            self.setFormat(func_name_start, func_name_end - func_name_start, self.formats["function"])
-
-            # Now, if you want to highlight arguments: we can do a second pattern on the substring
-            # that starts after '(' up to the matching ')'. This is naive if parentheses are nested
-            paren_start = match.end() - 1  # position of '('
-            # find the matching ')'. We'll do a naive approach scanning forward
-            end_paren_index = text.find(')', paren_start)
-            if end_paren_index != -1:
-                # everything inside parentheses is arguments
-                arg_text = text[paren_start+1:end_paren_index]
-                # We can highlight each identifier as an argument
-                # e.g. for something like: (x, y+1, struct Foo* bar)
-                # let's do a simplistic approach with a regex
-                arg_id_pattern = re.compile(r'\b[A-Za-z_]\w*\b')
-                for arg_match in arg_id_pattern.finditer(arg_text):
-                    arg_start = paren_start + 1 + arg_match.start()
-                    arg_len = arg_match.end() - arg_match.start()
-                    self.setFormat(arg_start, arg_len, self.formats["argument"])
-
-        # 8) Multiline comments
-        self._highlight_multiline_comments(text)
-
-    def _highlight_multiline_comments(self, text):
-        """
-        Use block states to handle /* ... */ across multiple lines.
-        We'll store 1 if we're inside a comment, -1 if not.
-        """
-        in_comment = (self.previousBlockState() == 1)
-        start_idx = 0
-
-        if in_comment:
-            close_idx = text.find("*/", start_idx)
-            if close_idx == -1:
-                self.setFormat(0, len(text), self.formats["comment"])
-                self.setCurrentBlockState(1)
-                return
-            else:
-                self.setFormat(0, close_idx+2, self.formats["comment"])
-                start_idx = close_idx+2
-                in_comment = False
-
-        while True:
-            open_idx = text.find("/*", start_idx)
-            if open_idx == -1:
-                break
-            close_idx = text.find("*/", open_idx + 2)
-            if close_idx == -1:
-                # highlight until end of line
-                self.setFormat(open_idx, len(text) - open_idx, self.formats["comment"])
-                self.setCurrentBlockState(1)
-                return
-            else:
-                self.setFormat(open_idx, close_idx+2 - open_idx, self.formats["comment"])
-                start_idx = close_idx+2
-
-        if not in_comment:
-            self.setCurrentBlockState(-1)
-
 def _configure_editor(editor: QPlainTextEdit):
     # Use the editor's current font metrics to compute how wide one space is:
     space_width = editor.fontMetrics().horizontalAdvance(' ')
@@ -401,8 +604,49 @@ def _configure_editor(editor: QPlainTextEdit):
     editor.setTabStopDistance(8 * space_width)
 
 class EditorTabs(QTabWidget):
+    # Emitted with the editor widget once a file has finished loading into it
+    file_loaded = Signal(object)
+    # Emitted after each save: path, whether anything was written, seconds taken
+    file_saved = Signal(str, bool, float)
+    save_failed = Signal(str, str)  # path, error
+    # How often edit journals are checked for compaction
+    JOURNAL_COMPACT_INTERVAL_MS = 10000
+    # Changes to open files on disk are looked at this long after the last notification,
+    # so a git checkout rewriting many of them is handled in one go
+    DISK_CHANGE_DELAY_MS = 200
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._loads = {}  # editor -> threading.Event that cancels its background load
+        self._pending_lines = {}  # editor still loading -> line to go to once it has
+        self._saving = {}        # path -> editor whose save is running
+        self._queued_saves = {}  # path -> (editor, text, edit count) to save once that one is done
+        # editor -> revision of its text. QTextDocument.revision() also moves when
+        # highlighting repaints, so these are counted here from real edits and are
+        # unique for the session: a saved snapshot or a cached outline can tell if
+        # it still matches the text.
+        self._revisions = {}
+        self._revision_counter = itertools.count(1)
+        self._journals = {}      # editor -> EditJournal, for editors with unsaved changes
+        self._compact_signals = _JournalCompactSignals(self)
+        self._compact_signals.finished.connect(self._on_journal_compacted)
+        self._compact_timer = QTimer(self)
+        self._compact_timer.timeout.connect(self._compact_journals)
+        self._compact_timer.start(self.JOURNAL_COMPACT_INTERVAL_MS)
+        self._save_signals = _FileSaveSignals(self)
+        self._save_signals.finished.connect(self._on_save_finished)
+        # Open files are watched so changes made outside the editor reach their buffers
+        self._disk_states = {}     # editor -> (size, mtime_ns, digest) of the file its text is based on
+        self._reloading = set()    # editors getting changes from disk, which aren't journalled
+        self._resolving = set()    # editors whose disk conflict is being asked about
+        self._changed_on_disk = set()
+        self._file_watcher = QFileSystemWatcher(self)
+        self._file_watcher.fileChanged.connect(self._on_file_changed_on_disk)
+        self._disk_check_timer = QTimer(self)
+        self._disk_check_timer.setSingleShot(True)
+        self._disk_check_timer.timeout.connect(self._check_disk)
+        self._disk_check_signals = _DiskCheckSignals(self)
+        self._disk_check_signals.finished.connect(self._on_disk_checked)
         self.setTabsClosable(True)
         self.setMovable(True)
         self.tabCloseRequested.connect(self.close_tab)
@@ -410,20 +654,60 @@ class EditorTabs(QTabWidget):
         self.customContextMenuRequested.connect(self._on_tab_context_menu)
 
 
-    def open_file(self, file_path):
+    def open_file(self, file_path, line=None):
+        """Open a file in a new tab, or switch to its tab if it is open already.
+
+        With line, the cursor also goes to that 1-based line, once the file has loaded.
+        """
         for i in range(self.count()):
             editor = self.widget(i)
             if editor.property("file_path") == file_path:
                 self.setCurrentIndex(i)
-                return
-
+                break
+        else:
+            self._open_new_file(file_path)
+        if line is not None and self.current_file_path() == file_path:
+            self.go_to_line(self.current_editor(), line)
+
+    def go_to_line(self, editor, line):
+        """Put the cursor on a 1-based line of editor and scroll it into view."""
+        if editor in self._loads:
+            self._pending_lines[editor] = line  # applied by _on_load_finished
+            return
+        if isinstance(editor, LargeFileView):
+            editor.go_to_line(line)  # waits for the line to be indexed itself
+            return
+        if not isinstance(editor, QPlainTextEdit):
+            return
+        # Straight to the block instead of stepping down a line at a time
+        block = editor.document().findBlockByNumber(line - 1)
+        if not block.isValid():
+            block = editor.document().lastBlock()
+        text_cursor = editor.textCursor()
+        text_cursor.setPosition(block.position())
+        editor.setTextCursor(text_cursor)
+
+        # Make sure the editor gets focus so the blinking cursor is visible
+        editor.setFocus()
+        editor.ensureCursorVisible()
+
+    def _open_new_file(self, file_path):
+        # Binary files (any size) end up in the hex viewer and never get decoded: the
+        # background reader of either kind of tab sniffs the start of the file first
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-        except Exception as e:
-            text = f"Error opening file:\n{e}"
+            large = os.path.getsize(file_path) >= LARGE_FILE_BYTES
+        except OSError:
+            large = False  # let the open() below report the error
+        if large:
+            self._open_large_file(file_path)
+            return
+
+        editor = self._add_editor_tab(file_path)
+        self._track_edits(editor)
+        self._load_file(editor, file_path)
 
-        editor = QPlainTextEdit(text)
+    def _add_editor_tab(self, file_path):
+        editor = QPlainTextEdit()
         _configure_editor(editor)
         # Set the file_path BEFORE highlighting
         editor.setProperty("file_path", file_path)
@@ -432,14 +716,255 @@ class EditorTabs(QTabWidget):
         file_name = os.path.basename(file_path)
         self.addTab(editor, file_name)
         self.setCurrentWidget(editor)
+        return editor
+
+    def _track_edits(self, editor):
+        editor.document().contentsChange.connect(
+            lambda position, removed, added: self._on_contents_change(editor, position, removed, added))
+
+    def _on_contents_change(self, editor, position, removed, added):
+        if not (removed or added) or editor in self._loads:
+            return
+        self._revisions[editor] = next(self._revision_counter)
+        if editor not in self._reloading:
+            self._journal_change(editor, position, removed, added)
+
+    def _journal_change(self, editor, position, removed, added):
+        """Append one edit to the editor's crash-recovery journal, starting one if needed."""
+        document = editor.document()
+        # Qt sometimes counts the document's implicit final paragraph separator in
+        # both removed and added; it isn't text, so leave it out of the record
+        end = min(position + added, document.characterCount() - 1)
+        removed = max(0, removed - (position + added - end))
+        cursor = QTextCursor(document)
+        cursor.setPosition(position)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        inserted = cursor.selectedText().replace('\u2029', '\n')
+        try:
+            journal = self._journals.get(editor)
+            if journal is None:
+                # No journal means the buffer matched the file it was loaded from (or last saved
+                # as) until this edit; that version is the base, not whatever is on disk by now
+                disk_state = self._disk_states.get(editor)
+                if disk_state is None:
+                    # Deleted meanwhile: the buffer, this edit included, is all there is
+                    self._journals[editor] = EditJournal.create(editor.property("file_path"), editor.toPlainText())
+                    return
+                journal = EditJournal.create(editor.property("file_path"), disk_state=disk_state[:2])
+                self._journals[editor] = journal
+            journal.record(position, removed, inserted)
+        except OSError as e:
+            print(f"Error writing edit journal: {e}")
+
+    def _discard_journal(self, editor):
+        journal = self._journals.pop(editor, None)
+        if journal is not None:
+            journal.discard()
+
+    def _compact_journals(self):
+        for editor, journal in self._journals.items():
+            if journal.needs_compaction():
+                journal.begin_compaction()
+                QThreadPool.globalInstance().start(
+                    _JournalCompactJob(journal, editor.toPlainText(), self._compact_signals))
+
+    def _on_journal_compacted(self, journal, temp_path):
+        if temp_path is None:
+            journal.abort_compaction()
+            return
+        try:
+            journal.finish_compaction(temp_path)
+        except OSError as e:
+            print(f"Error compacting edit journal: {e}")
+            journal.abort_compaction(temp_path)
+
+    def restore_unsaved(self):
+        """Reopen buffers whose unsaved edits were left in journals by a previous session."""
+        for journal_path in list_journals():
+            try:
+                file_path, text = replay(journal_path)
+            except (OSError, ValueError, struct.error) as e:
+                print(f"Skipping unreadable edit journal {journal_path}: {e}")
+                continue
+            if any(self.widget(i).property("file_path") == file_path for i in range(self.count())):
+                continue
+            stale_base = text is None
+            if stale_base:
+                # The edits were made to a version of the file that's gone; only the user can say
+                # whether they're still wanted, so the journal stays until they do
+                answer = QMessageBox.question(
+                    self, "Recover Unsaved Changes",
+                    f"{os.path.basename(file_path)} had unsaved changes when the editor last closed, "
+                    "but the file has changed on disk since.\n\n"
+                    "Open the changes, applied to the file as it is now, in a recovered tab? "
+                    "They may not line up; check them before saving. "
+                    "Discard throws them away; Cancel keeps them for next time.",
+                    QMessageBox.Open | QMessageBox.Discard | QMessageBox.Cancel, QMessageBox.Open)
+                if answer == QMessageBox.Discard:
+                    os.remove(journal_path)
+                    continue
+                if answer != QMessageBox.Open:
+                    continue
+                try:
+                    file_path, text = replay(journal_path, stale_base=True)
+                except (OSError, ValueError, struct.error) as e:
+                    print(f"Skipping unreadable edit journal {journal_path}: {e}")
+                    continue
+
+            editor = self._add_editor_tab(file_path)
+            highlighter = self._apply_highlighting(editor, file_path)
+            if highlighter is not None:
+                highlighter.set_plain_text(text)
+            else:
+                editor.setPlainText(text)
+            # Anything computed for the empty tab (the outline) is out of date now
+            self._revisions[editor] = next(self._revision_counter)
+            editor.document().setModified(True)
+            self._track_edits(editor)
+            if stale_base:
+                # From now on the recovered text is the base, not the file it no longer matches
+                try:
+                    self._journals[editor] = EditJournal.create(file_path, text)
+                except OSError as e:
+                    print(f"Error writing edit journal: {e}")
+                self._set_tab_title(editor, " (recovered)")
+            else:
+                self._journals[editor] = EditJournal.reopen(journal_path, file_path)
+            # The buffer is saved over the file as it is now
+            try:
+                stat = os.stat(file_path)
+                self._disk_states[editor] = (stat.st_size, stat.st_mtime_ns, None)
+                self._watch_file(file_path)
+            except OSError:
+                pass
+            self.file_loaded.emit(editor)
+
+    def _load_file(self, editor, file_path):
+        """Stream a file into editor from a background reader.
+
+        The tab shows how far the load has got and the editor stays read-only
+        until it completes; closing the tab cancels it. The highlighter is attached
+        while the document is still empty but only starts once all the text is in,
+        so big files get their viewport coloured first and the rest in idle slices.
+        """
+        try:
+            total_bytes = os.path.getsize(file_path)
+        except OSError:
+            total_bytes = 0
+        highlighter = self._apply_highlighting(editor, file_path)
+        editor.setReadOnly(True)
+        editor.document().setUndoRedoEnabled(False)  # loading is not an undoable edit
+
+        cancelled = threading.Event()
+        self._loads[editor] = cancelled
+        signals = _FileLoadSignals(editor)
+        signals.chunk_loaded.connect(
+            lambda text, bytes_read: self._on_chunk_loaded(editor, highlighter, text, bytes_read, total_bytes))
+        signals.finished.connect(
+            lambda error, disk_state: self._on_load_finished(editor, highlighter, error, disk_state))
+        signals.binary.connect(lambda: self._on_load_binary(editor))
+        QThreadPool.globalInstance().start(_FileLoadJob(file_path, cancelled, signals))
+
+    def is_loading(self, editor):
+        return editor in self._loads
+
+    def text_revision(self, editor):
+        """A number that changes with every edit of editor's text and is never reused."""
+        revision = self._revisions.get(editor)
+        if revision is None:
+            revision = self._revisions[editor] = next(self._revision_counter)
+        return revision
+
+    def _on_chunk_loaded(self, editor, highlighter, text, bytes_read, total_bytes):
+        if editor not in self._loads:
+            return  # cancelled; the reader just hadn't noticed yet
+        if highlighter is not None:
+            highlighter.append_text(text)
+        else:
+            cursor = QTextCursor(editor.document())
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertText(text)
+        index = self.indexOf(editor)
+        if index >= 0 and total_bytes:
+            percent = min(100, bytes_read * 100 // total_bytes)
+            self.setTabText(index, f"{os.path.basename(editor.property('file_path'))} ({percent}%)")
+
+    def _on_load_finished(self, editor, highlighter, error, disk_state):
+        if self._loads.pop(editor, None) is None:
+            return
+        if disk_state is not None:
+            self._disk_states[editor] = disk_state
+            self._watch_file(editor.property("file_path"))
+        self._revisions[editor] = next(self._revision_counter)
+        if error:
+            text = f"Error opening file:\n{error}"
+            if highlighter is not None:
+                highlighter.set_plain_text(text)
+            else:
+                editor.setPlainText(text)
+        elif highlighter is not None:
+            highlighter.finish_load()
+
+        document = editor.document()
+        document.setUndoRedoEnabled(True)
+        document.setModified(False)
+        editor.setReadOnly(False)
+        index = self.indexOf(editor)
+        if index >= 0:
+            self.setTabText(index, os.path.basename(editor.property("file_path")))
 
         # Move cursor to start
         cursor = editor.textCursor()
         cursor.movePosition(QTextCursor.Start)
         editor.setTextCursor(cursor)
+        line = self._pending_lines.pop(editor, None)
+        if line is not None:
+            self.go_to_line(editor, line)
+        self.file_loaded.emit(editor)
+
+    def _on_load_binary(self, editor):
+        if self._loads.pop(editor, None) is None:
+            return  # closed while the reader looked at it
+        self._pending_lines.pop(editor, None)
+        self._open_binary_file(editor.property("file_path"), replacing=editor)
+
+    def _open_large_file(self, file_path):
+        """Show a huge file read-only through a memory-mapped LargeFileView."""
+        try:
+            view = LargeFileView(file_path)
+        except OSError as e:
+            print(f"Error opening file: {e}")
+            return
+        view.setProperty("file_path", file_path)
+        view.setProperty("pinned", False)
+        view.binary_found.connect(lambda: self._open_binary_file(file_path, replacing=view))
+        self.addTab(view, os.path.basename(file_path) + " [read-only]")
+        self.setCurrentWidget(view)
 
-        # Now apply highlighting with a known path
-        self._apply_highlighting(editor, file_path)
+    def _open_binary_file(self, file_path, replacing=None):
+        """Show a binary file as a memory-mapped, paged hex dump.
+
+        replacing is the tab that found out the file is binary; the hex view takes its place.
+        """
+        index = -1
+        current = True
+        if replacing is not None:
+            index = self.indexOf(replacing)
+            if index < 0:
+                return  # closed meanwhile
+            current = self.currentWidget() is replacing
+            self._remove_tab(index)
+            replacing.deleteLater()
+        try:
+            view = HexView(file_path)
+        except OSError as e:
+            print(f"Error opening file: {e}")
+            return
+        view.setProperty("file_path", file_path)
+        view.setProperty("pinned", False)
+        self.insertTab(index, view, os.path.basename(file_path) + " [hex]")
+        if current:
+            self.setCurrentWidget(view)
 
     def current_editor(self):
         return self.currentWidget()
@@ -452,30 +977,211 @@ class EditorTabs(QTabWidget):
 
     def save_current_file(self):
         editor = self.current_editor()
-        if editor is not None:
+        # Never write a file back while only part of it has been read in
+        if isinstance(editor, QPlainTextEdit) and not self.is_loading(editor):
             file_path = editor.property("file_path")
             if file_path is not None:
-                try:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(editor.toPlainText())
-                except Exception as e:
-                    print(f"Error saving file: {e}")
+                # Only the snapshot is taken here; hashing and writing happen off the GUI thread
+                save = (editor, editor.toPlainText(), self.text_revision(editor))
+                if file_path in self._saving:
+                    self._queued_saves[file_path] = save
+                else:
+                    self._start_save(file_path, *save)
+
+    def _start_save(self, file_path, editor, text, revision):
+        self._saving[file_path] = editor
+        QThreadPool.globalInstance().start(_FileSaveJob(file_path, text, revision, self._save_signals))
+
+    def _on_save_finished(self, file_path, revision, written, seconds, error):
+        editor = self._saving.pop(file_path, None)
+        if error:
+            print(f"Error saving file: {error}")
+            self.save_failed.emit(file_path, error)
+        else:
+            if editor is not None and self.indexOf(editor) >= 0:
+                # The buffer is based on what was just written; replacing the file dropped its watch
+                with _FileSaveJob.disk_digests_lock:
+                    disk_state = _FileSaveJob.disk_digests.get(file_path)
+                if disk_state is not None:
+                    self._disk_states[editor] = disk_state
+                self._watch_file(file_path)
+                self._set_tab_title(editor)
+                if self.text_revision(editor) == revision:
+                    editor.document().setModified(False)
+                    self._discard_journal(editor)
+                elif editor in self._journals:
+                    # Still unsaved edits, but the file the journal builds on was just replaced
+                    self._journals[editor].base_changed()
+                    self._compact_journals()
+            self.file_saved.emit(file_path, written, seconds)
+        queued = self._queued_saves.pop(file_path, None)
+        if queued is not None:
+            self._start_save(file_path, *queued)
 
     def close_tab(self, index):
         editor = self.widget(index)
         if editor and not editor.property("pinned"):
-            self.removeTab(index)
+            self._remove_tab(index)
+
+    def _remove_tab(self, index):
+        """Remove a tab, cancelling its load or releasing its file mapping."""
+        editor = self.widget(index)
+        self.removeTab(index)
+        self._revisions.pop(editor, None)
+        self._pending_lines.pop(editor, None)
+        if self._disk_states.pop(editor, None) is not None:
+            file_path = editor.property("file_path")
+            if not any(self.widget(i).property("file_path") == file_path for i in range(self.count())):
+                self._file_watcher.removePath(file_path)
+        self._discard_journal(editor)
+        cancelled = self._loads.pop(editor, None)
+        if cancelled is not None:
+            cancelled.set()
+        if isinstance(editor, PagedFileView):
+            editor.close_file()
+
+    def _watch_file(self, file_path):
+        if file_path not in self._file_watcher.files():
+            self._file_watcher.addPath(file_path)
+
+    def _set_tab_title(self, editor, suffix=""):
+        index = self.indexOf(editor)
+        if index >= 0:
+            self.setTabText(index, os.path.basename(editor.property("file_path")) + suffix)
+
+    def _on_file_changed_on_disk(self, file_path):
+        self._changed_on_disk.add(file_path)
+        self._disk_check_timer.start(self.DISK_CHANGE_DELAY_MS)
+
+    def _check_disk(self):
+        """Have the files the watcher flagged looked at in the background."""
+        for file_path in self._changed_on_disk:
+            # Renaming a new version into place (or a save of ours) ends the watch on the old one
+            if os.path.exists(file_path):
+                self._watch_file(file_path)
+        checks = {}
+        for editor, disk_state in self._disk_states.items():
+            file_path = editor.property("file_path")
+            # A save in progress sets the new base itself when it's done
+            if file_path in self._changed_on_disk and file_path not in self._saving:
+                checks[file_path] = disk_state
+        self._changed_on_disk.clear()
+        if checks:
+            QThreadPool.globalInstance().start(_DiskCheckJob(list(checks.items()), self._disk_check_signals))
+
+    def _on_disk_checked(self, results):
+        for file_path, disk_state, text, error in results:
+            for editor in list(self._disk_states):
+                if editor.property("file_path") != file_path or self.indexOf(editor) < 0:
+                    continue
+                if error:
+                    print(f"Error checking {file_path} for changes: {error}")
+                elif disk_state is None:
+                    # Deleted: the buffer is all that's left of it, keep it until it's saved again
+                    del self._disk_states[editor]
+                    self._set_tab_title(editor, " (deleted)")
+                elif text is None:
+                    self._disk_states[editor] = disk_state  # touched, same content
+                elif not editor.document().isModified():
+                    self._reload_from_disk(editor, text, disk_state)
+                else:
+                    self._resolve_conflict(editor, text, disk_state)
+
+    def _reload_from_disk(self, editor, text, disk_state):
+        """Make editor's text the file's new contents by changing only the lines that differ.
+
+        The cursor stays where it was relative to the text around it, the scroll
+        position is kept, and the reload is a single step on the undo stack.
+        """
+        document = editor.document()
+        old_lines = editor.toPlainText().split('\n')
+        new_lines = text.split('\n')
+        opcodes = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes()
+        vertical, horizontal = editor.verticalScrollBar().value(), editor.horizontalScrollBar().value()
+        cursor = QTextCursor(document)
+        self._reloading.add(editor)
+        cursor.beginEditBlock()
+        try:
+            # Bottom up, so the blocks of the lines still to change keep their numbers
+            for tag, i1, i2, j1, j2 in reversed(opcodes):
+                if tag == 'equal':
+                    continue
+                inserted = '\n'.join(new_lines[j1:j2])
+                if i1 == i2:
+                    # Insertion: before line i1, or after the last line
+                    if i1 < len(old_lines):
+                        start = end = document.findBlockByNumber(i1).position()
+                        inserted += '\n'
+                    else:
+                        last = document.lastBlock()
+                        start = end = last.position() + last.length() - 1
+                        inserted = '\n' + inserted
+                elif j1 == j2:
+                    # Deletion: the lines and one line break
+                    if i2 < len(old_lines):
+                        start = document.findBlockByNumber(i1).position()
+                        end = document.findBlockByNumber(i2).position()
+                    else:
+                        previous = document.findBlockByNumber(i1 - 1)
+                        last = document.lastBlock()
+                        start = previous.position() + previous.length() - 1
+                        end = last.position() + last.length() - 1
+                else:
+                    last = document.findBlockByNumber(i2 - 1)
+                    start = document.findBlockByNumber(i1).position()
+                    end = last.position() + last.length() - 1
+                cursor.setPosition(start)
+                cursor.setPosition(end, QTextCursor.KeepAnchor)
+                cursor.insertText(inserted)
+        finally:
+            cursor.endEditBlock()
+            self._reloading.discard(editor)
+        document.setModified(False)
+        editor.verticalScrollBar().setValue(vertical)
+        editor.horizontalScrollBar().setValue(horizontal)
+        self._disk_states[editor] = disk_state
+        # The buffer matches the file again; nothing to recover
+        self._discard_journal(editor)
+        self._set_tab_title(editor)
+
+    def _resolve_conflict(self, editor, text, disk_state):
+        """The file changed on disk under unsaved edits: ask which version to keep."""
+        file_path = editor.property("file_path")
+        if editor in self._resolving:
+            return  # asked already; looked at again once answered
+        self._resolving.add(editor)
+        self.setCurrentWidget(editor)
+        answer = QMessageBox.question(
+            self, "File Changed on Disk",
+            f"{os.path.basename(file_path)} was changed outside the editor, and has unsaved changes here.\n\n"
+            "Reload it from disk? Undo brings your changes back. "
+            "Otherwise, saving will overwrite the version on disk.",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        self._resolving.discard(editor)
+        if self.indexOf(editor) < 0:
+            return  # closed meanwhile
+        if answer == QMessageBox.Yes:
+            self._reload_from_disk(editor, text, disk_state)
+        else:
+            self._disk_states[editor] = disk_state
+            journal = self._journals.get(editor)
+            if journal is not None:
+                # The journal's base is gone; have it snapshot the buffer instead
+                journal.base_changed()
+                self._compact_journals()
+        # It may have changed again while the question was up
+        self._on_file_changed_on_disk(file_path)
 
     def _apply_highlighting(self, editor_widget, file_path):
         """Choose which highlighter based on file extension."""
         extension = os.path.splitext(file_path)[1].lower()
         if extension == ".py":
-            PythonHighlighter(editor_widget.document())
+            return PythonHighlighter(editor_widget.document(), editor_widget)
         elif extension == ".c":
-            CHighlighter(editor_widget.document())
+            return CHighlighter(editor_widget.document(), editor_widget)
         else:
             # You can pick a default highlighter or do nothing
-            pass
+            return None
 
 
     def _on_tab_context_menu(self, pos: QPoint):
@@ -492,6 +1198,7 @@ class EditorTabs(QTabWidget):
 
         close_all_action = menu.addAction("Close All")
         close_this_action = menu.addAction("Close This")
+        cancel_load_action = menu.addAction("Cancel Loading") if editor in self._loads else None
         pin_action = menu.addAction("Unpin" if pinned else "Pin")
 
         menu.addSeparator()
@@ -515,7 +1222,9 @@ class EditorTabs(QTabWidget):
         elif action == close_this_action:
             # Close this tab if not pinned
             if not pinned:
-                self.removeTab(tab_index)
+                self._remove_tab(tab_index)
+        elif cancel_load_action is not None and action == cancel_load_action:
+            self._remove_tab(tab_index)
         elif action == pin_action:
             # Toggle pinned state
             editor.setProperty("pinned", not pinned)
@@ -534,7 +1243,7 @@ class EditorTabs(QTabWidget):
         while i < self.count():
             editor = self.widget(i)
             if not editor.property("pinned"):
-                self.removeTab(i)
+                self._remove_tab(i)
             else:
                 i += 1
 
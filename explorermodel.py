@@ -0,0 +1,397 @@
+"""The file explorer's model: the project tree, listed lazily.
+
+Unlike QFileSystemModel, which crawls and watches whatever it is pointed at,
+ExplorerModel lists a directory only when the view expands it, on a
+background thread, and leaves out what the ignore rules (ignore.py) exclude:
+.git, node_modules, build outputs in .gitignore, ... Only expanded
+directories are watched, and at most MAX_WATCHED_DIRS of them; a directory
+that loses its watch is listed again the next time it's expanded.
+"""
+import os
+import threading
+from PySide6.QtCore import (QAbstractItemModel, QModelIndex, Qt, QObject, QRunnable, QThreadPool,
+                            QFileSystemWatcher, QTimer, QDir, Signal)
+from PySide6.QtWidgets import QFileIconProvider
+from ignore import IgnoreRules, list_directory
+
+# Expanded directories watched for changes, least recently expanded dropped first
+MAX_WATCHED_DIRS = 256
+# Changes in a watched directory are picked up this long after the last one
+RELIST_DELAY_MS = 300
+
+
+class _Node:
+    __slots__ = ('name', 'rel_path', 'is_dir', 'parent', 'row', 'children', 'listing', 'stale')
+
+    def __init__(self, name, rel_path, is_dir, parent, row):
+        self.name = name
+        self.rel_path = rel_path  # relative to the root, '/' separators; '' for the root
+        self.is_dir = is_dir
+        self.parent = parent
+        self.row = row
+        self.children = None  # None until listed
+        self.listing = False  # a listing is on its way
+        self.stale = False    # lost its watch; list again when expanded
+
+
+class _ListSignals(QObject):
+    finished = Signal(object, str, object)  # root's cancel event, relative directory, (files, subdirs) or None
+
+class _ListJob(QRunnable):
+    def __init__(self, rules, directory, cancelled, signals):
+        super().__init__()
+        self.rules = rules
+        self.directory = directory
+        self.cancelled = cancelled
+        self.signals = signals
+
+    def run(self):
+        if self.cancelled.is_set():
+            return
+        listing = list_directory(self.rules, self.directory)
+        try:
+            self.signals.finished.emit(self.cancelled, self.directory, listing)
+        except RuntimeError:
+            pass  # the model was deleted
+
+
+class ExplorerModel(QAbstractItemModel):
+    """A one-column tree of the files under a root directory.
+
+    Keeps the parts of the QFileSystemModel API the explorer uses: setRootPath(),
+    rootPath(), index(path), filePath(), isDir() and renaming by editing.
+    """
+    path_ready = Signal(str)  # a path asked for with fetch_path() is in the model now
+
+    def __init__(self, excluded_names=None, parent=None):
+        super().__init__(parent)
+        self._excluded_names = excluded_names
+        self._root_path = ""
+        self._rules = None
+        self._root = _Node("", "", True, None, 0)
+        self._nodes = {}  # relative path -> node, for every node in the tree
+        self._cancelled = threading.Event()
+        self._wanted_path = None  # (relative path, absolute path) of the last fetch_path()
+        self._icons = QFileIconProvider()
+        self._dir_icon = self._icons.icon(QFileIconProvider.Folder)
+        self._file_icon = self._icons.icon(QFileIconProvider.File)
+        self._signals = _ListSignals(self)
+        self._signals.finished.connect(self._on_listed)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._watched = {}  # watched directory path -> node, least recently expanded first
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._changed_dirs = set()
+        self._relist_timer = QTimer(self)
+        self._relist_timer.setSingleShot(True)
+        self._relist_timer.timeout.connect(self._relist_changed)
+
+    # --- The QFileSystemModel-like API ---
+
+    def setRootPath(self, path):
+        path = QDir.fromNativeSeparators(os.path.abspath(path))
+        self._cancelled.set()
+        self._cancelled = threading.Event()
+        if self._watcher.directories():
+            self._watcher.removePaths(self._watcher.directories())
+        self._watched.clear()
+        self._changed_dirs.clear()
+        self._wanted_path = None
+        self.beginResetModel()
+        self._root_path = path
+        self._rules = IgnoreRules(path, self._excluded_names)
+        self._root = _Node("", "", True, None, 0)
+        self._nodes = {"": self._root}
+        self.endResetModel()
+        self._list(self._root)
+        self._watch(self._root)
+        return QModelIndex()
+
+    def rootPath(self):
+        return self._root_path
+
+    def index(self, row_or_path, column=0, parent=QModelIndex()):
+        """index(row, column, parent) as usual, or index(path) for a path that's in the
+        model already (see fetch_path()); the root's index is the invalid one."""
+        if isinstance(row_or_path, str):
+            rel_path = self._relative(row_or_path)
+            node = self._nodes.get(rel_path) if rel_path is not None else None
+            if node is None or node is self._root:
+                return QModelIndex()
+            return self.createIndex(node.row, 0, node)
+        parent_node = self._node(parent)
+        if column != 0 or parent_node.children is None or not 0 <= row_or_path < len(parent_node.children):
+            return QModelIndex()
+        return self.createIndex(row_or_path, 0, parent_node.children[row_or_path])
+
+    def filePath(self, index):
+        node = self._node(index)
+        if not node.rel_path:
+            return self._root_path
+        return self._root_path.rstrip('/') + '/' + node.rel_path
+
+    def isDir(self, index):
+        return self._node(index).is_dir
+
+    def fetch_path(self, path):
+        """List the directories down to path, if needed, and emit path_ready(path) once it's
+        in the model. Paths outside the root or left out by the ignore rules never get there."""
+        rel_path = self._relative(path)
+        if rel_path is None:
+            return
+        self._wanted_path = (rel_path, path)
+        self._fetch_wanted()
+
+    def refresh(self, directory_path):
+        """List a directory again, e.g. after creating or deleting something in it."""
+        rel_path = self._relative(directory_path)
+        node = self._nodes.get(rel_path) if rel_path is not None else None
+        if node is not None and node.is_dir and node.children is not None:
+            self._list(node, again=True)
+
+    def directory_expanded(self, index):
+        """The view expanded a directory: watch it, and list it again if it went stale."""
+        node = self._node(index)
+        self._watch(node)
+        if node.stale:
+            node.stale = False
+            self._list(node, again=True)
+
+    def directory_collapsed(self, index):
+        node = self._node(index)
+        if node is not self._root:
+            self._unwatch(node)
+
+    # --- QAbstractItemModel ---
+
+    def parent(self, index=None):
+        if index is None:
+            return super().parent()  # QObject.parent()
+        node = self._node(index)
+        parent = node.parent
+        if parent is None or parent is self._root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        children = self._node(parent).children
+        return len(children) if children is not None else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self._node(parent)
+        # Unlisted directories get an expand arrow; it goes away if they turn out empty
+        return node.is_dir and (node.children is None or bool(node.children))
+
+    def canFetchMore(self, parent):
+        node = self._node(parent)
+        return node.is_dir and node.children is None and not node.listing
+
+    def fetchMore(self, parent):
+        self._list(self._node(parent))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return node.name
+        if role == Qt.DecorationRole:
+            return self._dir_icon if node.is_dir else self._file_icon
+        if role == Qt.ToolTipRole:
+            return self.filePath(index)
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        """Renaming: the file or directory is renamed on disk."""
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        node = index.internalPointer()
+        new_name = str(value).strip()
+        if not new_name or new_name == node.name or '/' in new_name or os.sep in new_name:
+            return False
+        old_path = self.filePath(index)
+        new_path = os.path.join(os.path.dirname(old_path), new_name)
+        if os.path.exists(new_path):
+            return False
+        try:
+            os.rename(old_path, new_path)
+        except OSError:
+            return False
+        self._list(node.parent, again=True)
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+        if not index.internalPointer().is_dir:
+            flags |= Qt.ItemNeverHasChildren
+        return flags
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == 0:
+            return "Name"
+        return None
+
+    # --- Internals ---
+
+    def _node(self, index):
+        return index.internalPointer() if index.isValid() else self._root
+
+    def _index_of(self, node):
+        return QModelIndex() if node is self._root else self.createIndex(node.row, 0, node)
+
+    def _relative(self, path):
+        if self._rules is None:
+            return None
+        return self._rules.relative(path)
+
+    def _list(self, node, again=False):
+        """List a directory in the background; again: even if a listing is already on its
+        way, which may predate the change that calls for this one."""
+        if node.listing and not again:
+            return
+        node.listing = True
+        self._pool.start(_ListJob(self._rules, node.rel_path, self._cancelled, self._signals))
+
+    def _on_listed(self, cancelled, directory, listing):
+        if cancelled is not self._cancelled:
+            return  # listed for a previous root
+        node = self._nodes.get(directory)
+        if node is None:
+            return  # removed while it was being listed
+        node.listing = False
+        files, subdirs = listing if listing is not None else ([], [])
+        entries = sorted([(False, name.casefold(), name) for name in subdirs] +
+                         [(True, name.casefold(), name) for name in files])
+        if node.children is None:
+            node.children = []
+            if entries:
+                self.beginInsertRows(self._index_of(node), 0, len(entries) - 1)
+                node.children = [self._new_node(node, name, not is_file, row)
+                                 for row, (is_file, _, name) in enumerate(entries)]
+                self.endInsertRows()
+            elif node is not self._root:
+                # No expand arrow any more
+                index = self._index_of(node)
+                self.dataChanged.emit(index, index)
+        else:
+            self._merge(node, entries)
+        self._fetch_wanted()
+
+    def _new_node(self, parent, name, is_dir, row):
+        rel_path = f"{parent.rel_path}/{name}" if parent.rel_path else name
+        child = _Node(name, rel_path, is_dir, parent, row)
+        self._nodes[rel_path] = child
+        return child
+
+    def _merge(self, node, entries):
+        """Bring a listed directory's rows in line with a new listing, keeping the nodes
+        (and so the expanded state) of entries that are still there."""
+        parent_index = self._index_of(node)
+        wanted = {(not is_file, name) for is_file, _, name in entries}
+        # Remove from the bottom up, in runs of adjacent rows
+        row = len(node.children) - 1
+        while row >= 0:
+            if (node.children[row].is_dir, node.children[row].name) in wanted:
+                row -= 1
+                continue
+            last = row
+            while row >= 0 and (node.children[row].is_dir, node.children[row].name) not in wanted:
+                row -= 1
+            self.beginRemoveRows(parent_index, row + 1, last)
+            for child in node.children[row + 1:last + 1]:
+                self._forget(child)
+            del node.children[row + 1:last + 1]
+            # Rows must be right by the time views hear of the change
+            self._renumber(node.children, row + 1)
+            self.endRemoveRows()
+        # What's left is in sorted order, so new entries go in wherever the two lists differ
+        row = 0
+        while row < len(entries):
+            is_file, _, name = entries[row]
+            current = node.children[row] if row < len(node.children) else None
+            if current is not None and current.is_dir != is_file and current.name == name:
+                row += 1
+                continue
+            first = row
+            new_nodes = []
+            while row < len(entries) and not (current is not None and current.is_dir != entries[row][0]
+                                              and current.name == entries[row][2]):
+                new_nodes.append(self._new_node(node, entries[row][2], not entries[row][0], row))
+                row += 1
+            self.beginInsertRows(parent_index, first, row - 1)
+            node.children[first:first] = new_nodes
+            self._renumber(node.children, first)
+            self.endInsertRows()
+
+    @staticmethod
+    def _renumber(nodes, start):
+        for row in range(start, len(nodes)):
+            nodes[row].row = row
+
+    def _forget(self, node):
+        """Drop a removed node and everything below it from the lookups and watches."""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self._nodes.pop(current.rel_path, None)
+            if current.is_dir:
+                self._unwatch(current)
+                stack.extend(current.children or ())
+
+    def _fetch_wanted(self):
+        if self._wanted_path is None:
+            return
+        rel_path, path = self._wanted_path
+        node = self._root
+        parts = rel_path.split('/') if rel_path else []
+        for depth, name in enumerate(parts):
+            if node.children is None:
+                self._list(node)
+                return  # carry on when it's listed
+            node = self._nodes.get('/'.join(parts[:depth + 1]))
+            if node is None:
+                self._wanted_path = None
+                return  # not there, or ignored
+        self._wanted_path = None
+        self.path_ready.emit(path)
+
+    def _watch(self, node):
+        path = self.filePath(self._index_of(node))
+        if path in self._watched:
+            # Most recently expanded goes last
+            self._watched[path] = self._watched.pop(path)
+            return
+        if self._watcher.addPath(path):
+            self._watched[path] = node
+        while len(self._watched) > MAX_WATCHED_DIRS:
+            oldest = next(iter(self._watched))
+            if self._watched[oldest] is self._root:
+                self._watched[oldest] = self._watched.pop(oldest)
+                oldest = next(iter(self._watched))
+            self._unwatch(self._watched[oldest])
+
+    def _unwatch(self, node):
+        path = self.filePath(self._index_of(node))
+        if self._watched.pop(path, None) is not None:
+            self._watcher.removePath(path)
+            # Changes from now on go unnoticed; list it again when it's next expanded
+            node.stale = True
+
+    def _on_directory_changed(self, path):
+        self._changed_dirs.add(path)
+        self._relist_timer.start(RELIST_DELAY_MS)
+
+    def _relist_changed(self):
+        changed, self._changed_dirs = self._changed_dirs, set()
+        for path in changed:
+            node = self._watched.get(path)
+            if node is not None:
+                self._list(node, again=True)
@@ -1,24 +1,28 @@
 import os
 import webbrowser
 from PySide6.QtWidgets import (QDockWidget, QTreeView, QMenu, QInputDialog, 
-                               QMessageBox, QAbstractItemView, QApplication,
-                                 QFileSystemModel)
-from PySide6.QtCore import Qt, QDir, QModelIndex, QUrl
+                               QMessageBox, QAbstractItemView, QApplication)
+from PySide6.QtCore import Qt, QDir, QModelIndex, QUrl, Signal
 from PySide6.QtGui import QAction, QDesktopServices
+from explorermodel import ExplorerModel
 
 class FileExplorerDock(QDockWidget):
+    root_directory_changed = Signal(str)
+
     def __init__(self, parent=None):
         super().__init__("File Explorer", parent)
         self.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea)
 
-        self.model = QFileSystemModel()
-        self.model.setReadOnly(False)
+        # Lists directories lazily and leaves out ignored files (see explorermodel.py)
+        self.model = ExplorerModel()
+        self.model.path_ready.connect(self._on_path_ready)
+        self._path_to_show = None
 
         self.tree_view = QTreeView()
         self.tree_view.setModel(self.model)
-        self.tree_view.setColumnHidden(1, True)  # size
-        self.tree_view.setColumnHidden(2, True)  # file type
-        self.tree_view.setColumnHidden(3, True)  # last modified date
+        self.tree_view.setUniformRowHeights(True)
+        self.tree_view.expanded.connect(self.model.directory_expanded)
+        self.tree_view.collapsed.connect(self.model.directory_collapsed)
         self.tree_view.setEditTriggers(
             QAbstractItemView.SelectedClicked | QAbstractItemView.EditKeyPressed | QAbstractItemView.DoubleClicked
         )
@@ -34,6 +38,7 @@ class FileExplorerDock(QDockWidget):
         """Set the root directory of the file explorer."""
         self.model.setRootPath(path)
         self.tree_view.setRootIndex(self.model.index(path))
+        self.root_directory_changed.emit(path)
 
     def _on_file_double_clicked(self, index: QModelIndex):
         file_path = self.model.filePath(index)
@@ -99,6 +104,7 @@ class FileExplorerDock(QDockWidget):
                     pass
             except Exception as e:
                 QMessageBox.warning(self, "Error", f"Unable to create file:\n{e}")
+            self.model.refresh(directory_path)
 
     def _create_new_folder(self, directory_path):
         folder_name, ok = QInputDialog.getText(self, "New Folder", "Enter new folder name:")
@@ -108,6 +114,7 @@ class FileExplorerDock(QDockWidget):
                 os.mkdir(new_folder_path)
             except Exception as e:
                 QMessageBox.warning(self, "Error", f"Unable to create folder:\n{e}")
+            self.model.refresh(directory_path)
 
     def _rename_item(self, index):
         self.tree_view.edit(index)
@@ -128,6 +135,7 @@ class FileExplorerDock(QDockWidget):
                     os.remove(file_path)
                 except Exception as e:
                     QMessageBox.warning(self, "Error", f"Unable to delete file:\n{e}")
+            self.model.refresh(os.path.dirname(file_path))
 
     def _open_file_location(self, file_path, is_dir):
         # If is_dir is True, file_path is a directory. If not, get its parent directory.
@@ -147,7 +155,15 @@ class FileExplorerDock(QDockWidget):
 
     def show_file_in_explorer(self, file_path):
         if file_path and os.path.exists(file_path):
-            index = self.model.index(file_path)
-            if index.isValid():
-                self.tree_view.setCurrentIndex(index)
-                self.tree_view.scrollTo(index, QAbstractItemView.PositionAtCenter)
+            # Its directories may not be listed yet; the model says when it's there
+            self._path_to_show = file_path
+            self.model.fetch_path(file_path)
+
+    def _on_path_ready(self, file_path):
+        if file_path != self._path_to_show:
+            return
+        self._path_to_show = None
+        index = self.model.index(file_path)
+        if index.isValid():
+            self.tree_view.setCurrentIndex(index)
+            self.tree_view.scrollTo(index, QAbstractItemView.PositionAtCenter)
@@ -0,0 +1,29 @@
+"""Cheap checks on a file's first few KB, before anything decodes the whole thing."""
+
+BINARY_SNIFF_BYTES = 8192
+# Control characters that turn up in ordinary text files
+_TEXT_CONTROLS = {ord(c) for c in '\t\n\r\f\b\x1b'}
+_BINARY_CONTROLS = bytes(b for b in range(32) if b not in _TEXT_CONTROLS) + b'\x7f'
+
+
+def looks_binary(data):
+    """Guess whether a sample from the start of a file is binary.
+
+    Anything with a NUL byte is, as is a sample where more than 10% of the bytes
+    are control characters text doesn't use. So is a sample that isn't valid
+    UTF-8, since the editor opens text files as UTF-8 and would only fail on it.
+    """
+    if not data:
+        return False
+    if b'\0' in data:
+        return True
+    controls = len(data) - len(data.translate(None, _BINARY_CONTROLS))
+    if controls * 10 > len(data):
+        return True
+    try:
+        # The sample may end halfway through a multi-byte character
+        data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        return e.start < len(data) - 3 or e.reason != 'unexpected end of data'
+    return False
+
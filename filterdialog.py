@@ -0,0 +1,85 @@
+"""The query box and result list shared by the Go to File and Go to Symbol dialogs."""
+import time
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem, QLabel, QApplication
+from PySide6.QtCore import Qt, QEvent
+
+
+class FilterListDialog(QDialog):
+    """Type a query, pick one of the results it matches.
+
+    query(text, limit) returns the results for what's typed, best first;
+    format_result(result) gives the (label, data) of each one's list item; and
+    picking an item closes the dialog and calls pick(data). The results are
+    looked up again whenever one of refresh_signals fires, e.g. as an index
+    fills in. Subclasses say what the status line shows (status_text()) and
+    call update_results() once they're set up.
+    """
+    MAX_RESULTS = 50
+
+    def __init__(self, title, placeholder, query, format_result, pick, refresh_signals=(), parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(640, 420)
+        self.query = query
+        self.format_result = format_result
+        self.pick = pick
+        self._refresh_signals = list(refresh_signals)
+
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText(placeholder)
+        self.result_list = QListWidget()
+        self.status_label = QLabel()
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.query_edit)
+        layout.addWidget(self.result_list)
+        layout.addWidget(self.status_label)
+
+        self.query_edit.textChanged.connect(self.update_results)
+        self.query_edit.returnPressed.connect(self._pick_current)
+        self.result_list.itemActivated.connect(self._pick_current)
+        self.query_edit.installEventFilter(self)
+        for signal in self._refresh_signals:
+            signal.connect(self.update_results)
+
+    def status_text(self, results, seconds):
+        """The line under the results; seconds is how long the query took."""
+        return f"{len(results)} matches in {seconds * 1000:.0f} ms"
+
+    def eventFilter(self, watched, event):
+        # Up/Down/PageUp/PageDown in the query box move through the results
+        if watched is self.query_edit and event.type() == QEvent.KeyPress and \
+                event.key() in (Qt.Key_Up, Qt.Key_Down, Qt.Key_PageUp, Qt.Key_PageDown):
+            QApplication.sendEvent(self.result_list, event)
+            return True
+        return super().eventFilter(watched, event)
+
+    def update_results(self, *args):
+        start = time.perf_counter()
+        results = self.query(self.query_edit.text(), self.MAX_RESULTS)
+        elapsed = time.perf_counter() - start
+
+        self.result_list.clear()
+        for result in results:
+            label, data = self.format_result(result)
+            item = QListWidgetItem(label)
+            item.setData(Qt.UserRole, data)
+            self.result_list.addItem(item)
+        if results:
+            self.result_list.setCurrentRow(0)
+        self.status_label.setText(self.status_text(results, elapsed))
+
+    def _pick_current(self, *args):
+        item = self.result_list.currentItem()
+        if item is None:
+            return
+        data = item.data(Qt.UserRole)
+        self.accept()
+        self.pick(data)
+
+    def done(self, result):
+        for signal in self._refresh_signals:
+            try:
+                signal.disconnect(self.update_results)
+            except (RuntimeError, TypeError):
+                pass
+        super().done(result)
@@ -0,0 +1,259 @@
+"""Find in Files: search every file under the project root from a dock.
+
+The files to search come from walking the root with the ignore rules
+(ignore.py), or, once the trigram index of the root (trigramindex.py) is
+built, from the index: only the files that contain every trigram the pattern
+requires are read. A coordinator job hands them out in chunks to a pool of worker
+processes (textsearch.search_files), so big trees are searched on all cores
+without the GIL in the way, and collects what they find. Results reach the
+dock in batches every BATCH_INTERVAL seconds instead of one signal per match,
+so the tree view isn't rebuilt thousands of times.
+"""
+import os
+import re
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from PySide6.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QCheckBox,
+                               QPushButton, QTreeWidget, QTreeWidgetItem, QLabel)
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, Signal
+from ignore import IgnoreRules, walk_files
+from textsearch import compile_query, search_files
+
+# Files per worker task: enough to make the inter-process round trip worth it
+FILES_PER_TASK = 32
+# Tasks queued per worker process, so the walk doesn't run far ahead of the search
+TASKS_PER_WORKER = 4
+# Results are handed to the dock at most this often
+BATCH_INTERVAL = 0.1
+# The search stops after this many matching lines, and lists at most MAX_MATCHES_PER_FILE per file
+MAX_MATCHES = 20000
+MAX_MATCHES_PER_FILE = 1000
+
+
+class _SearchSignals(QObject):
+    results = Signal(object, object)         # cancel event, [(path, [(line, column, text), ...]), ...]
+    finished = Signal(object, int, int, bool, bool, float, str)  # cancel event, files searched, matches, stopped at MAX_MATCHES, narrowed by the index, seconds, error
+
+class _SearchJob(QRunnable):
+    """Walks the root (or asks the trigram index) and farms the files out to the process pool;
+    runs on a thread of the dock's own pool."""
+    def __init__(self, executor, workers, rules, trigram_index, pattern, cancelled, signals):
+        super().__init__()
+        self.executor = executor
+        self.workers = workers
+        self.rules = rules
+        self.trigram_index = trigram_index  # or None
+        self.pattern = pattern
+        self.cancelled = cancelled  # threading.Event set by the dock
+        self.signals = signals
+
+    def run(self):
+        start = time.perf_counter()
+        searched = matches = 0
+        truncated = False
+        error = ""
+        batch = []
+        last_emit = time.perf_counter()
+        running = {}  # future -> number of files in it
+        candidates = None
+        if self.trigram_index is not None:
+            candidates = self.trigram_index.candidate_paths(self.pattern)
+        if candidates is not None:
+            files = iter(candidates)
+        else:
+            files = (entry.path for _, entry in walk_files(self.rules, self.cancelled))
+        try:
+            while not self.cancelled.is_set():
+                # Keep every worker busy without queueing the whole tree
+                while len(running) < self.workers * TASKS_PER_WORKER:
+                    chunk = [path for _, path in zip(range(FILES_PER_TASK), files)]
+                    if not chunk:
+                        break
+                    running[self.executor.submit(search_files, chunk, self.pattern, MAX_MATCHES_PER_FILE)] = len(chunk)
+                if not running:
+                    break
+                done, _ = wait(running, timeout=BATCH_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    searched += running.pop(future)
+                    for path, found in future.result():
+                        batch.append((path, found))
+                        matches += len(found)
+                if matches >= MAX_MATCHES:
+                    truncated = True
+                    break
+                if batch and time.perf_counter() - last_emit >= BATCH_INTERVAL:
+                    self.signals.results.emit(self.cancelled, batch)
+                    batch = []
+                    last_emit = time.perf_counter()
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            error = str(e) or type(e).__name__
+        for future in running:
+            future.cancel()
+        try:
+            if batch:
+                self.signals.results.emit(self.cancelled, batch)
+            self.signals.finished.emit(self.cancelled, searched, matches, truncated, candidates is not None,
+                                       time.perf_counter() - start, error)
+        except RuntimeError:
+            pass  # the dock was deleted while we were searching
+
+
+class FindInFilesDock(QDockWidget):
+    def __init__(self, parent=None):
+        super().__init__("Find in Files", parent)
+        self.setAllowedAreas(Qt.BottomDockWidgetArea | Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea)
+        self.editor_tabs = None
+        self.trigram_index = None
+        self.root = None
+
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        options = QHBoxLayout()
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Search")
+        self.query_edit.returnPressed.connect(self.start_search)
+        self.regex_box = QCheckBox("Regex")
+        self.case_box = QCheckBox("Match case")
+        self.word_box = QCheckBox("Whole word")
+        self.search_button = QPushButton("Search")
+        self.search_button.clicked.connect(self._on_search_button)
+        options.addWidget(self.query_edit)
+        options.addWidget(self.regex_box)
+        options.addWidget(self.case_box)
+        options.addWidget(self.word_box)
+        options.addWidget(self.search_button)
+
+        self.result_tree = QTreeWidget()
+        self.result_tree.setHeaderHidden(True)
+        self.result_tree.setUniformRowHeights(True)
+        self.result_tree.itemActivated.connect(self._on_item_activated)
+        self.status_label = QLabel()
+
+        layout.addLayout(options)
+        layout.addWidget(self.result_tree)
+        layout.addWidget(self.status_label)
+        self.setWidget(container)
+
+        self._executor = None  # worker processes, started with the first search
+        self._workers = os.cpu_count() or 1
+        self._cancelled = None  # threading.Event of the running search
+        self._file_count = 0
+        self._match_count = 0
+        self._signals = _SearchSignals(self)
+        self._signals.results.connect(self._on_results)
+        self._signals.finished.connect(self._on_finished)
+        # The coordinator mostly waits on the workers; keep it off the global pool
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+
+    def set_editor_tabs(self, editor_tabs):
+        self.editor_tabs = editor_tabs
+
+    def set_trigram_index(self, trigram_index):
+        """Narrow searches down with trigram_index once it has indexed the root."""
+        self.trigram_index = trigram_index
+
+    def set_root_directory(self, path):
+        self.cancel_search()
+        self.root = path
+
+    def focus_query(self, text=""):
+        """Show the dock with the cursor in the search box, prefilled with text if given."""
+        if text:
+            self.query_edit.setText(text)
+        self.show()
+        self.raise_()
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+
+    def start_search(self):
+        self.cancel_search()
+        text = self.query_edit.text()
+        if not text or not self.root:
+            return
+        try:
+            pattern = compile_query(text, self.regex_box.isChecked(), self.case_box.isChecked(),
+                                    self.word_box.isChecked())
+        except re.error as e:
+            self.status_label.setText(f"Invalid regex: {e}")
+            return
+        if pattern.search(''):
+            self.status_label.setText("The pattern matches empty text; it would match everywhere")
+            return
+
+        if self._executor is None:
+            # spawn, not fork: forking a process that runs Qt threads isn't safe
+            self._executor = ProcessPoolExecutor(self._workers, mp_context=multiprocessing.get_context('spawn'))
+        self.result_tree.clear()
+        self._file_count = self._match_count = 0
+        self._cancelled = threading.Event()
+        self.search_button.setText("Cancel")
+        self.status_label.setText("Searching...")
+        self._pool.start(_SearchJob(self._executor, self._workers, IgnoreRules(self.root), self.trigram_index,
+                                    pattern, self._cancelled, self._signals))
+
+    def cancel_search(self):
+        if self._cancelled is not None:
+            self._cancelled.set()
+            self._cancelled = None
+            self.search_button.setText("Search")
+            self.status_label.setText(f"Cancelled: {self._match_count} matches in {self._file_count} files")
+
+    def shutdown(self):
+        """Cancel any search and stop the worker processes."""
+        self.cancel_search()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _on_search_button(self):
+        if self._cancelled is not None:
+            self.cancel_search()
+        else:
+            self.start_search()
+
+    def _on_results(self, cancelled, batch):
+        if cancelled is not self._cancelled:
+            return  # a search that has been cancelled or replaced
+        items = []
+        for path, matches in batch:
+            file_item = QTreeWidgetItem([f"{os.path.relpath(path, self.root)} ({len(matches)})"])
+            for line, column, text in matches:
+                match_item = QTreeWidgetItem([f"{line}: {text}"])
+                match_item.setData(0, Qt.UserRole, (path, line))
+                file_item.addChild(match_item)
+            items.append(file_item)
+            self._match_count += len(matches)
+        self._file_count += len(batch)
+        self.result_tree.addTopLevelItems(items)
+        for item in items:
+            item.setExpanded(True)
+        self.status_label.setText(f"Searching... {self._match_count} matches in {self._file_count} files")
+
+    def _on_finished(self, cancelled, searched, matches, truncated, narrowed, seconds, error):
+        if cancelled is not self._cancelled:
+            return
+        self._cancelled = None
+        self.search_button.setText("Search")
+        if error:
+            self.status_label.setText(f"Search failed: {error}")
+            # A broken pool can't be reused; start afresh next time
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            return
+        status = f"{matches} matches in {self._file_count} files ({searched} files searched in {seconds:.2f} s"
+        status += ", narrowed by the index)" if narrowed else ")"
+        if truncated:
+            status += f"; stopped after {MAX_MATCHES} matches"
+        self.status_label.setText(status)
+
+    def _on_item_activated(self, item, column):
+        location = item.data(0, Qt.UserRole)
+        if location and self.editor_tabs:
+            path, line = location
+            self.editor_tabs.open_file(path, line)
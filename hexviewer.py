@@ -0,0 +1,48 @@
+from PySide6.QtWidgets import QInputDialog
+from PySide6.QtGui import QColor
+from largefile import PagedFileView
+
+BYTES_PER_ROW = 16
+
+
+def format_row(offset, data):
+    """One hex dump row: offset, the bytes in hex, and the printable ones as ASCII."""
+    hex_bytes = ' '.join(f'{b:02x}' for b in data[:8]) + '  ' + ' '.join(f'{b:02x}' for b in data[8:])
+    text = ''.join(chr(b) if 32 <= b < 127 else '.' for b in data)
+    return f'{offset:010x}  {hex_bytes:<{BYTES_PER_ROW * 3}}  |{text}|'
+
+
+class HexView(PagedFileView):
+    """Read-only hex dump of a binary file, a row of BYTES_PER_ROW bytes at a time."""
+    def row_count(self):
+        return (self._size + BYTES_PER_ROW - 1) // BYTES_PER_ROW
+
+    def row_text(self, row):
+        offset = row * BYTES_PER_ROW
+        return format_row(offset, self._data[offset:offset + BYTES_PER_ROW])
+
+    def go_to_offset(self, offset):
+        """Scroll the row holding a byte offset into view and select it."""
+        self._select_row(min(max(0, offset), max(0, self._size - 1)) // BYTES_PER_ROW)
+
+    def _ask_go_to(self):
+        text, ok = QInputDialog.getText(self, "Go to Offset", "Offset (hex):")
+        if ok:
+            try:
+                self.go_to_offset(int(text, 16))
+            except ValueError:
+                pass
+
+    def _content_width(self):
+        return self.fontMetrics().horizontalAdvance(format_row(0, bytes(BYTES_PER_ROW))) + 8
+
+    def _paint_row(self, painter, row, top):
+        metrics = self.fontMetrics()
+        x = 4 - self.horizontalScrollBar().value()
+        baseline = top + metrics.ascent()
+        text = self.row_text(row)
+        # The offset greyed out, like line numbers
+        painter.setPen(QColor("#808080"))
+        painter.drawText(x, baseline, text[:10])
+        painter.setPen(self.palette().text().color())
+        painter.drawText(x + metrics.horizontalAdvance('0' * 10), baseline, text[10:])
@@ -0,0 +1,198 @@
+"""Which files under a project root the project-wide features skip.
+
+A path is ignored if one of its components is in EXCLUDED_NAMES, or if the
+.gitignore files from the root down to its directory say so. The .gitignore
+syntax handled is the usual subset: comments, blank lines, '!' negation,
+trailing '/' for directories only, a leading or inner '/' anchoring the
+pattern to the .gitignore's directory, and the wildcards *, ?, [...] and **.
+"""
+import os
+import re
+
+# Directories and files skipped in every project, .gitignore or not. More names can be
+# given in the IDE_EXCLUDE environment variable, separated like PATH entries
+EXCLUDED_NAMES = {".git", ".hg", ".svn", "__pycache__", "node_modules", ".venv", "venv",
+                  ".mypy_cache", ".pytest_cache", ".tox", ".idea", ".vscode"}
+EXCLUDED_NAMES |= {name for name in os.environ.get("IDE_EXCLUDE", "").split(os.pathsep) if name}
+
+
+def _translate(pattern):
+    """Regex for one .gitignore pattern (without its '!', trailing '/' and leading '/')."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+            continue
+        if char == '*':
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '[':
+            end = pattern.find(']', i + 2)
+            if end < 0:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                parts.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end
+        elif char == '\\' and i + 1 < len(pattern):
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return ''.join(parts)
+
+
+class _GitIgnore:
+    """The patterns of one .gitignore, matched against paths relative to its directory."""
+    def __init__(self, lines):
+        self.patterns = []  # (compiled regex, negate, directories only), in file order
+        for line in lines:
+            line = line.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            anchored = '/' in line
+            body = _translate(line.lstrip('/'))
+            regex = re.compile(('^' if anchored else '(?:^|/)') + body + '$')
+            self.patterns.append((regex, negate, dir_only))
+        # One regex per kind of entry answers "does anything match at all?" for
+        # the many paths nothing does
+        self._any_file = self._combine([p for p in self.patterns if not p[2]])
+        self._any_dir = self._combine(self.patterns)
+
+    @staticmethod
+    def _combine(patterns):
+        if not patterns:
+            return None
+        return re.compile('|'.join(f'(?:{regex.pattern})' for regex, _, _ in patterns))
+
+    def decide(self, rel_path, is_dir):
+        """True (ignore), False (re-include via '!'), or None (no pattern matches)."""
+        any_match = self._any_dir if is_dir else self._any_file
+        if any_match is None or not any_match.search(rel_path):
+            return None
+        for regex, negate, dir_only in reversed(self.patterns):
+            if (is_dir or not dir_only) and regex.search(rel_path):
+                return not negate
+        return None
+
+
+class IgnoreRules:
+    """The ignore rules of one project root.
+
+    .gitignore files are read the first time a path below them is checked and
+    cached; make a new IgnoreRules to pick up edits to them. Safe to use from
+    worker threads.
+    """
+    def __init__(self, root, excluded_names=None):
+        self.root = os.path.abspath(root)
+        self.excluded_names = EXCLUDED_NAMES if excluded_names is None else set(excluded_names)
+        self._gitignores = {}  # relative directory -> _GitIgnore, or None if it has none
+
+    def _gitignore(self, directory):
+        try:
+            return self._gitignores[directory]
+        except KeyError:
+            pass
+        try:
+            with open(os.path.join(self.root, directory, '.gitignore'), encoding='utf-8', errors='replace') as f:
+                gitignore = _GitIgnore(f)
+        except OSError:
+            gitignore = None
+        self._gitignores[directory] = gitignore
+        return gitignore
+
+    def ignored(self, rel_path, is_dir):
+        """Whether an entry is ignored, given that its parent directories are not.
+
+        rel_path is relative to the root with '/' separators. This is what a walk
+        that skips ignored directories needs; ignored_path() checks the parents too.
+        """
+        parts = rel_path.split('/')
+        if parts[-1] in self.excluded_names:
+            return True
+        ignored = False
+        # .gitignore files deeper down override those above them
+        for depth in range(len(parts)):
+            gitignore = self._gitignore('/'.join(parts[:depth]))
+            if gitignore is not None:
+                decision = gitignore.decide('/'.join(parts[depth:]), is_dir)
+                if decision is not None:
+                    ignored = decision
+        return ignored
+
+    def ignored_path(self, rel_path, is_dir=False):
+        """Whether a path or any directory above it is ignored."""
+        parts = rel_path.split('/')
+        for depth in range(1, len(parts)):
+            if self.ignored('/'.join(parts[:depth]), True):
+                return True
+        return self.ignored(rel_path, is_dir)
+
+    def relative(self, path):
+        """path relative to the root with '/' separators, or None if it lies outside."""
+        rel_path = os.path.relpath(os.path.abspath(path), self.root)
+        if rel_path == os.curdir:
+            return ''
+        if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+            return None
+        return rel_path.replace(os.sep, '/')
+
+
+def list_directory(rules, directory):
+    """(file names, subdirectory names) of a directory relative to the root, leaving out
+    ignored entries; None if it can't be read."""
+    files, subdirs = [], []
+    try:
+        with os.scandir(os.path.join(rules.root, directory)) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if not rules.ignored(f"{directory}/{entry.name}" if directory else entry.name, is_dir):
+                    (subdirs if is_dir else files).append(entry.name)
+    except OSError:
+        return None
+    return files, subdirs
+
+
+def walk_files(rules, cancelled=None):
+    """Yield (relative path, os.DirEntry) of every file under the root that isn't ignored."""
+    stack = ['']
+    while stack and not (cancelled and cancelled.is_set()):
+        directory = stack.pop()
+        try:
+            with os.scandir(os.path.join(rules.root, directory)) as scan:
+                entries = list(scan)
+        except OSError:
+            continue
+        for entry in entries:
+            rel_path = f"{directory}/{entry.name}" if directory else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if rules.ignored(rel_path, is_dir):
+                continue
+            if is_dir:
+                stack.append(rel_path)
+            elif entry.is_file():
+                yield rel_path, entry
@@ -0,0 +1,223 @@
+"""Crash-recovery journals for unsaved editor buffers.
+
+Each modified document gets an append-only file in JOURNAL_DIR. It starts with
+a header naming the document's path and a base record, followed by one record
+per edit. The base is either a reference to the file on disk (its size and
+mtime) or a full snapshot of the text:
+
+    header    b'IDEJ' version:u8  path_length:u32  path:utf-8
+    'F'       size:i64  mtime_ns:i64                 base is the file on disk
+    'S'       length:u64  text:utf-8                 base is this text
+    'D'       position:u32  removed:u32  length:u32  inserted:utf-8
+
+Positions and removed counts are in QTextDocument units (UTF-16 code units),
+exactly as contentsChange reports them, so recording an edit costs one small
+write. Once enough deltas pile up the journal is compacted: a snapshot of the
+current text replaces everything before it. Replaying is "take the base, apply
+the deltas"; a record cut short by a crash mid-write is ignored.
+"""
+import hashlib
+import os
+import struct
+import tempfile
+
+JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".ide_journal")
+# Compact once a journal holds this many deltas or this many bytes of them
+COMPACT_AFTER_RECORDS = 2000
+COMPACT_AFTER_BYTES = 1024 * 1024
+
+_MAGIC = b'IDEJ'
+_VERSION = 1
+_HEADER = struct.Struct('<4sBI')
+_FILE_BASE = struct.Struct('<cqq')
+_SNAPSHOT = struct.Struct('<cQ')
+_DELTA = struct.Struct('<cIII')
+
+
+def journal_path_for(file_path):
+    """Where the journal of a document lives; one per absolute path."""
+    digest = hashlib.blake2b(os.path.abspath(file_path).encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(JOURNAL_DIR, digest + '.journal')
+
+
+def list_journals():
+    try:
+        names = os.listdir(JOURNAL_DIR)
+    except FileNotFoundError:
+        return []
+    return [os.path.join(JOURNAL_DIR, name) for name in sorted(names) if name.endswith('.journal')]
+
+
+def _header(file_path):
+    path = os.path.abspath(file_path).encode('utf-8')
+    return _HEADER.pack(_MAGIC, _VERSION, len(path)) + path
+
+
+def _snapshot(text):
+    data = text.encode('utf-8', errors='surrogatepass')
+    return _SNAPSHOT.pack(b'S', len(data)) + data
+
+
+def replay(journal_path, stale_base=False):
+    """Rebuild a document from its journal.
+
+    Returns (file_path, text). text is None if the journal's base was the file
+    on disk and that file has changed or gone since, unless stale_base is set:
+    then the edits are applied to the file as it is now (or to nothing, if it's
+    gone), which recovers them but may not line up. Raises ValueError if the
+    journal isn't one of ours.
+    """
+    with open(journal_path, 'rb') as f:
+        data = f.read()
+    magic, version, path_length = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"not an edit journal: {journal_path}")
+    offset = _HEADER.size
+    file_path = data[offset:offset + path_length].decode('utf-8')
+    offset += path_length
+
+    # The text is kept as UTF-16 so positions can be used as they were recorded
+    buffer = None
+    while offset < len(data):
+        kind = data[offset:offset + 1]
+        if kind == b'F' and offset + _FILE_BASE.size <= len(data):
+            _, size, mtime_ns = _FILE_BASE.unpack_from(data, offset)
+            offset += _FILE_BASE.size
+            try:
+                stat = os.stat(file_path)
+                if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns) and not stale_base:
+                    return file_path, None
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    buffer = bytearray(f.read().encode('utf-16-le', errors='surrogatepass'))
+            except (OSError, UnicodeDecodeError):
+                if not stale_base:
+                    return file_path, None
+                buffer = bytearray()
+        elif kind == b'S' and offset + _SNAPSHOT.size <= len(data):
+            _, length = _SNAPSHOT.unpack_from(data, offset)
+            start = offset + _SNAPSHOT.size
+            if start + length > len(data):
+                break
+            text = data[start:start + length].decode('utf-8', errors='surrogatepass')
+            buffer = bytearray(text.encode('utf-16-le', errors='surrogatepass'))
+            offset = start + length
+        elif kind == b'D' and buffer is not None and offset + _DELTA.size <= len(data):
+            _, position, removed, length = _DELTA.unpack_from(data, offset)
+            start = offset + _DELTA.size
+            if start + length > len(data):
+                break
+            inserted = data[start:start + length].decode('utf-8', errors='surrogatepass')
+            buffer[2 * position:2 * (position + removed)] = inserted.encode('utf-16-le', errors='surrogatepass')
+            offset = start + length
+        else:
+            break  # unknown record, or the tail of a write the crash interrupted
+    if buffer is None:
+        return file_path, None
+    return file_path, buffer.decode('utf-16-le', errors='surrogatepass')
+
+
+class EditJournal:
+    """The journal of one open document.
+
+    record() is called for every change; compaction is split so the snapshot can
+    be written off the GUI thread: begin_compaction() on the GUI thread, then
+    write_compacted() anywhere, then finish_compaction() back on the GUI thread.
+    Edits recorded in between go to the old journal and are carried over.
+    """
+    def __init__(self, file_path, journal_path, handle):
+        self.file_path = file_path
+        self.journal_path = journal_path
+        self._handle = handle
+        self._records = 0
+        self._delta_bytes = 0
+        self._base_stale = False  # the 'F' base no longer matches the file on disk
+        self._pending = None      # deltas recorded while a compaction is running
+
+    @classmethod
+    def create(cls, file_path, text=None, disk_state=None):
+        """Start a journal whose base is text, or if text is None the file on disk as the
+        buffer was loaded from it: disk_state is its (size, mtime_ns) at the time."""
+        os.makedirs(JOURNAL_DIR, exist_ok=True)
+        journal_path = journal_path_for(file_path)
+        if text is None:
+            size, mtime_ns = disk_state
+            base = _FILE_BASE.pack(b'F', size, mtime_ns)
+        else:
+            base = _snapshot(text)
+        handle = open(journal_path, 'wb')
+        handle.write(_header(file_path) + base)
+        handle.flush()
+        return cls(file_path, journal_path, handle)
+
+    @classmethod
+    def reopen(cls, journal_path, file_path):
+        """Carry on appending to a journal that replay() has just rebuilt a document from."""
+        return cls(file_path, journal_path, open(journal_path, 'ab'))
+
+    def record(self, position, removed, inserted):
+        data = inserted.encode('utf-8', errors='surrogatepass')
+        record = _DELTA.pack(b'D', position, removed, len(data)) + data
+        # Flushed straight away: the OS keeps it even if the IDE process dies
+        self._handle.write(record)
+        self._handle.flush()
+        self._records += 1
+        self._delta_bytes += len(record)
+        if self._pending is not None:
+            self._pending.append(record)
+
+    def base_changed(self):
+        """The file on disk was rewritten while edits are still unsaved; compact soon."""
+        self._base_stale = True
+
+    def needs_compaction(self):
+        return self._pending is None and (
+            self._base_stale or self._records >= COMPACT_AFTER_RECORDS
+            or self._delta_bytes >= COMPACT_AFTER_BYTES)
+
+    def is_compacting(self):
+        return self._pending is not None
+
+    def begin_compaction(self):
+        """Call with the document's text taken at the same moment."""
+        self._pending = []
+
+    def write_compacted(self, text):
+        """Write header + snapshot of text to a temp file next to the journal; safe off the GUI thread."""
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=JOURNAL_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_header(self.file_path) + _snapshot(text))
+            f.flush()
+            os.fsync(f.fileno())
+        return temp_path
+
+    def finish_compaction(self, temp_path):
+        """Swap the compacted journal in, keeping the edits recorded since begin_compaction()."""
+        pending, self._pending = self._pending, None
+        if self._handle.closed:
+            os.unlink(temp_path)  # discarded meanwhile
+            return
+        with open(temp_path, 'ab') as f:
+            f.write(b''.join(pending))
+        self._handle.close()
+        os.replace(temp_path, self.journal_path)
+        self._handle = open(self.journal_path, 'ab')
+        self._records = len(pending)
+        self._delta_bytes = sum(map(len, pending))
+        self._base_stale = False
+
+    def abort_compaction(self, temp_path=None):
+        self._pending = None
+        if temp_path:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+    def discard(self):
+        """The buffer was saved or thrown away: the journal has nothing left to recover."""
+        if not self._handle.closed:
+            self._handle.close()
+        try:
+            os.unlink(self.journal_path)
+        except FileNotFoundError:
+            pass
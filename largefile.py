@@ -0,0 +1,365 @@
+import abc
+import mmap
+import threading
+from array import array
+from itertools import accumulate, islice
+from PySide6.QtWidgets import QAbstractScrollArea, QAbstractSlider, QInputDialog, QApplication
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtGui import QPainter, QFontDatabase, QKeySequence, QColor
+from filesniff import looks_binary, BINARY_SNIFF_BYTES
+
+# Files at least this big open in a LargeFileView instead of a QPlainTextEdit
+LARGE_FILE_BYTES = 64 * 1024 * 1024
+# How much of the file the indexer scans between progress reports
+INDEX_CHUNK_BYTES = 8 * 1024 * 1024
+# Lines longer than this are cut off on screen (a 500 MB one-line file still scrolls)
+MAX_LINE_BYTES = 16 * 1024
+# Rows copied at most in one go
+MAX_COPY_ROWS = 100_000
+
+
+def index_line_starts(data, base=0):
+    """Offsets (relative to the file, i.e. plus base) of the lines that start after each b'\\n' in data."""
+    parts = data.split(b'\n')
+    offsets = accumulate(map(len, parts[:-1]), lambda total, n: total + n + 1, initial=base)
+    return array('Q', islice(offsets, 1, None))
+
+
+class _IndexJobSignals(QObject):
+    chunk_indexed = Signal(object, int)  # array of line starts, bytes scanned so far
+    finished = Signal()
+    binary = Signal()  # the file isn't text; scanning stopped at the first chunk
+
+class _IndexJob(QRunnable):
+    """Scans a file for line starts on a QThreadPool thread, one chunk at a time."""
+    def __init__(self, file_path, cancelled, signals):
+        super().__init__()
+        self.file_path = file_path
+        self.cancelled = cancelled  # threading.Event set by the view
+        self.signals = signals
+
+    def run(self):
+        try:
+            with open(self.file_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                size = len(data)
+                position = 0
+                if looks_binary(data[:BINARY_SNIFF_BYTES]):
+                    self.signals.binary.emit()
+                    return
+                while position < size and not self.cancelled.is_set():
+                    end = min(size, position + INDEX_CHUNK_BYTES)
+                    starts = index_line_starts(data[position:end], position)
+                    position = end
+                    self.signals.chunk_indexed.emit(starts, position)
+            self.signals.finished.emit()
+        except (OSError, ValueError, RuntimeError):
+            pass  # file vanished, or the view was deleted while we were scanning
+
+
+class PagedView(QAbstractScrollArea):
+    """Read-only view shown a row at a time, with a row or range of rows selected.
+
+    Only the rows in the viewport are ever read, so showing and scrolling cost
+    the same however many rows there are. The vertical scroll bar counts rows.
+    Subclasses say what the rows are (row_count(), row_text(), _paint_row()),
+    and can change how wide they get (_content_width()) and where Ctrl+G goes
+    (_ask_go_to()). Clicking selects a row, dragging or shift-clicking a range.
+    A subclass that leaves out one of the abstract methods can't be created.
+    """
+    def __init__(self, parent=None):
+        # Shiboken's metaclass can't be combined with ABCMeta, so the abstract methods are checked here
+        missing = [name for name in ('_paint_row', 'row_count', 'row_text')
+                   if getattr(getattr(type(self), name), '__isabstractmethod__', False)]
+        if missing:
+            raise TypeError(f"Can't instantiate abstract class {type(self).__name__} without {', '.join(missing)}")
+        super().__init__(parent)
+        self._anchor_row = None   # selection: rows from _anchor_row to _current_row
+        self._current_row = None
+        self._widest = 0          # widest row measured so far, in pixels
+
+        self.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport().update)
+
+    @abc.abstractmethod
+    def row_count(self):
+        """Rows in the view."""
+
+    @abc.abstractmethod
+    def row_text(self, row):
+        """Text of a 0-based row, e.g. for copying."""
+
+    def selected_text(self):
+        """The selected rows, at most MAX_COPY_ROWS of them."""
+        if self._current_row is None:
+            return ''
+        first, last = sorted((self._anchor_row, self._current_row))
+        last = min(last + 1, first + MAX_COPY_ROWS, self.row_count())
+        return '\n'.join(self.row_text(row) for row in range(first, last))
+
+    def copy(self):
+        """Copy the selected rows to the clipboard."""
+        if self._current_row is not None:
+            QApplication.clipboard().setText(self.selected_text())
+
+    def _select_row(self, row):
+        """Select a row and scroll it into view if it isn't already."""
+        self._anchor_row = self._current_row = row
+        rows = self._visible_rows()
+        first = self.verticalScrollBar().value()
+        if not first <= row < first + rows:
+            self.verticalScrollBar().setValue(row - rows // 3)
+        self.viewport().update()
+
+    def _is_selected(self, row):
+        if self._current_row is None:
+            return False
+        return min(self._anchor_row, self._current_row) <= row <= max(self._anchor_row, self._current_row)
+
+    def _visible_rows(self):
+        return max(1, self.viewport().height() // self.fontMetrics().lineSpacing())
+
+    def _row_at(self, y):
+        """The row at y pixels down the viewport, or the last one below it."""
+        row = self.verticalScrollBar().value() + int(y) // self.fontMetrics().lineSpacing()
+        return max(0, min(row, self.row_count() - 1))
+
+    def _content_width(self):
+        """How wide the rows are, in pixels, for the horizontal scroll bar."""
+        # Only the rows on screen are measured, so the width grows as you scroll
+        first = self.verticalScrollBar().value()
+        char_width = self.fontMetrics().horizontalAdvance('M')
+        for row in range(first, min(first + self._visible_rows() + 1, self.row_count())):
+            self._widest = max(self._widest, len(self.row_text(row)) * char_width)
+        return self._widest
+
+    def _ask_go_to(self):
+        """Ctrl+G: ask where to go, and go there."""
+
+    def _on_scrolled(self, value):
+        self._update_scrollbars()
+        self.viewport().update()
+
+    def _update_scrollbars(self):
+        rows = self._visible_rows()
+        vertical = self.verticalScrollBar()
+        vertical.setPageStep(rows)
+        vertical.setRange(0, max(0, self.row_count() - rows))
+        horizontal = self.horizontalScrollBar()
+        horizontal.setPageStep(self.viewport().width())
+        horizontal.setRange(0, max(0, self._content_width() - self.viewport().width()))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scrollbars()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        painter.fillRect(event.rect(), palette.base())
+        line_height = self.fontMetrics().lineSpacing()
+        width = self.viewport().width()
+        first = self.verticalScrollBar().value()
+        last = min(first + self._visible_rows() + 1, self.row_count())
+        for row_on_screen, row in enumerate(range(first, last)):
+            top = row_on_screen * line_height
+            if self._is_selected(row):
+                painter.fillRect(0, top, width, line_height, palette.alternateBase())
+            self._paint_row(painter, row, top)
+        self._paint_overlay(painter)
+        painter.end()
+
+    @abc.abstractmethod
+    def _paint_row(self, painter, row, top):
+        """Draw a row whose line on screen starts top pixels down."""
+
+    def _paint_overlay(self, painter):
+        """Draw whatever goes over the rows, e.g. progress."""
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self.row_count():
+            row = self._row_at(event.position().y())
+            if not (event.modifiers() & Qt.ShiftModifier and self._anchor_row is not None):
+                self._anchor_row = row
+            self._current_row = row
+            self.viewport().update()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton and self._anchor_row is not None and self.row_count():
+            self._current_row = self._row_at(event.position().y())
+            self.viewport().update()
+        super().mouseMoveEvent(event)
+
+    def keyPressEvent(self, event):
+        vertical = self.verticalScrollBar()
+        key = event.key()
+        if event.matches(QKeySequence.Copy):
+            self.copy()
+        elif key == Qt.Key_G and event.modifiers() & Qt.ControlModifier:
+            self._ask_go_to()
+        elif key == Qt.Key_Up:
+            vertical.triggerAction(QAbstractSlider.SliderSingleStepSub)
+        elif key == Qt.Key_Down:
+            vertical.triggerAction(QAbstractSlider.SliderSingleStepAdd)
+        elif key == Qt.Key_PageUp:
+            vertical.triggerAction(QAbstractSlider.SliderPageStepSub)
+        elif key == Qt.Key_PageDown:
+            vertical.triggerAction(QAbstractSlider.SliderPageStepAdd)
+        elif key == Qt.Key_Home and event.modifiers() & Qt.ControlModifier:
+            vertical.setValue(vertical.minimum())
+        elif key == Qt.Key_End and event.modifiers() & Qt.ControlModifier:
+            vertical.setValue(vertical.maximum())
+        else:
+            super().keyPressEvent(event)
+
+
+class PagedFileView(PagedView):
+    """PagedView of a memory-mapped file, for rows read straight from the mapping."""
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._data = b''  # empty files can't be mapped
+        except OSError:
+            self._file.close()
+            raise
+        self._size = len(self._data)
+
+    def close_file(self):
+        """Release the mapping. The view shows nothing afterwards."""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b''
+        self._size = 0
+        self._file.close()
+        self._anchor_row = self._current_row = None
+        self._update_scrollbars()
+        self.viewport().update()
+
+
+class LargeFileView(PagedFileView):
+    """Read-only view of a file too big for a QPlainTextEdit.
+
+    The file is memory-mapped and never decoded as a whole: a background job
+    builds an index of line start offsets, and paintEvent decodes just the lines
+    in the viewport. Rows are lines, so scrolling and go_to_line() cost the same
+    whatever the file size.
+    """
+    line_count_changed = Signal(int)
+    indexing_finished = Signal()
+    binary_found = Signal()  # the indexer found the file isn't text, e.g. to show it as hex instead
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(file_path, parent)
+        self._starts = array('Q', [0])  # offset of each line indexed so far
+        self._indexed_bytes = 0
+        self._indexing = True
+        self._pending_line = None  # go_to_line() target not indexed yet
+
+        self._index_signals = _IndexJobSignals(self)
+        self._index_signals.chunk_indexed.connect(self._on_chunk_indexed)
+        self._index_signals.finished.connect(self._on_indexing_finished)
+        self._index_signals.binary.connect(self._on_binary)
+        self._index_cancelled = threading.Event()
+        QThreadPool.globalInstance().start(
+            _IndexJob(file_path, self._index_cancelled, self._index_signals))
+
+    def close_file(self):
+        """Stop indexing and release the mapping. The view shows nothing afterwards."""
+        self._index_cancelled.set()
+        self._starts = array('Q', [0])
+        super().close_file()
+
+    def line_count(self):
+        """Number of lines indexed so far (all of them once indexing has finished)."""
+        return len(self._starts)
+
+    row_count = line_count
+
+    def is_indexing(self):
+        return self._indexing
+
+    def line_text(self, line):
+        """Text of a 0-based line, cut off at MAX_LINE_BYTES."""
+        start = self._starts[line]
+        if line + 1 < len(self._starts):
+            end = self._starts[line + 1] - 1
+        else:
+            # Last line we know of: its end may lie beyond what has been indexed
+            end = self._data.find(b'\n', start, start + MAX_LINE_BYTES + 1)
+            if end < 0:
+                end = self._size
+        end = min(end, start + MAX_LINE_BYTES)
+        text = self._data[start:end].decode('utf-8', errors='replace')
+        return text.rstrip('\r').expandtabs(4)
+
+    row_text = line_text
+
+    def go_to_line(self, line):
+        """Scroll a 1-based line into view and select it, as soon as it has been indexed."""
+        target = max(0, line - 1)
+        if target >= len(self._starts):
+            if self._indexing:
+                self._pending_line = line
+                return
+            target = len(self._starts) - 1
+        self._pending_line = None
+        self._select_row(target)
+
+    def _ask_go_to(self):
+        line, ok = QInputDialog.getInt(self, "Go to Line", "Line:", 1, 1, max(1, len(self._starts)))
+        if ok:
+            self.go_to_line(line)
+
+    def _gutter_width(self):
+        digits = len(str(len(self._starts)))
+        return self.fontMetrics().horizontalAdvance('9') * (digits + 2)
+
+    def _on_chunk_indexed(self, starts, indexed_bytes):
+        if self._file.closed:
+            return
+        self._starts.extend(starts)
+        self._indexed_bytes = indexed_bytes
+        self._update_scrollbars()
+        self.line_count_changed.emit(len(self._starts))
+        if self._pending_line is not None and self._pending_line <= len(self._starts):
+            self.go_to_line(self._pending_line)
+
+    def _on_indexing_finished(self):
+        self._indexing = False
+        if self._pending_line is not None:
+            self.go_to_line(self._pending_line)
+        self.viewport().update()
+        self.indexing_finished.emit()
+
+    def _on_binary(self):
+        self._indexing = False
+        self.binary_found.emit()
+
+    def _content_width(self):
+        return super()._content_width() + self._gutter_width()
+
+    def _paint_row(self, painter, line, top):
+        metrics = self.fontMetrics()
+        line_height = metrics.lineSpacing()
+        gutter = self._gutter_width()
+        painter.setPen(self.palette().text().color())
+        painter.setClipRect(gutter, top, self.viewport().width() - gutter, line_height)
+        painter.drawText(gutter - self.horizontalScrollBar().value(), top + metrics.ascent(), self.line_text(line))
+        painter.setClipping(False)
+        painter.setPen(QColor("#808080"))
+        painter.drawText(0, top, gutter - metrics.horizontalAdvance('9'), line_height,
+                         Qt.AlignRight | Qt.AlignVCenter, str(line + 1))
+
+    def _paint_overlay(self, painter):
+        if self._indexing and self._size:
+            painter.setPen(QColor("#808080"))
+            percent = self._indexed_bytes * 100 // self._size
+            painter.drawText(self.viewport().rect().adjusted(0, 0, -4, -2),
+                             Qt.AlignRight | Qt.AlignBottom, f"Indexing lines... {percent}%")
@@ -0,0 +1,457 @@
+"""Line-oriented lexers used by the syntax highlighters in editor.py.
+
+A lexer works on one line (one QTextBlock) at a time: ``lex_line(text, state)``
+takes the text of the line plus the state the previous line ended in, and
+returns ``(spans, new_state)`` where spans is a list of
+``(start, length, kind)`` tuples and kind is a key into the highlighter's
+format table.  States are plain non-negative ints so they can be stored with
+``QSyntaxHighlighter.setCurrentBlockState``; a negative state (Qt's "unset")
+is treated as the initial state.
+
+Nothing in here depends on Qt.
+"""
+import re
+import threading
+from collections import OrderedDict
+from itertools import accumulate
+
+class LineIndex:
+    """Start offset and length of every line in one snapshot of a document.
+
+    Built with a single scan of the text, so mapping lines (or blocks) to
+    offsets is a list lookup instead of a ``splitlines()`` per token.
+    """
+
+    def __init__(self, text, revision=None):
+        self.text = text
+        self.revision = revision
+        self.lengths = [len(line) for line in text.split('\n')]
+        self.starts = [0]
+        self.starts.extend(accumulate(length + 1 for length in self.lengths[:-1]))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def line(self, line_no):
+        start = self.starts[line_no]
+        return self.text[start:start + self.lengths[line_no]]
+
+
+class LexCache:
+    """LRU cache of ``lex_line`` results shared by every highlighter.
+
+    Entries are keyed by (language, entry state, line text), so a
+    line that was lexed once - in this tab, another tab, or a file opened
+    earlier - costs a dict lookup the next time it is seen with the same entry
+    state. Safe to use from the highlight worker threads.
+
+    ``max_bytes`` is an estimate of the memory the entries use, not an exact
+    measure; the least recently used entries are evicted above it.
+    """
+
+    ENTRY_BYTES = 200  # key, node and result tuple overhead, roughly
+    SPAN_BYTES = 100
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lex_line(self, lexer, text, state, next_text=None):
+        if next_text is not None:
+            # Lines that peek at the next line can't be keyed on their own text
+            return lexer.lex_line(text, state, next_text)
+        if state < 0:
+            state = lexer.initial_state()
+        # The text itself, not a hash of it: two lines that collide must not share spans
+        key = (lexer.language, state, text)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+        spans, end_state = lexer.lex_line(text, state)
+        result = (tuple(spans), end_state)
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries:
+                self._entries[key] = result
+                self.size_bytes += self._entry_bytes(text, spans)
+                self._evict()
+        return result
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self.size_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _evict(self):
+        while self.size_bytes > self.max_bytes and self._entries:
+            (_, _, text), (spans, _) = self._entries.popitem(last=False)
+            self.size_bytes -= self._entry_bytes(text, spans)
+
+    def _entry_bytes(self, text, spans):
+        # The key holds on to the line's text, too
+        return self.ENTRY_BYTES + self.SPAN_BYTES * len(spans) + len(text)
+
+
+def lex_document(lexer, index, first_line=0, state=-1, cache=None):
+    """Lex every line of ``index`` from ``first_line`` on.
+
+    ``state`` is the state the line before ``first_line`` ended in. Returns a
+    list with one ``(spans, end_state)`` tuple per lexed line. With a
+    LexCache, lines are looked up there first.
+    """
+    results = []
+    lex_line = lexer.lex_line
+    if cache is not None:
+        def lex_line(text, state, next_text):
+            return cache.lex_line(lexer, text, state, next_text)
+    last_line = len(index) - 1
+    for line_no in range(first_line, last_line + 1):
+        text = index.line(line_no)
+        next_text = None
+        if text.endswith('\\') and line_no < last_line:
+            next_text = index.line(line_no + 1)
+        spans, state = lex_line(text, state, next_text)
+        results.append((spans, state))
+    return results
+
+
+PYTHON_KEYWORDS = {
+    "False", "class", "finally", "is", "return",
+    "None", "continue", "for", "lambda", "try",
+    "True", "def", "from", "nonlocal", "while",
+    "and", "del", "global", "not", "with",
+    "as", "elif", "if", "or", "yield",
+    "assert", "else", "import", "pass",
+    "break", "except", "in", "raise"
+}
+
+PYTHON_BUILTINS = {
+    "print", "range", "len", "dict", "list", "int", "float",
+    "str", "bool", "set", "tuple", "input", "open"
+}
+
+# String prefixes and number grammar follow the tokenize module, so tokens are
+# classified exactly the way the old tokenize-based highlighter did it.
+_STRING_PREFIX = r'(?:[bB][rR]?|[rR][bBfF]?|[uU]|[fF][rR]?)?'
+_DIGITS = r'[0-9](?:_?[0-9])*'
+_EXPONENT = r'[eE][-+]?' + _DIGITS
+_POINTFLOAT = r'(?:%s\.(?:%s)?|\.%s)(?:%s)?' % (_DIGITS, _DIGITS, _DIGITS, _EXPONENT)
+_FLOATNUMBER = r'(?:%s|%s%s)' % (_POINTFLOAT, _DIGITS, _EXPONENT)
+_INTNUMBER = (r'(?:0[xX](?:_?[0-9a-fA-F])+|0[bB](?:_?[01])+|0[oO](?:_?[0-7])+'
+              r'|0(?:_?0)*|[1-9](?:_?[0-9])*)')
+_NUMBER = r'(?:%s[jJ]|%s[jJ]|%s|%s)' % (_DIGITS, _FLOATNUMBER, _FLOATNUMBER, _INTNUMBER)
+
+_PY_TOKEN = re.compile(r'''
+    [ \f\t]*
+    (?:
+        (?P<comment>\#.*)
+      | (?P<triple>%(prefix)s(?:\'\'\'|"""))
+      | (?P<number>%(number)s)
+      | (?P<string>%(prefix)s(?:'[^'\\]*(?:\\.[^'\\]*)*(?:'|\\$)
+                              |"[^"\\]*(?:\\.[^"\\]*)*(?:"|\\$)))
+      | (?P<name>\w+)
+      | (?P<op>\.\.\.|.)
+    )''' % {'prefix': _STRING_PREFIX, 'number': _NUMBER}, re.VERBOSE)
+
+_OPEN_PAREN = re.compile(r'[ \f\t]*\(')
+
+# Values of the "open string" part of the Python lexer state.
+_NO_STRING = 0
+_TRIPLE_SINGLE = 1   # inside '''...
+_TRIPLE_DOUBLE = 2   # inside """...
+_CONT_SINGLE = 3     # inside '... continued with a trailing backslash
+_CONT_DOUBLE = 4     # inside "... continued with a trailing backslash
+
+_STRING_END = {
+    _TRIPLE_SINGLE: re.compile(r"[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''"),
+    _TRIPLE_DOUBLE: re.compile(r'[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""'),
+    _CONT_SINGLE: re.compile(r"[^'\\]*(?:\\.[^'\\]*)*'"),
+    _CONT_DOUBLE: re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"'),
+}
+
+_STRING_MASK = 0x7
+# Set when the line ended with "name \" and the next line starts with "(",
+# i.e. the call's opening parenthesis is waiting at the start of the next line.
+_CALL_PENDING = 0x8
+_CALL_SHIFT = 4
+_MAX_CALL_DEPTH = (1 << 24) - 1
+
+
+class PythonLexer:
+    """Incremental Python lexer.
+
+    The state handed from line to line packs two things:
+
+    * the kind of string still open at the end of the line (a triple-quoted
+      string, or a single-quoted one continued with a backslash), and
+    * the parenthesis depth inside the function call we are colouring
+      arguments for (0 when we are not inside a call).
+
+    That is everything that can change the colours of the following lines,
+    so a line only has to be re-lexed when its own text or its entry state
+    changes.  The one exception is a line ending in ``name \\``: whether the
+    name is a call depends on the next line starting with "(", so for such
+    lines the caller passes the next line's text as ``next_text``.
+    """
+
+    language = "python"
+
+    def __init__(self, keywords=None, builtins=None):
+        self.keywords = PYTHON_KEYWORDS if keywords is None else keywords
+        self.builtins = PYTHON_BUILTINS if builtins is None else builtins
+
+    def initial_state(self):
+        return 0
+
+    def lex_line(self, text, state, next_text=None):
+        if state < 0:
+            state = 0
+        string_kind = state & _STRING_MASK
+        call_depth = state >> _CALL_SHIFT
+        call_pending = False
+        last_name = None  # (start, end, span index) of a trailing plain name
+        spans = []
+        pos = 0
+        end = len(text)
+
+        if state & _CALL_PENDING:
+            paren = _OPEN_PAREN.match(text)
+            if paren is not None:
+                call_depth = 1
+                pos = paren.end()
+
+        if string_kind:
+            # Continue the string left open by the previous line
+            match = _STRING_END[string_kind].match(text)
+            if match is None:
+                if end:
+                    spans.append((0, end, 'string'))
+                if string_kind >= _CONT_SINGLE and not text.endswith('\\'):
+                    string_kind = _NO_STRING
+                return spans, self._pack(string_kind, call_depth, False)
+            spans.append((0, match.end(), 'string'))
+            pos = match.end()
+            string_kind = _NO_STRING
+
+        while pos < end:
+            match = _PY_TOKEN.match(text, pos)
+            if match is None:
+                break  # only trailing whitespace left
+            kind = match.lastgroup
+            start, pos = match.span(kind)
+            name, last_name = last_name, None
+
+            if kind == 'name':
+                word = match.group(kind)
+                if not word[0].isidentifier():
+                    continue
+                if call_depth == 1:
+                    # Names directly inside a call's parentheses are arguments
+                    spans.append((start, pos - start, 'builtin'))
+                elif call_depth == 0:
+                    paren = _OPEN_PAREN.match(text, pos)
+                    if paren is not None:
+                        # NAME followed by "(" => function call
+                        spans.append((start, pos - start, 'builtin'))
+                        call_depth = 1
+                        pos = paren.end()
+                    else:
+                        last_name = (start, pos, len(spans))
+                        if word in self.keywords:
+                            spans.append((start, pos - start, 'keyword'))
+                        elif word in self.builtins:
+                            spans.append((start, pos - start, 'builtin'))
+                elif word in self.keywords:
+                    spans.append((start, pos - start, 'keyword'))
+                elif word in self.builtins:
+                    spans.append((start, pos - start, 'builtin'))
+            elif kind == 'op':
+                char = text[start]
+                if call_depth:
+                    if char == '(':
+                        call_depth += 1
+                    elif char == ')':
+                        call_depth -= 1
+                elif (char == '\\' and pos == end and name is not None
+                      and next_text is not None
+                      and _OPEN_PAREN.match(next_text) is not None):
+                    # "name \" continued into "(": a call split across lines
+                    name_start, name_end, index = name
+                    span = (name_start, name_end - name_start, 'builtin')
+                    if index < len(spans):
+                        spans[index] = span
+                    else:
+                        spans.append(span)
+                    call_pending = True
+            elif kind == 'comment':
+                spans.append((start, pos - start, 'comment'))
+            elif kind == 'number':
+                spans.append((start, pos - start, 'number'))
+            elif kind == 'string':
+                spans.append((start, pos - start, 'string'))
+                if text[pos - 1] == '\\':
+                    # Backslash-continued single-quoted string
+                    quote = text[start:pos].lstrip('bBrRuUfF')[0]
+                    string_kind = _CONT_SINGLE if quote == "'" else _CONT_DOUBLE
+            else:  # triple
+                string_kind = _TRIPLE_SINGLE if text[pos - 1] == "'" else _TRIPLE_DOUBLE
+                match = _STRING_END[string_kind].match(text, pos)
+                if match is None:
+                    spans.append((start, end - start, 'string'))
+                    break
+                string_kind = _NO_STRING
+                pos = match.end()
+                spans.append((start, pos - start, 'string'))
+
+        return spans, self._pack(string_kind, call_depth, call_pending)
+
+    def _pack(self, string_kind, call_depth, call_pending):
+        state = string_kind | (min(call_depth, _MAX_CALL_DEPTH) << _CALL_SHIFT)
+        if call_pending:
+            state |= _CALL_PENDING
+        return state
+
+
+C_KEYWORDS = {
+    "auto","break","case","char","const","continue","default","do","double",
+    "else","enum","extern","float","for","goto","if","inline","int","long",
+    "register","restrict","return","short","signed","sizeof","static","struct",
+    "switch","typedef","union","unsigned","void","volatile","while"
+}
+
+# Built-in types or synonyms
+C_TYPES = {
+    "int","float","double","char","long","short","signed","unsigned","void"
+}
+
+# Directive at the start of a line, e.g. "#include" or "# define"
+_C_DIRECTIVE = re.compile(r'[ \t]*#[ \t]*(\w*)')
+_C_INCLUDE_HEADER = re.compile(r'[ \t]*<[^>]*>')
+
+# One pattern for everything we colour; re.search skips whitespace and
+# operators for us. Alternatives are tried left to right, which gives the
+# precedence: comments, then string and char literals, then numbers and names.
+_C_TOKEN = re.compile(r'''
+    (?P<block_comment>/\*)
+  | (?P<comment>//.*)
+  | (?P<string>"(?:[^"\\]|\\.)*(?:"|\\?$))
+  | (?P<char>'(?:[^'\\]|\\.)+')
+  | (?P<number>(?:0[xX][0-9a-fA-F']+|(?:[0-9][0-9']*(?:\.[0-9']*)?|\.[0-9][0-9']*)(?:[eE][-+]?[0-9]+)?)[uUlLfF]*)
+  | (?P<identifier>[A-Za-z_]\w*)
+  | (?P<paren>[()])
+''', re.VERBOSE)
+_C_CALL_PAREN = re.compile(r'\s*\(')
+
+# C lexer states
+_C_NORMAL = 0
+_C_IN_COMMENT = 1
+
+
+class CLexer:
+    """Single-pass C lexer. The only state carried between lines is whether we
+    are inside a /* ... */ comment.
+    """
+
+    language = "c"
+
+    def __init__(self, keywords=None, types=None):
+        self.keywords = C_KEYWORDS if keywords is None else keywords
+        self.types = C_TYPES if types is None else types
+
+    def initial_state(self):
+        return _C_NORMAL
+
+    def lex_line(self, text, state, next_text=None):
+        spans = []
+        pos = 0
+        end = len(text)
+
+        if state == _C_IN_COMMENT:
+            close_idx = text.find("*/")
+            if close_idx == -1:
+                if end:
+                    spans.append((0, end, "comment"))
+                return spans, _C_IN_COMMENT
+            pos = close_idx + 2
+            spans.append((0, pos, "comment"))
+        else:
+            directive = _C_DIRECTIVE.match(text)
+            if directive is not None:
+                # The whole line takes the directive colour; tokens after the
+                # directive name are still lexed on top of it.
+                spans.append((0, end, "directive"))
+                pos = directive.end()
+                if directive.group(1) == "include":
+                    header = _C_INCLUDE_HEADER.match(text, pos)
+                    if header is not None:
+                        start = header.end() - len(header.group().lstrip())
+                        spans.append((start, header.end() - start, "string"))
+                        pos = header.end()
+
+        parens = []  # True for each open "(" that belongs to a function call
+        while pos < end:
+            match = _C_TOKEN.search(text, pos)
+            if match is None:
+                break
+            kind = match.lastgroup
+            start, pos = match.span()
+
+            if kind == "identifier":
+                word = match.group()
+                if word in self.types:
+                    spans.append((start, pos - start, "type"))
+                elif word in self.keywords:
+                    spans.append((start, pos - start, "keyword"))
+                else:
+                    paren = _C_CALL_PAREN.match(text, pos)
+                    if paren is not None:
+                        spans.append((start, pos - start, "function"))
+                        parens.append(True)
+                        pos = paren.end()
+                    elif parens and parens[-1]:
+                        spans.append((start, pos - start, "argument"))
+            elif kind == "paren":
+                if text[start] == "(":
+                    parens.append(False)
+                elif parens:
+                    parens.pop()
+            elif kind == "block_comment":
+                close_idx = text.find("*/", pos)
+                if close_idx == -1:
+                    # highlight until end of line
+                    spans.append((start, end - start, "comment"))
+                    return spans, _C_IN_COMMENT
+                pos = close_idx + 2
+                spans.append((start, pos - start, "comment"))
+            elif kind == "char":
+                spans.append((start, pos - start, "string"))
+            else:
+                # comment, string or number
+                spans.append((start, pos - start, kind))
+
+        return spans, _C_NORMAL
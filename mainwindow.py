@@ -1,12 +1,22 @@
 import os
+import sys
+import time
 import shlex
+import subprocess
 from PySide6.QtWidgets import QMainWindow, QDockWidget, QPlainTextEdit, QListWidget, QFileDialog
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QKeySequence, QAction
 from editor import EditorTabs
 from fileexplorer import FileExplorerDock
 from terminal import TerminalDock
 from outline import OutlineDock  # <--- Import your OutlineDock
+from symbolindex import SymbolIndex, WorkspaceSymbolDialog
+from quickopen import PathIndex, QuickOpenDialog
+from findinfiles import FindInFilesDock
+from trigramindex import TrigramIndex
+from problems import ProblemsDock
+import buildcache
+import warmpool
 
 class IDEMainWindow(QMainWindow):
     def __init__(self):
@@ -19,12 +29,36 @@ class IDEMainWindow(QMainWindow):
         self.editor_tabs = EditorTabs()
         self.setCentralWidget(self.editor_tabs)
         self.editor_tabs.currentChanged.connect(self._on_tab_changed)
+        self.editor_tabs.file_loaded.connect(self._on_file_loaded)
+        self.editor_tabs.file_saved.connect(self._on_file_saved)
+        self.editor_tabs.save_failed.connect(self._on_save_failed)
 
         # File Explorer on the left
         self.file_explorer_dock = FileExplorerDock(self)
         self.file_explorer_dock.file_double_clicked = self.editor_tabs.open_file
         self.addDockWidget(Qt.LeftDockWidgetArea, self.file_explorer_dock)
 
+        # Symbols of the whole project, for Go to Symbol in Workspace
+        self.symbol_index = SymbolIndex(self)
+        self.symbol_index.progress.connect(self._on_symbol_index_progress)
+        self.symbol_index.indexing_finished.connect(self._on_symbol_index_finished)
+        self.file_explorer_dock.root_directory_changed.connect(self.symbol_index.set_root)
+        self.symbol_index.set_root(self.file_explorer_dock.model.rootPath())
+        # Every file path under the root, for Ctrl+P
+        self.path_index = PathIndex(self)
+        self.file_explorer_dock.root_directory_changed.connect(self.path_index.set_root)
+        self.path_index.set_root(self.file_explorer_dock.model.rootPath())
+        # The path index watches the tree; files changed outside the IDE get their symbols re-indexed
+        self.path_index.changed.connect(self.symbol_index.schedule_refresh)
+        # Trigrams of every file's text, so Find in Files only reads files that can match.
+        # The path index watches the tree; whatever changes there gets re-indexed
+        self.trigram_index = TrigramIndex(self)
+        self.trigram_index.progress.connect(self._on_trigram_index_progress)
+        self.trigram_index.indexing_finished.connect(self._on_trigram_index_finished)
+        self.file_explorer_dock.root_directory_changed.connect(self.trigram_index.set_root)
+        self.path_index.changed.connect(self.trigram_index.schedule_refresh)
+        self.trigram_index.set_root(self.file_explorer_dock.model.rootPath())
+
         # Outline on the right
         self.outline_dock = OutlineDock(self)
         self.outline_dock.set_editor_tabs(self.editor_tabs)
@@ -32,9 +66,36 @@ class IDEMainWindow(QMainWindow):
 
         # Terminal at the bottom
         self.terminal_dock = TerminalDock(self)
+        self.terminal_dock.set_root_directory(self.file_explorer_dock.model.rootPath())
+        self.file_explorer_dock.root_directory_changed.connect(self.terminal_dock.set_root_directory)
         self.addDockWidget(Qt.BottomDockWidgetArea, self.terminal_dock)
 
+        # Find in Files shares the bottom area with the terminal
+        self.find_dock = FindInFilesDock(self)
+        self.find_dock.set_editor_tabs(self.editor_tabs)
+        self.find_dock.set_trigram_index(self.trigram_index)
+        self.find_dock.set_root_directory(self.file_explorer_dock.model.rootPath())
+        self.file_explorer_dock.root_directory_changed.connect(self.find_dock.set_root_directory)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.find_dock)
+        self.tabifyDockWidget(self.terminal_dock, self.find_dock)
+        # Problems: compiler errors and tracebacks picked out of the terminals' output
+        self.problems_dock = ProblemsDock(self)
+        self.problems_dock.set_editor_tabs(self.editor_tabs)
+        self.terminal_dock.problems_found.connect(self.problems_dock.add_problems)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.problems_dock)
+        self.tabifyDockWidget(self.terminal_dock, self.problems_dock)
+        self.terminal_dock.raise_()
+
+        # Pre-started Python interpreters for Run, when turned on (Settings menu)
+        self.warm_pool = None
+
         self._create_menu_bar()
+        if warmpool.PRELOAD_MODULES and warmpool.is_supported():
+            self._set_warm_runs(True)  # preloading modules was asked for; that's what it's for
+
+        # Bring back buffers with unsaved edits from a session that didn't get to save them, once
+        # the window is up: it may have to ask about edits whose file changed on disk since
+        QTimer.singleShot(0, self.editor_tabs.restore_unsaved)
 
     def _create_menu_bar(self):
         menu_bar = self.menuBar()
@@ -84,6 +145,24 @@ class IDEMainWindow(QMainWindow):
         edit_menu.addAction(undo_action)
         edit_menu.addAction(redo_action)
 
+        find_in_files_action = QAction("Find in Files...", self)
+        find_in_files_action.setShortcut(QKeySequence("Ctrl+Shift+F"))
+        find_in_files_action.triggered.connect(self._on_find_in_files)
+        edit_menu.addSeparator()
+        edit_menu.addAction(find_in_files_action)
+
+        # Go Menu
+        go_menu = menu_bar.addMenu("Go")
+        go_to_file_action = QAction("Go to File...", self)
+        go_to_file_action.setShortcut(QKeySequence("Ctrl+P"))
+        go_to_file_action.triggered.connect(self._on_go_to_file)
+        go_menu.addAction(go_to_file_action)
+
+        workspace_symbol_action = QAction("Go to Symbol in Workspace...", self)
+        workspace_symbol_action.setShortcut(QKeySequence("Ctrl+T"))
+        workspace_symbol_action.triggered.connect(self._on_go_to_workspace_symbol)
+        go_menu.addAction(workspace_symbol_action)
+
         # **Run** Menu
         run_action = QAction("Run", self)
         run_action.triggered.connect(self._on_run_file)
@@ -100,13 +179,24 @@ class IDEMainWindow(QMainWindow):
         toggle_terminal = QAction("Show Terminal", self, checkable=True, checked=True)
         toggle_terminal.triggered.connect(lambda checked: self._toggle_dock(self.terminal_dock, checked))
 
+        toggle_find = QAction("Show Find in Files", self, checkable=True, checked=True)
+        toggle_find.triggered.connect(lambda checked: self._toggle_dock(self.find_dock, checked))
+
+        toggle_problems = QAction("Show Problems", self, checkable=True, checked=True)
+        toggle_problems.triggered.connect(lambda checked: self._toggle_dock(self.problems_dock, checked))
+
         view_menu.addAction(toggle_file_explorer)
         view_menu.addAction(toggle_outline)
         view_menu.addAction(toggle_terminal)
+        view_menu.addAction(toggle_find)
+        view_menu.addAction(toggle_problems)
 
-        # # Settings Menu (placeholder)
-        # settings_menu = menu_bar.addMenu("Settings")
-        # settings_menu.addAction("Preferences") # Placeholder action
+        # Settings Menu
+        settings_menu = menu_bar.addMenu("Settings")
+        self.warm_runs_action = QAction("Run Python in Warm Interpreters", self, checkable=True)
+        self.warm_runs_action.setEnabled(warmpool.is_supported())
+        self.warm_runs_action.toggled.connect(self._set_warm_runs)
+        settings_menu.addAction(self.warm_runs_action)
 
     def _on_tab_changed(self, index):
         file_path = self.editor_tabs.current_file_path()
@@ -114,13 +204,88 @@ class IDEMainWindow(QMainWindow):
             self.file_explorer_dock.show_file_in_explorer(file_path)
         self.outline_dock.refresh_outline()
 
+    def _on_file_loaded(self, editor):
+        if editor is self.editor_tabs.current_editor():
+            self.outline_dock.refresh_outline()
+
     def _on_save_file(self):
         self.editor_tabs.save_current_file()
         self.outline_dock.refresh_outline()
 
+    def _on_file_saved(self, file_path, written, seconds):
+        name = os.path.basename(file_path)
+        if written:
+            self.symbol_index.file_changed(file_path)
+            self.trigram_index.file_changed(file_path)
+            self.statusBar().showMessage(f"Saved {name} in {seconds * 1000:.0f} ms", 5000)
+        else:
+            self.statusBar().showMessage(f"{name} unchanged on disk, nothing written ({seconds * 1000:.0f} ms)", 5000)
+
+    def _on_save_failed(self, file_path, error):
+        self.statusBar().showMessage(f"Could not save {os.path.basename(file_path)}: {error}")
+
+    def _on_find_in_files(self):
+        # Start from the selection, if it's a single line
+        text = ""
+        editor = self.editor_tabs.current_editor()
+        if isinstance(editor, QPlainTextEdit):
+            selected = editor.textCursor().selectedText()
+            if '\u2029' not in selected:
+                text = selected
+        self.find_dock.focus_query(text)
+
+    def _on_go_to_file(self):
+        dialog = QuickOpenDialog(self.path_index, self.editor_tabs.open_file, self)
+        dialog.exec()
+
+    def _on_go_to_workspace_symbol(self):
+        dialog = WorkspaceSymbolDialog(self.symbol_index, self.editor_tabs.open_file, self)
+        dialog.exec()
+
+    def _on_symbol_index_progress(self, parsed, total):
+        self.statusBar().showMessage(f"Indexing symbols... {parsed}/{total} files")
+
+    def _on_symbol_index_finished(self, parsed):
+        if parsed:
+            self.statusBar().showMessage(f"Indexed symbols of {parsed} files", 5000)
+
+    def _on_trigram_index_progress(self, done, total):
+        self.statusBar().showMessage(f"Indexing file contents... {done // 2**20}/{total // 2**20} MB")
+
+    def _on_trigram_index_finished(self, indexed):
+        if indexed:
+            self.statusBar().showMessage(f"Indexed the contents of {indexed} files", 5000)
+
+    def closeEvent(self, event):
+        # Don't keep the app alive for a half-done index
+        self.symbol_index.close()
+        self.path_index.close()
+        self.trigram_index.close()
+        self.find_dock.shutdown()
+        self.terminal_dock.shutdown()
+        if self.warm_pool is not None:
+            self.warm_pool.shutdown()
+        super().closeEvent(event)
+
+    def _set_warm_runs(self, enabled):
+        if enabled and self.warm_pool is None:
+            self.warm_pool = warmpool.WarmPythonPool(parent=self)
+            self.warm_pool.run_started.connect(self._on_warm_run_started)
+            self.warm_pool.failed.connect(lambda message: self.statusBar().showMessage(message, 5000))
+            self.warm_pool.start()
+        elif not enabled and self.warm_pool is not None:
+            self.warm_pool.shutdown()
+            self.warm_pool.deleteLater()
+            self.warm_pool = None
+        self.warm_runs_action.setChecked(enabled)
+
+    def _on_warm_run_started(self, script, seconds):
+        self.statusBar().showMessage(
+            f"Started {os.path.basename(script)} in {seconds * 1000:.0f} ms (warm interpreter)", 5000)
+
     def _on_cut(self):
         editor = self.editor_tabs.current_editor()
-        if editor:
+        if isinstance(editor, QPlainTextEdit):
             editor.cut()
 
     def _on_copy(self):
@@ -130,17 +295,17 @@ class IDEMainWindow(QMainWindow):
 
     def _on_paste(self):
         editor = self.editor_tabs.current_editor()
-        if editor:
+        if isinstance(editor, QPlainTextEdit):
             editor.paste()
 
     def _on_undo(self):
         editor = self.editor_tabs.current_editor()
-        if editor:
+        if isinstance(editor, QPlainTextEdit):
             editor.undo()
 
     def _on_redo(self):
         editor = self.editor_tabs.current_editor()
-        if editor:
+        if isinstance(editor, QPlainTextEdit):
             editor.redo()
 
     def _on_open_folder(self):
@@ -160,20 +325,28 @@ class IDEMainWindow(QMainWindow):
             return  # No file to run
 
         extension = os.path.splitext(file_path)[1].lower()
+        if extension in (".py", ".c"):
+            self.problems_dock.clear()  # what this run finds replaces what the last one did
 
         if extension == ".py":
-            # Use python + shlex.quote for safety
-            command = f"python {shlex.quote(file_path)}"
+            if self.warm_pool is not None and self.warm_pool.is_ready():
+                # Forked from an interpreter with its imports done; it reports when the script starts
+                command = self.warm_pool.command(file_path, time.time())
+            else:
+                # Use python + shlex.quote for safety
+                command = f"python {shlex.quote(file_path)}"
+                if self.warm_pool is not None:
+                    self.statusBar().showMessage("The warm interpreter is still starting; running cold", 5000)
             self.terminal_dock.execute_command(command)
 
         elif extension == ".c":
-            # On Windows, produce "file.exe" output and run it
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            # If using cmd.exe
-            command = (
-                f"gcc {shlex.quote(file_path)} -o {shlex.quote(base_name)}.exe "
-                f"&& .\\{base_name}.exe"
-            )
+            # Compiles only what changed since the last run (and nothing if nothing did),
+            # then runs the program; see buildcache.py
+            args = [sys.executable, os.path.abspath(buildcache.__file__), file_path]
+            if os.name == "nt":
+                command = subprocess.list2cmdline(args)  # the terminal runs cmd.exe there
+            else:
+                command = shlex.join(args)
             self.terminal_dock.execute_command(command)
         else:
             # Not recognized
@@ -1,21 +1,257 @@
 import os
 import ast
 import re
-from PySide6.QtWidgets import QDockWidget, QTreeWidget, QTreeWidgetItem
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QTextCursor
+import difflib
+from collections import OrderedDict
+from PySide6.QtWidgets import QDockWidget, QTreeView, QPlainTextEdit
+from PySide6.QtCore import Qt, QTimer, QObject, QRunnable, QThreadPool, Signal, QAbstractItemModel, QModelIndex
+
+def parse_python(source_code):
+    """Symbol tree of Python source: [(name, line, children), ...]. Raises SyntaxError.
+
+    Classes and (async) functions nest under the class or function they are
+    defined in; ones inside if/try/with blocks count as defined in the enclosing scope.
+    """
+    # Use the built-in ast approach
+    return _python_symbols(ast.parse(source_code))
+
+def _python_symbols(node):
+    symbols = []
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, ast.ClassDef):
+            symbols.append((f"class {child.name}", child.lineno, _python_symbols(child)))
+        elif isinstance(child, ast.FunctionDef):
+            symbols.append((f"def {child.name}()", child.lineno, _python_symbols(child)))
+        elif isinstance(child, ast.AsyncFunctionDef):
+            symbols.append((f"async def {child.name}()", child.lineno, _python_symbols(child)))
+        elif isinstance(child, ast.stmt):
+            symbols.extend(_python_symbols(child))
+    return symbols
+
+def parse_c(source_code):
+    """
+    Our custom function for extracting #directives and function definitions.
+    """
+    symbols = []
+    lines = source_code.splitlines()
+
+    func_def_pattern = re.compile(
+        r"""^
+           ([A-Za-z_][A-Za-z0-9_\*\s]*?)   # return type + pointer symbols
+           \s+([A-Za-z_][A-Za-z0-9_]*)    # function name
+           \s*\([^)]*\)\s*\{
+           """,
+        re.VERBOSE
+    )
+
+    for i, line in enumerate(lines, start=1):
+        striped = line.strip()
+        if striped.startswith('#'):
+            # #include, #define, #if, etc.
+            symbols.append((striped, i, []))
+            continue
+
+        match = func_def_pattern.match(striped)
+        if match:
+            return_type = match.group(1).strip()
+            func_name = match.group(2).strip()
+            symbols.append((f"function {func_name}()", i, []))
+
+    return symbols
+
+# File extension -> parser returning [(name, line, children), ...]
+PARSERS = {".py": parse_python, ".c": parse_c}
+
+
+class _Node:
+    __slots__ = ("name", "line", "parent", "children", "row")
+
+    def __init__(self, name, line, parent, row=0):
+        self.name = name
+        self.line = line
+        self.parent = parent
+        self.children = []
+        self.row = row  # position in parent.children, kept up to date by OutlineModel
+
+
+class OutlineModel(QAbstractItemModel):
+    """Tree model over the (name, line, children) symbols from the parsers.
+
+    set_symbols() diffs the new tree against the current one and only inserts,
+    removes or updates the rows that changed. Unchanged symbols keep their
+    nodes, so the view keeps their expansion and selection.
+    """
+    LineRole = Qt.UserRole
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._root = _Node("", 0, None)
+        self._header = "Symbols"
+
+    def set_symbols(self, symbols, reset=False):
+        """Show a new symbol tree; reset=True replaces it wholesale (e.g. another file)."""
+        if reset:
+            self.beginResetModel()
+            self._root.children = []
+            self._append(self._root, symbols)
+            self.endResetModel()
+        else:
+            self._merge(self._root, symbols)
+
+    def _append(self, parent, symbols):
+        for name, line, children in symbols:
+            node = _Node(name, line, parent, len(parent.children))
+            parent.children.append(node)
+            self._append(node, children)
+
+    def _index_of(self, node):
+        return QModelIndex() if node is self._root else self.createIndex(node.row, 0, node)
+
+    @staticmethod
+    def _renumber(nodes, start):
+        for row in range(start, len(nodes)):
+            nodes[row].row = row
+
+    def _merge(self, parent, symbols):
+        old = parent.children
+        old_names = [node.name for node in old]
+        new_names = [name for name, _, _ in symbols]
+        if old_names == new_names:
+            opcodes = [("equal", 0, len(old), 0, len(symbols))]  # the usual case: only lines moved
+        else:
+            opcodes = difflib.SequenceMatcher(None, old_names, new_names, autojunk=False).get_opcodes()
+        # Back to front, so the rows of earlier opcodes stay valid
+        for tag, i1, i2, j1, j2 in reversed(opcodes):
+            if tag == "equal":
+                moved = []
+                for node, (name, line, children) in zip(old[i1:i2], symbols[j1:j2]):
+                    if node.line != line:
+                        node.line = line
+                        moved.append(node.row)
+                    self._merge(node, children)
+                if moved:
+                    # One signal for the whole run rather than one per symbol
+                    first, last = old[min(moved)], old[max(moved)]
+                    self.dataChanged.emit(self.createIndex(first.row, 0, first),
+                                          self.createIndex(last.row, 0, last), [self.LineRole])
+                continue
+            parent_index = self._index_of(parent)
+            if i2 > i1:
+                self.beginRemoveRows(parent_index, i1, i2 - 1)
+                del old[i1:i2]
+                self._renumber(old, i1)
+                self.endRemoveRows()
+            if j2 > j1:
+                self.beginInsertRows(parent_index, i1, i1 + j2 - j1 - 1)
+                staged = _Node("", 0, None)
+                self._append(staged, symbols[j1:j2])
+                for node in staged.children:
+                    node.parent = parent
+                old[i1:i1] = staged.children
+                self._renumber(old, i1)
+                self.endInsertRows()
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = parent.internalPointer() if parent.isValid() else self._root
+        if column != 0 or not 0 <= row < len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, 0, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self._index_of(index.internalPointer().parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        node = parent.internalPointer() if parent.isValid() else self._root
+        return len(node.children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.name
+        if role == self.LineRole:
+            return node.line
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self._header
+        return None
+
+    def set_header(self, text):
+        if text != self._header:
+            self._header = text
+            self.headerDataChanged.emit(Qt.Horizontal, 0, 0)
+
+
+class _OutlineJobSignals(QObject):
+    finished = Signal(object, object, str)  # (path, revision), symbols or None, error
+
+class _OutlineJob(QRunnable):
+    """Parses a snapshot of a document on a QThreadPool thread."""
+    def __init__(self, key, parser, text, signals):
+        super().__init__()
+        self.key = key
+        self.parser = parser
+        self.text = text
+        self.signals = signals
+
+    def run(self):
+        try:
+            symbols, error = self.parser(self.text), ""
+        except SyntaxError as e:
+            symbols, error = None, f"syntax error at line {e.lineno}"
+        except ValueError as e:  # e.g. NUL bytes in the source
+            symbols, error = None, str(e)
+        try:
+            self.signals.finished.emit(self.key, symbols, error)
+        except RuntimeError:
+            pass
 
 class OutlineDock(QDockWidget):
+    """Symbols of the current editor's file.
+
+    Edits restart a short timer; when it fires, a snapshot of the text is parsed
+    on a pool thread. Outlines are cached per (file, text revision), so switching
+    back to a tab or saving doesn't parse again, and a file that stops parsing
+    keeps showing its last good outline.
+    """
+    REFRESH_DELAY_MS = 300
+    CACHE_SIZE = 64
+
     def __init__(self, parent=None):
         super().__init__("Outline", parent)
         self.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea)
 
-        self.tree_widget = QTreeWidget()
-        self.tree_widget.setHeaderLabel("Symbols")
-        self.tree_widget.itemClicked.connect(self._on_item_clicked)
-        self.setWidget(self.tree_widget)
+        self.model = OutlineModel(self)
+        self.tree_view = QTreeView()
+        self.tree_view.setModel(self.model)
+        self.tree_view.clicked.connect(self._on_item_clicked)
+        # New symbols arrive expanded, like the whole tree on a fresh outline
+        self.model.rowsInserted.connect(self._expand_inserted)
+        self.model.modelReset.connect(self.tree_view.expandAll)
+        self.setWidget(self.tree_view)
 
         self.editor_tabs = None
+        self._watched_document = None  # document whose edits schedule a refresh
+        self._shown_key = None         # (path, revision) of the outline in the tree
+        self._cache = OrderedDict()    # (path, revision) -> symbols
+        self._last_good = {}           # path -> symbols of the last version that parsed
+        self._job_running = False
+        self._refresh_again = False    # refresh_outline() was called while a job ran
+        self._job_signals = _OutlineJobSignals(self)
+        self._job_signals.finished.connect(self._on_job_finished)
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self.refresh_outline)
 
     def set_editor_tabs(self, editor_tabs):
         self.editor_tabs = editor_tabs
@@ -25,104 +261,86 @@ class OutlineDock(QDockWidget):
             return
 
         editor = self.editor_tabs.current_editor()
-        if editor is None:
-            self.tree_widget.clear()
+        if not isinstance(editor, QPlainTextEdit):
+            # No tab, or a read-only large file view we won't parse as a whole
+            self._watch(None)
+            self._show(None, [])
             return
+        self._watch(editor.document())
 
         file_path = editor.property("file_path")
-        if not file_path:
-            self.tree_widget.clear()
+        parser = PARSERS.get(os.path.splitext(file_path or "")[1].lower())
+        if parser is None:
+            self._show(None, [])
             return
+        if self.editor_tabs.is_loading(editor):
+            return  # refreshed again once the file is in
 
-        file_extension = os.path.splitext(file_path)[1].lower()
-        file_content = editor.toPlainText()
+        key = (file_path, self.editor_tabs.text_revision(editor))
+        if key == self._shown_key:
+            return
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self._show(key, self._cache[key])
+            return
+        if self._job_running:
+            self._refresh_again = True
+            return
+        self._job_running = True
+        QThreadPool.globalInstance().start(
+            _OutlineJob(key, parser, editor.toPlainText(), self._job_signals))
 
-        if file_extension == ".py":
-            symbols = self._parse_python(file_content)
-        elif file_extension == ".c":
-            # Use our custom parser
-            symbols = self._parse_c_custom(file_content)
-        else:
-            self.tree_widget.clear()
+    def _watch(self, document):
+        if document is self._watched_document:
             return
+        if self._watched_document is not None:
+            try:
+                self._watched_document.contentsChange.disconnect(self._on_contents_change)
+            except (RuntimeError, TypeError):
+                pass  # the document is gone
+        self._watched_document = document
+        if document is not None:
+            document.contentsChange.connect(self._on_contents_change)
 
-        self._populate_tree(symbols)
+    def _on_contents_change(self, position, chars_removed, chars_added):
+        if chars_removed or chars_added:
+            self._refresh_timer.start(self.REFRESH_DELAY_MS)
 
-    def _parse_python(self, source_code):
-        # Use the built-in ast approach
-        import ast
-        symbols = []
-        try:
-            tree = ast.parse(source_code)
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    symbols.append((f"class {node.name}", node.lineno))
-                elif isinstance(node, ast.FunctionDef):
-                    symbols.append((f"def {node.name}()", node.lineno))
-        except Exception as e:
-            print(f"Error parsing Python: {e}")
-        return symbols
-
-    def _parse_c_custom(self, source_code):
-        """
-        Our custom function for extracting #directives and function definitions.
-        """
-        symbols = []
-        lines = source_code.splitlines()
-
-        func_def_pattern = re.compile(
-            r"""^
-               ([A-Za-z_][A-Za-z0-9_\*\s]*?)   # return type + pointer symbols
-               \s+([A-Za-z_][A-Za-z0-9_]*)    # function name
-               \s*\([^)]*\)\s*\{
-               """,
-            re.VERBOSE
-        )
-
-        for i, line in enumerate(lines, start=1):
-            striped = line.strip()
-            if striped.startswith('#'):
-                # #include, #define, #if, etc.
-                symbols.append((striped, i))
-                continue
+    def _on_job_finished(self, key, symbols, error):
+        self._job_running = False
+        file_path = key[0]
+        if symbols is not None:
+            self._cache[key] = symbols
+            self._last_good[file_path] = symbols
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
 
-            match = func_def_pattern.match(striped)
-            if match:
-                return_type = match.group(1).strip()
-                func_name = match.group(2).strip()
-                symbols.append((f"function {func_name}()", i))
+        editor = self.editor_tabs.current_editor()
+        if isinstance(editor, QPlainTextEdit) and editor.property("file_path") == file_path \
+                and self.editor_tabs.text_revision(editor) == key[1]:
+            if symbols is not None:
+                self._show(key, symbols)
+            else:
+                # Mid-edit code often doesn't parse; keep the last outline that did
+                self._show(key, self._last_good.get(file_path, []), error)
+        if self._refresh_again:
+            self._refresh_again = False
+            self.refresh_outline()
 
-        return symbols
+    def _show(self, key, symbols, error=""):
+        # Another file gets a fresh tree; a new version of the same file a diff
+        reset = key is None or self._shown_key is None or key[0] != self._shown_key[0]
+        self._shown_key = key
+        self.model.set_header(f"Symbols ({error})" if error else "Symbols")
+        self.model.set_symbols(symbols, reset=reset)
 
-    def _populate_tree(self, symbols):
-        self.tree_widget.clear()
-        for name, line_num in symbols:
-            item = QTreeWidgetItem(self.tree_widget)
-            item.setText(0, name)
-            item.setData(0, Qt.UserRole, line_num)
-        self.tree_widget.expandAll()
+    def _expand_inserted(self, parent, first, last):
+        for row in range(first, last + 1):
+            self.tree_view.expandRecursively(self.model.index(row, 0, parent))
 
-    def _on_item_clicked(self, item, column):
-        line_num = item.data(0, Qt.UserRole)
+    def _on_item_clicked(self, index):
+        line_num = index.data(OutlineModel.LineRole)
         if line_num and self.editor_tabs:
             editor = self.editor_tabs.current_editor()
             if editor:
-                self._go_to_line(editor, line_num)
-
-    def _go_to_line(self, editor, line):
-        text_cursor = editor.textCursor()
-        # Move to the start of the document
-        text_cursor.movePosition(QTextCursor.Start)
-
-        # Move down (line - 1) lines
-        for _ in range(line - 1):
-            text_cursor.movePosition(QTextCursor.Down)
-
-        editor.setTextCursor(text_cursor)
-        
-        # Make sure the editor gets focus so the blinking cursor is visible
-        editor.setFocus()
-        
-        # Optionally ensure the new cursor position is scrolled into view
-        editor.ensureCursorVisible()
-
+                self.editor_tabs.go_to_line(editor, line_num)
@@ -0,0 +1,177 @@
+"""Problems found in terminal output: compiler diagnostics and Python tracebacks.
+
+ProblemMatcher takes output in whatever pieces it arrives in and reports each
+problem once, without going over earlier output again: the complete lines of
+a piece are scanned with a single regex, and only a traceback in progress is
+followed line by line. Every terminal feeds one with what it shows (see
+terminal.py), and ProblemsDock lists what they find.
+
+A problem is a tuple (severity, path, line, column, message, frames):
+severity is "error", "warning" or "note", line is 1-based, column is 1-based
+or None, and frames lists a traceback's (path, line, function) from the
+outermost call to the innermost, or is empty.
+"""
+import re
+from PySide6.QtWidgets import QDockWidget, QTreeWidget, QTreeWidgetItem, QStyle
+from PySide6.QtCore import Qt
+
+# A traceback keeps this many of its innermost frames
+MAX_TRACEBACK_FRAMES = 100
+# The dock lists this many problems at most; a broken build can print thousands
+MAX_PROBLEMS = 10000
+
+# What starts a problem, matched against the start of every line:
+# - file:line:col: severity: message, as printed by gcc and clang (col optional;
+#   file may start with a Windows drive), and Python's warnings (file:line: CategoryWarning: message)
+# - the header of a Python traceback
+# - a traceback frame without a header, as printed for a SyntaxError
+_PROBLEM_START = re.compile(
+    r'^(?:(?P<path>(?:[A-Za-z]:[\\/])?[^:\n]+):(?P<line>\d+):(?:(?P<column>\d+):)?\s*'
+    r'(?P<severity>fatal error|error|warning|note|[A-Z]\w*Warning):\s*(?P<message>.*?)\r?$'
+    r'|(?P<traceback>Traceback \(most recent call last\):)\r?$'
+    r'|  File "(?P<frame_path>[^"\n]+)", line (?P<frame_line>\d+))',
+    re.MULTILINE)
+_FRAME = re.compile(r'  File "([^"\n]+)", line (\d+)(?:, in (.*))?')
+
+
+class ProblemMatcher:
+    """Finds problems in a stream of output text, fed a piece at a time."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget a line or traceback left unfinished, e.g. when the output is cleared."""
+        self._tail = ''         # the incomplete last line of what has been fed
+        self._traceback = None  # frames of the traceback being read
+
+    def feed(self, text):
+        """The problems completed by text, which continues whatever was fed before."""
+        text = self._tail + text
+        end = text.rfind('\n') + 1
+        self._tail = text[end:]
+        problems = []
+        position = 0
+        while position < end:
+            if self._traceback is not None:
+                position = self._follow_traceback(text, position, end, problems)
+                continue
+            match = _PROBLEM_START.search(text, position, end)
+            if match is None:
+                break
+            position = text.index('\n', match.end()) + 1
+            if match.group('traceback'):
+                self._traceback = []
+            elif match.group('frame_path'):
+                self._traceback = []
+                position = match.start()  # read the frame with the rest of the traceback
+            else:
+                severity = match.group('severity')
+                message = match.group('message')
+                if severity.endswith('Warning'):
+                    severity, message = 'warning', f"{severity}: {message}"
+                elif severity == 'fatal error':
+                    severity = 'error'
+                column = match.group('column')
+                problems.append((severity, match.group('path'), int(match.group('line')),
+                                 int(column) if column else None, message, []))
+        return problems
+
+    def _follow_traceback(self, text, position, end, problems):
+        """Read traceback lines from position; the position after the last one read."""
+        while position < end:
+            line_end = text.index('\n', position)
+            line = text[position:line_end].rstrip('\r')
+            position = line_end + 1
+            frame = _FRAME.match(line)
+            if frame:
+                path, line_number, function = frame.groups()
+                self._traceback.append((path, int(line_number), function or ''))
+                del self._traceback[:-MAX_TRACEBACK_FRAMES]
+            elif line[:1].isspace() or not line:
+                continue  # source lines, ^^^ markers, "[Previous line repeated ...]"
+            else:
+                # The first unindented line ends it: the exception, e.g. "ValueError: bad value"
+                frames, self._traceback = self._traceback, None
+                # Point at the innermost frame in a real file, not <string> or <frozen ...>
+                located = [frame for frame in frames if not frame[0].startswith('<')]
+                if located:
+                    path, line_number, _ = located[-1]
+                    problems.append(('error', path, line_number, None, line, frames))
+                break
+        return position
+
+
+class ProblemsDock(QDockWidget):
+    """Problems found in terminal output; activating one opens its file at its line."""
+    def __init__(self, parent=None):
+        super().__init__("Problems", parent)
+        self.setAllowedAreas(Qt.BottomDockWidgetArea | Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea)
+        self.editor_tabs = None
+        self._seen = set()  # (severity, path, line, column, message) listed already
+        self._counts = {'error': 0, 'warning': 0, 'note': 0}
+
+        self.problem_tree = QTreeWidget()
+        self.problem_tree.setHeaderHidden(True)
+        self.problem_tree.setUniformRowHeights(True)
+        self.problem_tree.itemActivated.connect(self._on_item_activated)
+        self.setWidget(self.problem_tree)
+
+        style = self.style()
+        self._icons = {
+            'error': style.standardIcon(QStyle.SP_MessageBoxCritical),
+            'warning': style.standardIcon(QStyle.SP_MessageBoxWarning),
+            'note': style.standardIcon(QStyle.SP_MessageBoxInformation),
+        }
+
+    def set_editor_tabs(self, editor_tabs):
+        self.editor_tabs = editor_tabs
+
+    def clear(self):
+        self.problem_tree.clear()
+        self._seen.clear()
+        self._counts = dict.fromkeys(self._counts, 0)
+        self._update_title()
+
+    def add_problems(self, problems):
+        """List problems (tuples, see the module docstring) not listed already."""
+        items = []
+        for severity, path, line, column, message, frames in problems:
+            if len(self._seen) >= MAX_PROBLEMS:
+                break
+            key = (severity, path, line, column, message)
+            if key in self._seen:
+                continue  # the same diagnostic from a second build
+            self._seen.add(key)
+            self._counts[severity] += 1
+            location = f"{path}:{line}" + (f":{column}" if column else "")
+            item = QTreeWidgetItem([f"{message}  ({location})"])
+            item.setIcon(0, self._icons[severity])
+            item.setToolTip(0, location)
+            item.setData(0, Qt.UserRole, (path, line))
+            # A traceback's frames, innermost first like the problem itself
+            for frame_path, frame_line, function in reversed(frames):
+                child = QTreeWidgetItem([f"{function or '<module>'}  ({frame_path}:{frame_line})"])
+                if not frame_path.startswith('<'):
+                    child.setData(0, Qt.UserRole, (frame_path, frame_line))
+                item.addChild(child)
+            items.append(item)
+        if items:
+            # One insert for the whole batch; fast output can bring hundreds at a time
+            self.problem_tree.addTopLevelItems(items)
+            self._update_title()
+
+    def problem_count(self):
+        return self.problem_tree.topLevelItemCount()
+
+    def _update_title(self):
+        errors, warnings = self._counts['error'], self._counts['warning']
+        title = "Problems"
+        if errors or warnings:
+            title += f" ({errors} errors, {warnings} warnings)"
+        self.setWindowTitle(title)
+
+    def _on_item_activated(self, item, column):
+        location = item.data(0, Qt.UserRole)
+        if location and self.editor_tabs:
+            path, line = location
+            self.editor_tabs.open_file(path, line)
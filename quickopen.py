@@ -0,0 +1,372 @@
+"""Ctrl+P quick open: fuzzy matching over every file path under the project root.
+
+PathIndex keeps the root's file paths in memory, minus what the ignore rules
+(ignore.py) exclude. It is built by a background
+walk and then kept up to date from a QFileSystemWatcher on the directories,
+rescanning only the directories that report a change.
+
+Matching a query against 200k paths one by one is too slow for a keystroke in
+Python, so for every character the index keeps a bitset (a Python int, bit i
+for path i) of the paths containing it, and another of the paths whose file
+name contains it. ANDing the bitsets of the query's characters narrows the
+candidates in C; the paths are numbered shortest first, so the candidates
+come out roughly in order of preference and only the first MAX_SCORED that
+really match get scored.
+"""
+import os
+import re
+import heapq
+import threading
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, QFileSystemWatcher, Signal
+from ignore import IgnoreRules, list_directory
+from filterdialog import FilterListDialog
+
+# Candidates scored per query; beyond this the shortest paths win
+MAX_SCORED = 500
+# Directories the watcher follows, shallowest first (inotify watches are a limited resource)
+MAX_WATCHED_DIRS = 2000
+# Directory change notifications are coalesced for this long before rescanning
+RESCAN_DELAY_MS = 300
+
+_WORD_STARTS = '/_-. '
+# fuzzy_score() of a path whose file name alone matches the query is at least this
+_NAME_MATCH = 2000
+
+
+def fuzzy_score(query, path, lower=None):
+    """How well path matches query, or None if query isn't a subsequence of it.
+
+    query must be lowercase. Higher is better: the whole query inside the file
+    name beats the letters spread over the file name, which beats a match that
+    needs the directories. Runs of consecutive letters and letters at word
+    starts (after / _ - . or at a camelCase hump) score extra.
+    """
+    lower = lower or path.lower()
+    name_start = lower.rfind('/') + 1
+    at = lower.find(query, name_start)
+    if at >= 0:
+        return _NAME_MATCH + 1000 + (200 if at == name_start else 0) - (len(lower) - name_start)
+    score = _subsequence_score(query, path, lower, name_start)
+    if score is not None:
+        return _NAME_MATCH + score
+    at = lower.find(query)
+    if at >= 0:
+        return 1000 + (100 if at == 0 or lower[at - 1] in _WORD_STARTS else 0) - at // 8
+    return _subsequence_score(query, path, lower, 0)
+
+
+def _subsequence_score(query, path, lower, start):
+    score = 0
+    position = start
+    previous = -2
+    for char in query:
+        at = lower.find(char, position)
+        if at < 0:
+            return None
+        if at == previous + 1:
+            score += 8
+        elif at == 0 or lower[at - 1] in _WORD_STARTS or (path[at].isupper() and path[at - 1].islower()):
+            score += 6
+        else:
+            score -= min(at - position, 4)
+        previous = at
+        position = at + 1
+    return score
+
+
+def _bitsets(strings):
+    """{char: int with bit i set if strings[i] contains char}."""
+    positions = {}
+    for i, string in enumerate(strings):
+        for char in set(string):
+            positions.setdefault(char, []).append(i)
+    bits = {}
+    for char, indexes in positions.items():
+        flags = bytearray(b'0' * len(strings))
+        for i in indexes:
+            flags[i] = 49  # '1'
+        flags.reverse()  # bit 0 is the last digit
+        bits[char] = int(flags, 2)
+    return bits
+
+
+def _set_bits(bitset):
+    """Positions of the set bits of an int, lowest first."""
+    digits = bin(bitset)[:1:-1]
+    position = digits.find('1')
+    while position >= 0:
+        yield position
+        position = digits.find('1', position + 1)
+
+
+class _PathScanSignals(QObject):
+    finished = Signal(object, object, object)  # cancel event, [(dir, files, subdirs) or (dir, None, None)], full index or None
+
+class _PathScanJob(QRunnable):
+    """Lists directories on a thread pool thread.
+
+    With recursive, also everything below them. A full build (directories ==
+    ['']) additionally sorts the paths and computes the bitsets.
+    """
+    def __init__(self, rules, directories, recursive, full, cancelled, signals):
+        super().__init__()
+        self.rules = rules
+        self.directories = directories  # relative to root, '' is the root itself
+        self.recursive = recursive
+        self.full = full
+        self.cancelled = cancelled
+        self.signals = signals
+
+    def run(self):
+        listings = []
+        stack = list(self.directories)
+        while stack and not self.cancelled.is_set():
+            directory = stack.pop()
+            listing = list_directory(self.rules, directory)
+            if listing is None:
+                listings.append((directory, None, None))
+                continue
+            files, subdirs = listing
+            listings.append((directory, files, subdirs))
+            if self.recursive:
+                stack.extend(f"{directory}/{name}" if directory else name for name in subdirs)
+        if self.cancelled.is_set():
+            return
+
+        index = None
+        if self.full:
+            paths = [f"{directory}/{name}" if directory else name
+                     for directory, files, _ in listings if files for name in files]
+            paths.sort(key=lambda path: (len(path), path))
+            lower = [path.lower() for path in paths]
+            names = [path[path.rfind('/') + 1:] for path in lower]
+            index = (paths, lower, _bitsets(lower), _bitsets(names))
+        try:
+            self.signals.finished.emit(self.cancelled, listings, index)
+        except RuntimeError:
+            pass  # the index was deleted while we were scanning
+
+
+class PathIndex(QObject):
+    """All file paths under a root, for QuickOpenDialog.
+
+    Paths are relative to the root with '/' separators. Files that go away
+    leave a hole (None) in the numbering rather than renumbering everything;
+    set_root() builds a fresh, compact index.
+    """
+    changed = Signal()  # the set of paths changed (a build finished, or a rescan)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self._rules = None
+        self._paths = []       # path id -> relative path, None once removed
+        self._lower = []       # path id -> lowercase path
+        self._ids = {}         # relative path -> path id
+        self._dirs = {}        # relative directory -> set of its file names
+        self._bits = {}        # char -> bitset of the path ids whose path contains it
+        self._name_bits = {}   # char -> bitset of the path ids whose file name contains it
+        self._last_matches = None  # (query, ids of all its matches) while those are still valid
+        self._building = False
+        self._cancelled = threading.Event()
+        self._dirty_dirs = set()
+        self._signals = _PathScanSignals(self)
+        self._signals.finished.connect(self._on_scan_finished)
+        # Its own single thread: walks of big trees must not hold up the global pool
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._rescan_timer = QTimer(self)
+        self._rescan_timer.setSingleShot(True)
+        self._rescan_timer.timeout.connect(self._rescan)
+
+    def set_root(self, root):
+        root = os.path.abspath(root)
+        if root == self.root:
+            return
+        self.close()
+        self.root = root
+        self._rules = IgnoreRules(root)
+        self._paths, self._lower, self._ids, self._dirs = [], [], {}, {}
+        self._bits, self._name_bits, self._last_matches = {}, {}, None
+        self._building = True
+        self._cancelled = threading.Event()
+        self._pool.start(_PathScanJob(self._rules, [''], True, True, self._cancelled, self._signals))
+
+    def close(self):
+        """Stop scanning and watching."""
+        self._cancelled.set()
+        self._rescan_timer.stop()
+        self._dirty_dirs.clear()
+        watched = self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+
+    def is_building(self):
+        return self._building
+
+    def file_count(self):
+        return len(self._ids)
+
+    def search(self, query, limit=50):
+        """Best matches for query: [relative path, ...], best first."""
+        query = query.strip().replace('\\', '/').replace(' ', '').lower()
+        if not query:
+            return []
+        # Letters in the right order, checked in C before the scorer runs
+        subsequence = re.compile(''.join(
+            f'[^{re.escape(char)}]*{re.escape(char)}' if i else re.escape(char) for i, char in enumerate(query)))
+
+        if self._last_matches is not None and query.startswith(self._last_matches[0]):
+            # Typing on: every match is among the matches of the shorter query
+            sources = [self._last_matches[1]]
+        else:
+            matching = name_matching = -1  # all bits set
+            for char in set(query):
+                matching &= self._bits.get(char, 0)
+                name_matching &= self._name_bits.get(char, 0)
+            if matching <= 0:
+                return []
+            name_matching &= matching
+            # Paths with every letter in the file name first; both lists are shortest first
+            sources = [_set_bits(name_matching), _set_bits(matching & ~name_matching)]
+
+        scored = []
+        in_name = 0
+        complete = True
+        for source in sources:
+            if in_name >= limit or len(scored) >= MAX_SCORED:
+                complete = False  # nothing in the second list can beat a match inside the file name
+                break
+            for path_id in source:
+                lower = self._lower[path_id]
+                if not subsequence.search(lower):
+                    continue
+                score = fuzzy_score(query, self._paths[path_id], lower)
+                scored.append((score, path_id))
+                in_name += score >= _NAME_MATCH
+                if len(scored) >= MAX_SCORED:
+                    break
+        # The next keystroke can start from these, if they are all the matches there are
+        complete = complete and len(scored) < MAX_SCORED
+        self._last_matches = (query, [path_id for _, path_id in scored]) if complete else None
+        best = heapq.nlargest(limit, scored, key=lambda item: (item[0], -item[1]))
+        return [self._paths[path_id] for _, path_id in best]
+
+    def _on_scan_finished(self, cancelled, listings, index):
+        if cancelled is not self._cancelled or cancelled.is_set():
+            return  # from before the last set_root() or close()
+        self._last_matches = None
+        if index is not None:
+            self._paths, self._lower, self._bits, self._name_bits = index
+            self._ids = {path: path_id for path_id, path in enumerate(self._paths)}
+            self._dirs = {directory: set(files) for directory, files, _ in listings if files is not None}
+            self._building = False
+            self._watch(sorted(self._dirs, key=lambda directory: directory.count('/')))
+        else:
+            self._apply(listings)
+        self.changed.emit()
+
+    def _apply(self, listings):
+        new_dirs = []
+        listed = {directory for directory, _, _ in listings}
+        for directory, files, subdirs in listings:
+            if files is None:
+                self._forget_tree(directory)
+                continue
+            known = self._dirs.get(directory)
+            if known is None:
+                new_dirs.append(directory)
+                known = self._dirs[directory] = set()
+            files = set(files)
+            for name in known - files:
+                self._remove(f"{directory}/{name}" if directory else name)
+            for name in files - known:
+                self._add(f"{directory}/{name}" if directory else name)
+            self._dirs[directory] = files
+
+            subdirs = {f"{directory}/{name}" if directory else name for name in subdirs}
+            prefix = f"{directory}/" if directory else ""
+            for child in [d for d in self._dirs if d.startswith(prefix) and d != directory
+                          and '/' not in d[len(prefix):] and d not in subdirs]:
+                self._forget_tree(child)
+            unseen = [child for child in subdirs if child not in self._dirs and child not in listed]
+            if unseen:
+                self._pool.start(_PathScanJob(self._rules, unseen, True, False, self._cancelled, self._signals))
+        self._watch(new_dirs)
+
+    def _add(self, path):
+        if path in self._ids:
+            return
+        path_id = len(self._paths)
+        lower = path.lower()
+        self._paths.append(path)
+        self._lower.append(lower)
+        self._ids[path] = path_id
+        bit = 1 << path_id
+        for char in set(lower):
+            self._bits[char] = self._bits.get(char, 0) | bit
+        for char in set(lower[lower.rfind('/') + 1:]):
+            self._name_bits[char] = self._name_bits.get(char, 0) | bit
+
+    def _remove(self, path):
+        path_id = self._ids.pop(path, None)
+        if path_id is None:
+            return
+        mask = ~(1 << path_id)
+        lower = self._lower[path_id]
+        for char in set(lower):
+            self._bits[char] &= mask
+        for char in set(lower[lower.rfind('/') + 1:]):
+            self._name_bits[char] &= mask
+        self._paths[path_id] = None
+
+    def _forget_tree(self, directory):
+        prefix = directory + '/'
+        for gone in [d for d in self._dirs if d == directory or d.startswith(prefix)]:
+            for name in self._dirs.pop(gone):
+                self._remove(f"{gone}/{name}" if gone else name)
+            self._watcher.removePath(self._absolute(gone))
+
+    def _absolute(self, directory):
+        return os.path.join(self.root, directory) if directory else self.root
+
+    def _watch(self, directories):
+        room = MAX_WATCHED_DIRS - len(self._watcher.directories())
+        if room > 0 and directories:
+            self._watcher.addPaths([self._absolute(d) for d in directories[:room]])
+
+    def _on_directory_changed(self, path):
+        directory = os.path.relpath(path, self.root).replace(os.sep, '/')
+        self._dirty_dirs.add('' if directory == '.' else directory)
+        self._rescan_timer.start(RESCAN_DELAY_MS)
+
+    def _rescan(self):
+        if self._building:
+            self._rescan_timer.start(RESCAN_DELAY_MS)  # the build will pick the changes up anyway
+            return
+        directories, self._dirty_dirs = sorted(self._dirty_dirs), set()
+        self._pool.start(_PathScanJob(self._rules, directories, False, False, self._cancelled, self._signals))
+
+
+class QuickOpenDialog(FilterListDialog):
+    """Ctrl+P: type part of a file's path, pick a match, and open_file(path) is called."""
+    MAX_RESULTS = 50
+
+    def __init__(self, path_index, open_file, parent=None):
+        super().__init__("Go to File", "File name", path_index.search, self._format_path,
+                         lambda path: open_file(os.path.join(path_index.root, *path.split('/'))),
+                         [path_index.changed], parent)
+        self.path_index = path_index
+        self.update_results()
+
+    @staticmethod
+    def _format_path(path):
+        directory, _, name = path.rpartition('/')
+        return (f"{name}    {directory}" if directory else name), path
+
+    def status_text(self, results, seconds):
+        if self.path_index.is_building():
+            return "Indexing files..."
+        return f"{len(results)} of {self.path_index.file_count()} files in {seconds * 1000:.1f} ms"
@@ -0,0 +1,341 @@
+"""Project-wide symbol index for "Go to Symbol in Workspace".
+
+The symbols of every Python and C file under the project root (less what
+ignore.py excludes) are extracted with the outline's parsers
+(outline.PARSERS) and kept in a SQLite database in INDEX_DIR, one per root,
+so they survive restarts. Each file's size and mtime
+are stored next to its symbols; a re-index walks the tree, compares them and
+only re-parses files that changed, were added, or went away.
+
+Lookups run on the GUI thread against an index on the bare symbol name:
+exact and prefix matches come from the index, substring matches from one scan
+that stops as soon as enough rows are found.
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+from filesniff import looks_binary, BINARY_SNIFF_BYTES
+from outline import PARSERS
+from ignore import IgnoreRules, walk_files
+from filterdialog import FilterListDialog
+
+INDEX_DIR = os.path.join(os.path.expanduser("~"), ".ide_index")
+# Bigger files are most likely generated; they are skipped rather than parsed
+MAX_INDEXED_FILE_BYTES = 4 * 1024 * 1024
+# Files parsed between commits, so searches see an index that is filling up
+COMMIT_EVERY_FILES = 200
+# Refreshes are started at most this long after the changes that call for them
+REFRESH_DELAY_MS = 2000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS symbols (
+    key TEXT COLLATE NOCASE,  -- bare name searched on: 'f' for 'def f()'
+    name TEXT,                -- as the outline shows it
+    path TEXT,
+    line INTEGER,
+    container TEXT            -- name of the enclosing class or function, '' at top level
+);
+CREATE INDEX IF NOT EXISTS symbols_key ON symbols (key);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+"""
+_KEY = re.compile(r"([A-Za-z_][A-Za-z0-9_]*)(?:\(\))?$")
+
+
+def index_path_for(root):
+    """Where the index database of a project root lives; one per absolute path."""
+    digest = hashlib.blake2b(os.path.abspath(root).encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(INDEX_DIR, digest + '.sqlite')
+
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30)
+    # WAL lets the GUI thread search while the indexer is writing
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def _flatten(symbols, container=""):
+    """(key, name, line, container) rows of a parser's symbol tree. C directives aren't symbols."""
+    for name, line, children in symbols:
+        match = _KEY.search(name)
+        if match and not name.startswith('#'):
+            yield match.group(1), name, line, container
+        yield from _flatten(children, name)
+
+
+def file_symbols(file_path):
+    """Symbol rows of one file, or [] if it isn't source we can parse."""
+    parser = PARSERS.get(os.path.splitext(file_path)[1].lower())
+    if parser is None:
+        return []
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read(MAX_INDEXED_FILE_BYTES + 1)
+    except OSError:
+        return []
+    if len(data) > MAX_INDEXED_FILE_BYTES or looks_binary(data[:BINARY_SNIFF_BYTES]):
+        return []
+    try:
+        return list(_flatten(parser(data.decode('utf-8', errors='replace'))))
+    except (SyntaxError, ValueError, RecursionError):
+        return []  # indexed again once the file changes
+
+
+class _SymbolIndexSignals(QObject):
+    progress = Signal(int, int)  # files parsed so far, files that needed parsing
+    finished = Signal(object, int, str)  # the job's cancel event, files parsed, error
+
+class _SymbolIndexJob(QRunnable):
+    """Brings the index of a root up to date on a QThreadPool thread.
+
+    With paths, only those files are looked at (e.g. after a save); otherwise
+    the whole tree is walked.
+    """
+    def __init__(self, rules, db_path, paths, cancelled, signals):
+        super().__init__()
+        self.rules = rules
+        self.db_path = db_path
+        self.paths = paths
+        self.cancelled = cancelled  # threading.Event set by SymbolIndex
+        self.signals = signals
+
+    def run(self):
+        parsed = 0
+        error = ""
+        try:
+            connection = _connect(self.db_path)
+            try:
+                parsed = self._update(connection)
+            finally:
+                connection.close()
+        except (OSError, sqlite3.Error) as e:
+            error = str(e)
+        except RuntimeError:
+            return  # a progress report found the index deleted
+        try:
+            self.signals.finished.emit(self.cancelled, parsed, error)
+        except RuntimeError:
+            pass  # the index was deleted while we were working
+
+    def _update(self, connection):
+        if self.paths is None:
+            on_disk = {}
+            for _, entry in walk_files(self.rules, self.cancelled):
+                if os.path.splitext(entry.name)[1].lower() in PARSERS:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    on_disk[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            known = {path: (size, mtime_ns) for path, size, mtime_ns in
+                     connection.execute("SELECT path, size, mtime_ns FROM files")}
+        else:
+            on_disk = {}
+            for path in self.paths:
+                try:
+                    stat = os.stat(path)
+                    on_disk[path] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    pass
+            known = {}
+            for path in self.paths:
+                row = connection.execute("SELECT size, mtime_ns FROM files WHERE path = ?", (path,)).fetchone()
+                if row:
+                    known[path] = tuple(row)
+        if self.cancelled.is_set():
+            return 0
+
+        gone = [path for path in known if path not in on_disk]
+        changed = [path for path, stamp in on_disk.items() if known.get(path) != stamp]
+        with connection:
+            for path in gone:
+                self._forget(connection, path)
+
+        parsed = 0
+        for path in changed:
+            if self.cancelled.is_set():
+                break
+            rows = file_symbols(path)
+            self._forget(connection, path)
+            connection.executemany(
+                "INSERT INTO symbols (key, name, path, line, container) VALUES (?, ?, ?, ?, ?)",
+                [(key, name, path, line, container) for key, name, line, container in rows])
+            connection.execute("INSERT INTO files (path, size, mtime_ns) VALUES (?, ?, ?)", (path, *on_disk[path]))
+            parsed += 1
+            if parsed % COMMIT_EVERY_FILES == 0:
+                connection.commit()
+                self.signals.progress.emit(parsed, len(changed))
+        connection.commit()
+        return parsed
+
+    @staticmethod
+    def _forget(connection, path):
+        connection.execute("DELETE FROM symbols WHERE path = ?", (path,))
+        connection.execute("DELETE FROM files WHERE path = ?", (path,))
+
+
+class SymbolIndex(QObject):
+    """The symbol index of the current project root.
+
+    set_root() opens (or creates) the root's database and refreshes it in the
+    background; file_changed() re-indexes single files, and schedule_refresh()
+    asks for another refresh soon, e.g. after the watcher saw files change
+    outside the IDE. search() can be called
+    any time, also while indexing runs: it sees what has been committed so far.
+    """
+    progress = Signal(int, int)  # files parsed so far, files that need parsing
+    indexing_finished = Signal(int)  # files parsed
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self._rules = None
+        self._connection = None   # GUI-thread connection used by search()
+        self._cancelled = None    # threading.Event of the running job
+        self._queued_paths = set()  # saved while a job was running; indexed next
+        self._refresh_again = False   # a refresh was asked for while a job was running
+        self._signals = _SymbolIndexSignals(self)
+        self._signals.progress.connect(self.progress)
+        self._signals.finished.connect(self._on_job_finished)
+        # A pool of its own: a full index can take minutes and must not hold up
+        # file loads and outline parses on the global pool
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self._refresh)
+
+    def set_root(self, root):
+        root = os.path.abspath(root)
+        if root == self.root:
+            return
+        self.close()
+        self.root = root
+        self._rules = IgnoreRules(root)
+        db_path = index_path_for(root)
+        try:
+            self._connection = _connect(db_path)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Symbol index unavailable for {root}: {e}")
+            return
+        self._start(None)
+
+    def file_changed(self, file_path):
+        """A file was saved or created; index it again if it belongs to the project."""
+        if self._connection is None or os.path.splitext(file_path)[1].lower() not in PARSERS:
+            return
+        file_path = os.path.abspath(file_path)
+        rel_path = self._rules.relative(file_path)
+        if rel_path is None or self._rules.ignored_path(rel_path):
+            return
+        if self.is_indexing():
+            self._queued_paths.add(file_path)
+        else:
+            self._start([file_path])
+
+    def schedule_refresh(self):
+        """Files may have changed on disk: walk the tree again soon. Only files whose
+        size or mtime changed are parsed again, and those that went away are dropped."""
+        if self._connection is not None:
+            self._refresh_timer.start(REFRESH_DELAY_MS)
+
+    def is_indexing(self):
+        return self._cancelled is not None
+
+    def close(self):
+        """Stop indexing and let go of the database."""
+        if self._cancelled is not None:
+            self._cancelled.set()
+            self._cancelled = None
+        self._refresh_timer.stop()
+        self._refresh_again = False
+        self._queued_paths.clear()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def search(self, query, limit=200):
+        """Symbols whose name matches query: [(name, path, line, container), ...], best first.
+
+        Exact matches come first, then prefix matches (shortest first), then names
+        that merely contain the query. Case is ignored.
+        """
+        query = query.strip()
+        if self._connection is None or not query:
+            return []
+        escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        columns = "SELECT name, path, line, container FROM symbols"
+        try:
+            # The prefix LIKE is answered from the key index (key is COLLATE NOCASE)
+            results = self._connection.execute(
+                f"{columns} WHERE key LIKE ? ESCAPE '\\' ORDER BY length(key), key, path, line LIMIT ?",
+                (escaped + '%', limit)).fetchall()
+            if len(results) < limit:
+                results += self._connection.execute(
+                    f"{columns} WHERE key LIKE ? ESCAPE '\\' AND key NOT LIKE ? ESCAPE '\\' LIMIT ?",
+                    ('%' + escaped + '%', escaped + '%', limit - len(results))).fetchall()
+        except sqlite3.Error as e:
+            print(f"Symbol search failed: {e}")
+            return []
+        return results
+
+    def _refresh(self):
+        if self._connection is None:
+            return
+        if self.is_indexing():
+            self._refresh_again = True
+            return
+        self._start(None)
+
+    def _start(self, paths):
+        self._cancelled = threading.Event()
+        self._pool.start(_SymbolIndexJob(
+            self._rules, index_path_for(self.root), paths, self._cancelled, self._signals))
+
+    def _on_job_finished(self, cancelled, parsed, error):
+        if cancelled is not self._cancelled:
+            return  # a job that close() has since cancelled
+        self._cancelled = None
+        if error:
+            print(f"Error indexing symbols of {self.root}: {error}")
+        self.indexing_finished.emit(parsed)
+        if self._refresh_again:
+            # The walk looks at every file, the queued ones included
+            self._refresh_again = False
+            self._queued_paths.clear()
+            self._start(None)
+        elif self._queued_paths:
+            paths, self._queued_paths = sorted(self._queued_paths), set()
+            self._start(paths)
+
+
+class WorkspaceSymbolDialog(FilterListDialog):
+    """Type part of a symbol name, pick a match, and open_symbol(path, line) is called."""
+    MAX_RESULTS = 200
+
+    def __init__(self, symbol_index, open_symbol, parent=None):
+        # Results fill in as the indexer commits
+        super().__init__("Go to Symbol in Workspace", "Symbol name", symbol_index.search, self._format_symbol,
+                         lambda location: open_symbol(*location),
+                         [symbol_index.progress, symbol_index.indexing_finished], parent)
+        self.symbol_index = symbol_index
+        self.update_results()
+
+    def _format_symbol(self, symbol):
+        name, path, line, container = symbol
+        location = f"{os.path.relpath(path, self.symbol_index.root or '')}:{line}"
+        label = f"{name}    {container} — {location}" if container else f"{name}    {location}"
+        return label, (path, line)
+
+    def status_text(self, results, seconds):
+        status = super().status_text(results, seconds)
+        if self.symbol_index.is_indexing():
+            status += " (indexing...)"
+        return status
@@ -1,81 +1,534 @@
+"""The terminal dock: tabs of long-lived shell sessions.
+
+Each tab runs one shell for as long as it's open, so cd, exported variables
+and activated virtualenvs carry over from one command to the next, and a
+command doesn't pay for starting a shell. On POSIX systems the shell runs on
+a pseudo-terminal, so interactive programs (REPLs, prompts, Ctrl+C) behave as
+in any terminal; on Windows it's cmd.exe on pipes.
+
+The view is plain text: escape sequences are dropped, not interpreted. All
+of it is kept, in a log on disk that the view reads back a screenful at a
+time (see terminallog.py), and Ctrl+F searches it.
+"""
 import os
-import platform
-from PySide6.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QPlainTextEdit, QLineEdit
-from PySide6.QtCore import QProcess, Qt
-from PySide6.QtGui import QTextCursor
+import re
+import sys
+import codecs
+import signal
+import struct
+import subprocess
+from PySide6.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QTabWidget,
+                               QToolButton, QCheckBox, QLabel)
+from PySide6.QtCore import QProcess, Qt, QTimer, QObject, QEvent, QSocketNotifier, Signal
+from PySide6.QtGui import QKeySequence, QShortcut
+from terminallog import SessionLog, LogSearch, TerminalLogView, MAX_LOG_BYTES
+from textsearch import compile_query
+from problems import ProblemMatcher
 
-class TerminalDock(QDockWidget):
-    def __init__(self, parent=None):
-        super().__init__("Terminal", parent)
-        self.setAllowedAreas(Qt.BottomDockWidgetArea)
+try:
+    import pty
+    import fcntl
+    import termios
+except ImportError:  # Windows: no pseudo-terminals, cmd.exe on pipes instead
+    pty = None
+
+# Output is collected and appended at most this often (about once a frame), so a
+# chatty process costs one write and one repaint per frame rather than one per read
+OUTPUT_FLUSH_INTERVAL_MS = 16
+
+# CSI, OSC and the short escape sequences a shell or program may print
+_ESCAPE = re.compile(r'\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[()][A-Za-z0-9]|[=>78DEHMc])')
+# The longest unterminated escape sequence held back for the next read
+_MAX_ESCAPE_CHARS = 256
+
+# Runs in the child: make the pseudo-terminal its controlling terminal, then become the
+# shell. Done in a fresh interpreter because running Python code between fork and exec
+# (preexec_fn, pty.fork) isn't safe in a process with Qt threads
+_PTY_LAUNCHER = ("import os, sys, fcntl, termios; os.setsid(); fcntl.ioctl(0, termios.TIOCSCTTY, 0); "
+                 "os.execvp(sys.argv[1], sys.argv[1:])")
+
+
+class TerminalSession(QObject):
+    """One long-lived shell: on a pseudo-terminal, or cmd.exe on pipes where there are none."""
+    output = Signal(bytes)
+    finished = Signal(int)  # the shell's exit code
+    # Output read per wakeup at most, so a flood can't keep the GUI thread reading
+    MAX_READ_BYTES = 256 * 1024
+
+    def __init__(self, cwd=None, parent=None):
+        super().__init__(parent)
+        self.cwd = cwd
+        self._shell = None      # subprocess.Popen of the shell (pty)
+        self._fd = None         # the pseudo-terminal's master side
+        self._read_notifier = None
+        self._write_notifier = None
+        self._unwritten = b''   # input the pseudo-terminal hasn't taken yet
+        self._process = None    # QProcess (no pty)
+
+    def start(self):
+        if pty is None:
+            self._process = QProcess(self)
+            self._process.setProcessChannelMode(QProcess.MergedChannels)
+            if self.cwd:
+                self._process.setWorkingDirectory(self.cwd)
+            self._process.readyReadStandardOutput.connect(
+                lambda: self.output.emit(self._process.readAllStandardOutput().data()))
+            self._process.finished.connect(lambda code, status: self.finished.emit(code))
+            self._process.start("cmd.exe", ["/Q", "/K"])
+            return
+
+        shell = os.environ.get("SHELL") or "/bin/sh"
+        args = [shell, "-i"]
+        if os.path.basename(shell) == "bash":
+            args.insert(1, "--noediting")  # readline would echo and redraw lines itself
+        master, slave = pty.openpty()
+        # The input line shows what's typed; the terminal echoing it too would double it
+        attributes = termios.tcgetattr(slave)
+        attributes[3] &= ~termios.ECHO
+        termios.tcsetattr(slave, termios.TCSANOW, attributes)
+        # Output is shown as plain text: no colours or cursor movement, no pager waiting for keys
+        env = dict(os.environ, TERM="dumb", PAGER="cat", GIT_PAGER="cat")
+        try:
+            self._shell = subprocess.Popen([sys.executable, "-c", _PTY_LAUNCHER] + args,
+                                           stdin=slave, stdout=slave, stderr=slave,
+                                           cwd=self.cwd or None, env=env, close_fds=True)
+        except OSError:
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+        os.set_blocking(master, False)
+        self._fd = master
+        self._read_notifier = QSocketNotifier(master, QSocketNotifier.Read, self)
+        self._read_notifier.activated.connect(self._on_readable)
+        self._write_notifier = QSocketNotifier(master, QSocketNotifier.Write, self)
+        self._write_notifier.setEnabled(False)
+        self._write_notifier.activated.connect(self._on_writable)
+
+    def is_running(self):
+        if self._process is not None:
+            return self._process.state() != QProcess.NotRunning
+        return self._fd is not None
+
+    def is_busy(self):
+        """Whether a program other than the shell has the terminal, e.g. a command still running."""
+        if self._fd is None:
+            return False  # cmd.exe on pipes: no way to tell
+        try:
+            return os.tcgetpgrp(self._fd) != self._shell.pid
+        except OSError:
+            return False
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        if self._process is not None:
+            self._process.write(data)
+            return
+        if self._fd is None:
+            return
+        self._unwritten += data
+        self._on_writable()
+
+    def interrupt(self):
+        """Ctrl+C: interrupt whatever runs in the foreground."""
+        if self._fd is not None:
+            self.write('\x03')  # the terminal turns it into SIGINT for the foreground group
+        elif self._process is not None:
+            # No way to send a console Ctrl+C down a pipe; start afresh instead
+            self.close()
+            self.start()
+
+    def end_of_input(self):
+        """Ctrl+D."""
+        if self._fd is not None:
+            self.write('\x04')
+        elif self._process is not None:
+            self._process.closeWriteChannel()
+
+    def resize(self, columns, rows):
+        if self._fd is not None and columns > 0 and rows > 0:
+            try:
+                fcntl.ioctl(self._fd, termios.TIOCSWINSZ, struct.pack('HHHH', rows, columns, 0, 0))
+            except OSError:
+                pass
+
+    def close(self):
+        """End the shell and whatever it runs."""
+        if self._process is not None:
+            process, self._process = self._process, None
+            process.finished.disconnect()
+            process.kill()
+            process.waitForFinished(1000)
+            return
+        if self._fd is None:
+            return
+        shell = self._shell
+        self._release()
+        try:
+            # The shell leads its own session; hang up on all of it like a closed terminal window
+            os.killpg(shell.pid, signal.SIGHUP)
+        except ProcessLookupError:
+            shell.send_signal(signal.SIGHUP)  # still starting, not leading a session yet
+        try:
+            shell.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            shell.kill()
+            shell.wait()
+
+    def _release(self):
+        self._read_notifier.setEnabled(False)
+        self._write_notifier.setEnabled(False)
+        os.close(self._fd)
+        self._fd = None
+        self._unwritten = b''
+
+    def _on_readable(self):
+        # A terminal hands output over a few KB at a time; take all there is in one go
+        chunks = []
+        size = 0
+        closed = False
+        while size < self.MAX_READ_BYTES:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b''  # EIO: every process holding the terminal is gone
+            if not data:
+                closed = True
+                break
+            chunks.append(data)
+            size += len(data)
+        if chunks:
+            self.output.emit(b''.join(chunks))
+        if not closed:
+            return
+        shell = self._shell
+        self._release()
+        try:
+            code = shell.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            shell.kill()
+            code = shell.wait()
+        self.finished.emit(code)
+
+    def _on_writable(self):
+        if self._fd is None:
+            return
+        while self._unwritten:
+            try:
+                written = os.write(self._fd, self._unwritten)
+            except BlockingIOError:
+                break
+            except OSError:
+                self._unwritten = b''
+                break
+            self._unwritten = self._unwritten[written:]
+        self._write_notifier.setEnabled(bool(self._unwritten))
+
+
+class TerminalWidget(QWidget):
+    """One terminal tab: output view, input line and the shell session behind them."""
+    problems_found = Signal(object)  # [problem, ...] with absolute paths, see problems.py
 
-        container = QWidget()
-        layout = QVBoxLayout(container)
+    def __init__(self, cwd=None, max_log_bytes=MAX_LOG_BYTES, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
 
-        self.output_view = QPlainTextEdit()
-        self.output_view.setReadOnly(True)
-        self.output_view.appendPlainText(">>> ")
+        # Everything the terminal shows goes to a log on disk; the view reads back what's on screen
+        self.log = SessionLog(max_log_bytes)
+        self.output_view = TerminalLogView(self.log)
+        self.search = LogSearch(self.log, self)
+        self.search.changed.connect(self._update_find_status)
+        self.output_view.set_search(self.search)
+        # Compiler errors and tracebacks, picked out of each batch of output as it's shown
+        self.problem_matcher = ProblemMatcher()
+
+        self._pending_output = []  # decoded output not appended yet
+        # Multi-byte characters can be split between reads
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._escape_tail = ''     # an escape sequence cut off at the end of the last read
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self._flush_output)
 
         self.input_line = QLineEdit()
         self.input_line.returnPressed.connect(self.run_command)
+        self.input_line.installEventFilter(self)
+
+        # Find bar, shown by Ctrl+F: Enter goes to the next match, Shift+Enter to the previous one
+        self.find_bar = QWidget()
+        find_layout = QHBoxLayout(self.find_bar)
+        find_layout.setContentsMargins(0, 0, 0, 0)
+        self.find_edit = QLineEdit()
+        self.find_edit.setPlaceholderText("Find in output")
+        self.find_edit.textChanged.connect(self._on_find_changed)
+        self.find_edit.installEventFilter(self)
+        self.find_regex_box = QCheckBox("Regex")
+        self.find_case_box = QCheckBox("Match case")
+        self.find_regex_box.toggled.connect(self._on_find_changed)
+        self.find_case_box.toggled.connect(self._on_find_changed)
+        self.find_status = QLabel()
+        find_layout.addWidget(self.find_edit)
+        find_layout.addWidget(self.find_regex_box)
+        find_layout.addWidget(self.find_case_box)
+        find_layout.addWidget(self.find_status)
+        self.find_bar.hide()
+        find_shortcut = QShortcut(QKeySequence.Find, self)
+        find_shortcut.setContext(Qt.WidgetWithChildrenShortcut)
+        find_shortcut.activated.connect(self.show_find_bar)
 
         layout.addWidget(self.output_view)
+        layout.addWidget(self.find_bar)
         layout.addWidget(self.input_line)
-        self.setWidget(container)
 
-        self.process = QProcess(self)
-        self.process.setProcessChannelMode(QProcess.MergedChannels)
-        self.process.readyReadStandardOutput.connect(self.on_read_output)
-        self.process.finished.connect(self.on_command_finished)
+        self.cwd = cwd
+        self.session = None
+        self._start_session()
 
-        self.shell_command = self._detect_shell_command()
-
-    def _detect_shell_command(self):
-        if platform.system().lower().startswith('win'):
-            return ["cmd.exe", "/C"]
-        else:
-            return ["/bin/sh", "-c"]
+    def _start_session(self):
+        self.session = TerminalSession(self.cwd, self)
+        self.session.output.connect(self.on_read_output)
+        self.session.finished.connect(self.on_session_finished)
+        try:
+            self.session.start()
+        except OSError as e:
+            self._append_output(f"[Could not start a shell: {e}]\n")
+            self.session = None
+            return
+        self._resize_session()
 
     def run_command(self):
-        command = self.input_line.text().strip()
-        if not command:
-            return
+        command = self.input_line.text()
         self.input_line.clear()
         self.execute_command(command)
 
     def execute_command(self, command: str):
-        self.output_view.moveCursor(QTextCursor.End)
-        self.output_view.insertPlainText("> " + command + "\n")
-        self.process.start(self.shell_command[0], self.shell_command[1:] + [command])
+        """Send a line to the shell (or to whatever program has the terminal)."""
+        if self.session is None or not self.session.is_running():
+            self._start_session()
+            if self.session is None:
+                return
+        # The terminal doesn't echo; show the line after the prompt ourselves
+        self._append_output(command + "\n")
+        self._flush_output()
+        self.output_view.scroll_to_bottom()
+        self.session.write(command + "\n")
 
-    def on_read_output(self):
-        data = self.process.readAllStandardOutput().data().decode(errors='replace')
-        self.output_view.moveCursor(QTextCursor.End)
-        self.output_view.insertPlainText(data)
+    def is_busy(self):
+        return self.session is not None and self.session.is_busy()
 
-    def on_command_finished(self):
-        self.output_view.moveCursor(QTextCursor.End)
-        self.output_view.insertPlainText(">>> ")
-        self.output_view.verticalScrollBar().setValue(self.output_view.verticalScrollBar().maximum())
+    def on_read_output(self, data):
+        text = self._escape_tail + self._decoder.decode(data)
+        self._escape_tail = ''
+        start = text.rfind('\x1b')
+        if start >= 0 and not _ESCAPE.match(text, start) and len(text) - start < _MAX_ESCAPE_CHARS:
+            text, self._escape_tail = text[:start], text[start:]
+        text = _ESCAPE.sub('', text).replace('\r\n', '\n')
+        # Bare carriage returns (progress bars redrawing a line) and bells mean nothing here
+        self._append_output(text.replace('\r', '').replace('\x07', ''))
 
-    def reset_terminal(self):
-        """Kill any running process, clear output, and re-initialize QProcess."""
-        # If a process is running, kill it
-        if self.process.state() == QProcess.Running:
-            self.process.kill()
-            self.process.waitForFinished(1000)
+    def on_session_finished(self, code):
+        self._append_output(self._decoder.decode(b'', final=True) +
+                            f"\n[Shell exited with code {code}; press Enter to start a new one]\n")
+        self._flush_output()
+
+    def close_session(self):
+        if self.session is not None:
+            self.session.finished.disconnect(self.on_session_finished)
+            self.session.close()
+            self.session = None
 
-        # Clear the output
-        self.output_view.clear()
+    def close_log(self):
+        """Stop searching and delete the output log; for a terminal that's going away."""
+        self.search.cancel()
+        self.log.close()
 
-        # Re-create the prompt
-        self.output_view.appendPlainText(">>> ")
+    def reset_terminal(self):
+        """End the shell and anything running in it, clear the output, and start a new shell."""
+        self.close_session()
+        self._flush_timer.stop()
+        self._pending_output = []
+        self._decoder.reset()
+        self._escape_tail = ''
+        self.problem_matcher.reset()
+        self.log.clear()
+        self.output_view.reset()
+        self.search.update()
         self.input_line.clear()
+        self._start_session()
+
+    def _append_output(self, text):
+        if text:
+            self._pending_output.append(text)
+            if not self._flush_timer.isActive():
+                self._flush_timer.start(OUTPUT_FLUSH_INTERVAL_MS)
+
+    def _flush_output(self):
+        """Write everything collected since the last flush to the log in one go, and show it."""
+        self._flush_timer.stop()
+        if not self._pending_output:
+            return
+        text = ''.join(self._pending_output)
+        self._pending_output = []
+        self.log.append(text)
+        self.output_view.log_changed()
+        self.search.update()
+        problems = self.problem_matcher.feed(text)
+        if problems:
+            self.problems_found.emit([self._absolute(problem) for problem in problems])
+
+    def _absolute(self, problem):
+        """problem with its paths made absolute, taking relative ones as relative to where the shell started."""
+        # The shell may have changed directory since; its starting directory is the best guess
+        base = self.cwd or os.getcwd()
+        severity, path, line, column, message, frames = problem
+        frames = [(frame_path if frame_path.startswith('<') else os.path.normpath(os.path.join(base, frame_path)),
+                   frame_line, function) for frame_path, frame_line, function in frames]
+        return severity, os.path.normpath(os.path.join(base, path)), line, column, message, frames
+
+    def show_find_bar(self):
+        self.find_bar.show()
+        self.find_edit.setFocus()
+        self.find_edit.selectAll()
+        self._on_find_changed()
+
+    def hide_find_bar(self):
+        self.find_bar.hide()
+        self.search.cancel()
+        self.output_view.viewport().update()
+        self.input_line.setFocus()
+
+    def find_next(self, backwards=False):
+        """Select the next line of output matching the find bar's query."""
+        line = self.search.next_match(self.output_view.current_line(), backwards)
+        if line is not None:
+            self.output_view.show_line(line)
+        self._update_find_status()
+
+    def _on_find_changed(self):
+        text = self.find_edit.text()
+        if not text:
+            self.search.cancel()
+            self._update_find_status()
+            return
+        try:
+            pattern = compile_query(text, self.find_regex_box.isChecked(), self.find_case_box.isChecked())
+        except re.error as e:
+            self.search.cancel()
+            self.find_status.setText(f"Invalid regex: {e}")
+            return
+        if pattern.search(''):
+            self.search.cancel()
+            self.find_status.setText("Matches empty text")
+            return
+        self.search.start(pattern)
+
+    def _update_find_status(self):
+        if self.search.pattern is None:
+            if not self.find_edit.text():
+                self.find_status.clear()
+            return
+        count = len(self.search.matches)
+        text = f"{count}+ lines" if self.search.truncated else f"{count} lines"
+        if self.search.is_searching():
+            text += ", searching..."
+        self.find_status.setText(text)
+        self.output_view.viewport().update()
+
+    def _resize_session(self):
+        if self.session is not None:
+            metrics = self.output_view.fontMetrics()
+            viewport = self.output_view.viewport()
+            self.session.resize(viewport.width() // max(1, metrics.horizontalAdvance('M')),
+                                viewport.height() // max(1, metrics.lineSpacing()))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._resize_session()
+
+    def eventFilter(self, watched, event):
+        if watched is self.find_edit and event.type() == QEvent.KeyPress:
+            if event.key() in (Qt.Key_Return, Qt.Key_Enter):
+                self.find_next(bool(event.modifiers() & Qt.ShiftModifier))
+                return True
+            if event.key() == Qt.Key_Escape:
+                self.hide_find_bar()
+                return True
+        # Ctrl+C interrupts (unless there's a selection to copy), Ctrl+D ends input
+        if watched is self.input_line and event.type() == QEvent.KeyPress and self.session is not None:
+            if event.matches(QKeySequence.Copy) and not self.input_line.hasSelectedText():
+                self.session.interrupt()
+                return True
+            if event.key() == Qt.Key_D and event.modifiers() == Qt.ControlModifier and not self.input_line.text():
+                self.session.end_of_input()
+                return True
+        return super().eventFilter(watched, event)
+
+
+class TerminalDock(QDockWidget):
+    problems_found = Signal(object)  # from any of the terminals, see TerminalWidget.problems_found
+
+    def __init__(self, parent=None, max_log_bytes=MAX_LOG_BYTES):
+        super().__init__("Terminal", parent)
+        self.setAllowedAreas(Qt.BottomDockWidgetArea)
+        self.max_log_bytes = max_log_bytes
+        self.cwd = None  # where new terminals start; None for the IDE's own directory
+        self._terminal_count = 0
+
+        self.tabs = QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.setDocumentMode(True)
+        self.tabs.tabCloseRequested.connect(self.close_terminal)
+        new_button = QToolButton()
+        new_button.setText("+")
+        new_button.setToolTip("New Terminal")
+        new_button.clicked.connect(self.new_terminal)
+        self.tabs.setCornerWidget(new_button, Qt.TopRightCorner)
+        self.setWidget(self.tabs)
+
+        self.new_terminal()
+
+    def new_terminal(self):
+        terminal = TerminalWidget(self.cwd, self.max_log_bytes)
+        terminal.problems_found.connect(self.problems_found)
+        self._terminal_count += 1
+        self.tabs.addTab(terminal, f"Terminal {self._terminal_count}")
+        self.tabs.setCurrentWidget(terminal)
+        terminal.input_line.setFocus()
+        return terminal
+
+    def current_terminal(self):
+        return self.tabs.currentWidget()
+
+    def close_terminal(self, index):
+        terminal = self.tabs.widget(index)
+        self.tabs.removeTab(index)
+        terminal.close_session()
+        terminal.close_log()
+        terminal.deleteLater()
+        if self.tabs.count() == 0:
+            self.new_terminal()
+
+    def set_root_directory(self, path):
+        """Start terminals opened from now on in path."""
+        self.cwd = path
+
+    def execute_command(self, command: str):
+        """Run a command in the current terminal, or in a new one if something is running there."""
+        terminal = self.current_terminal()
+        if terminal.is_busy():
+            terminal = self.new_terminal()
+        self.show()
+        self.raise_()
+        terminal.execute_command(command)
+
+    def reset_terminal(self):
+        self.current_terminal().reset_terminal()
 
-        # Re-init QProcess connections
-        self.process = QProcess(self)
-        self.process.setProcessChannelMode(QProcess.MergedChannels)
-        self.process.readyReadStandardOutput.connect(self.on_read_output)
-        self.process.finished.connect(self.on_command_finished)
-        # shell_command remains the same (no need to reset)
+    def shutdown(self):
+        """End every terminal's shell and delete its output log."""
+        for index in range(self.tabs.count()):
+            self.tabs.widget(index).close_session()
+            self.tabs.widget(index).close_log()
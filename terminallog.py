@@ -0,0 +1,379 @@
+"""Terminal output kept on disk instead of in a text document.
+
+A terminal tab writes everything it shows to a SessionLog: a temporary file
+that only grows, plus the offset of every LINE_INDEX_STRIDE-th line.
+TerminalLogView draws just the lines in its viewport, read back from the file,
+and LogSearch collects the numbers of the lines matching a query with a
+background scan that carries on from where it stopped as more output comes
+in. A 10-million-line build costs about a megabyte of index, and scrolling or
+searching it costs the same as for a short one.
+"""
+import os
+import mmap
+import bisect
+import tempfile
+import threading
+from array import array
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtGui import QColor
+from largefile import PagedView, index_line_starts, MAX_LINE_BYTES
+from textsearch import search_text
+
+# Logs live here rather than in the temp directory, which is often in memory (tmpfs)
+LOG_DIR = os.path.join(os.path.expanduser("~"), ".ide_terminal")
+# The log remembers where every this many'th line starts; a line is read by
+# reading on from the nearest one
+LINE_INDEX_STRIDE = 64
+# Once a log holds this much, earlier output is dropped so a runaway process can't fill the disk;
+# the newest half is kept
+MAX_LOG_BYTES = 2 * 1024 * 1024 * 1024
+# Bytes carried over per write when the newest output moves to a fresh log
+KEEP_CHUNK_BYTES = 8 * 1024 * 1024
+# Bytes read from the log per call when reading lines back
+READ_CHUNK_BYTES = 64 * 1024
+# How much of the log a search decodes and scans at a time
+SEARCH_CHUNK_BYTES = 4 * 1024 * 1024
+# A search stops after this many matching lines
+MAX_SEARCH_MATCHES = 100_000
+# Lines copied at most in one go
+MAX_COPY_LINES = 100_000
+
+
+class SessionLog:
+    """Append-only terminal output in an unnamed temporary file, with a sparse index of line starts."""
+    def __init__(self, max_bytes=MAX_LOG_BYTES):
+        self.max_bytes = max_bytes
+        self._file = None
+        self.generation = -1  # changes whenever earlier output is dropped
+        self.clear()
+
+    def clear(self):
+        """Drop all output."""
+        # A fresh file rather than truncating this one: a search may still have it mapped
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(LOG_DIR, exist_ok=True)
+        # Unnamed (or deleted on close on Windows), so nothing is left behind even after a crash
+        self._file = tempfile.TemporaryFile(prefix='terminal-', suffix='.log', dir=LOG_DIR)
+        self.generation += 1
+        self.size = 0
+        self.newlines = 0
+        self._starts = array('Q', [0])  # offsets of lines 0, LINE_INDEX_STRIDE, 2 * LINE_INDEX_STRIDE, ...
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def line_count(self):
+        """Lines in the log, counting the one the next output goes on."""
+        return self.newlines + 1
+
+    def append(self, text):
+        if self._file is None or not text:
+            return
+        data = text.encode('utf-8')
+        if self.size + len(data) > self.max_bytes:
+            keep = self.max_bytes // 2 - len(data)
+            if keep < 0:
+                # More than the half kept on its own: only its end stays, so nothing before it can
+                data = data[-(self.max_bytes // 2):]
+                data = data[data.find(b'\n') + 1:]  # from a line start
+            self._drop_earlier(keep)
+        self._write(data)
+
+    def _drop_earlier(self, keep):
+        """Start a fresh log holding a notice and up to keep bytes of the newest output, from a line start."""
+        old_file, old_size = self._file, self.size
+        old_file.flush()
+        self._file = None  # clear() mustn't close it yet
+        self.clear()
+        self._write(f"[Earlier output dropped: the log is limited to {self.max_bytes // (1024 * 1024)} MB]\n"
+                    .encode('utf-8'))
+        if keep > 0 and old_size:
+            with mmap.mmap(old_file.fileno(), old_size, access=mmap.ACCESS_READ) as old:
+                start = 0
+                if keep < old_size:
+                    # No line start in what fits means nothing to keep
+                    start = old.find(b'\n', old_size - keep) + 1 or old_size
+                for offset in range(start, old_size, KEEP_CHUNK_BYTES):
+                    self._write(old[offset:min(old_size, offset + KEEP_CHUNK_BYTES)])
+        old_file.close()
+
+    def _write(self, data):
+        """Write data at the end of the log and index the lines it starts."""
+        self._file.seek(self.size)
+        self._file.write(data)
+        starts = index_line_starts(data, self.size)
+        # starts[0] is the start of line newlines + 1; keep those that fall on the stride
+        first = (-(self.newlines + 1)) % LINE_INDEX_STRIDE
+        self._starts.extend(starts[first::LINE_INDEX_STRIDE])
+        self.newlines += len(starts)
+        self.size += len(data)
+
+    def lines(self, first, count):
+        """Text of up to count lines from the 0-based line first on, each cut off at MAX_LINE_BYTES."""
+        count = min(count, self.line_count() - first)
+        if self._file is None or count <= 0:
+            return []
+        block, skip = divmod(first, LINE_INDEX_STRIDE)
+        self._file.seek(self._starts[block])
+        remaining = self.size - self._starts[block]
+        lines = []
+        line = b''
+        while remaining > 0 and len(lines) < skip + count:
+            chunk = self._file.read(min(READ_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            parts = chunk.split(b'\n')
+            for part in parts[:-1]:
+                lines.append(line + part[:MAX_LINE_BYTES - len(line)])
+                line = b''
+            if len(line) < MAX_LINE_BYTES:
+                line += parts[-1][:MAX_LINE_BYTES - len(line)]
+        lines.append(line)
+        return [text.decode('utf-8', errors='replace').expandtabs(4) for text in lines[skip:skip + count]]
+
+    def snapshot(self):
+        """(mapping, size, newlines) of the complete lines written so far, for reading on another thread.
+
+        mapping is None when there's no complete line yet; whoever gets one closes it.
+        """
+        if self._file is None or not self.newlines:
+            return None, 0, 0
+        self._file.flush()
+        mapping = mmap.mmap(self._file.fileno(), self.size, access=mmap.ACCESS_READ)
+        return mapping, mapping.rfind(b'\n') + 1, self.newlines
+
+
+class _LogSearchSignals(QObject):
+    found = Signal(object, object)  # cancelled event of the search, array of line numbers
+    finished = Signal(object, bool)  # cancelled event of the search, whether it stopped at MAX_SEARCH_MATCHES
+
+class _LogSearchJob(QRunnable):
+    """Scans a stretch of a log for matching lines, one chunk at a time."""
+    def __init__(self, mapping, start, end, first_line, pattern, max_matches, cancelled, signals):
+        super().__init__()
+        self.mapping = mapping
+        self.start = start            # a line start
+        self.end = end                # just past a line break
+        self.first_line = first_line  # number of the line at start
+        self.pattern = pattern
+        self.max_matches = max_matches
+        self.cancelled = cancelled
+        self.signals = signals
+
+    def run(self):
+        try:
+            position = self.start
+            line = self.first_line
+            found = 0
+            while position < self.end and found < self.max_matches and not self.cancelled.is_set():
+                end = self.mapping.rfind(b'\n', position, min(self.end, position + SEARCH_CHUNK_BYTES)) + 1
+                if end <= position:  # one line longer than a chunk
+                    end = self.mapping.find(b'\n', position, self.end) + 1
+                # Chunks end on line breaks, so no line (or character) is split between two
+                text = self.mapping[position:end].decode('utf-8', errors='replace')
+                matches = search_text(text, self.pattern, self.max_matches - found)
+                if matches:
+                    found += len(matches)
+                    self.signals.found.emit(self.cancelled,
+                                            array('Q', (line + number - 1 for number, _, _ in matches)))
+                line += text.count('\n')
+                position = end
+            self.signals.finished.emit(self.cancelled, found >= self.max_matches)
+        except RuntimeError:
+            pass  # the search was deleted while we were scanning
+        finally:
+            self.mapping.close()
+
+
+class LogSearch(QObject):
+    """The lines of a SessionLog matching a pattern, kept up to date as the log grows."""
+    changed = Signal()  # more matches, or the search finished
+
+    def __init__(self, log, parent=None):
+        super().__init__(parent)
+        self.log = log
+        self.pattern = None
+        self.matches = array('Q')  # matching line numbers, ascending
+        self.truncated = False
+        self._generation = None
+        self._searched_to = 0      # offset the log has been searched up to (a line start)
+        self._searched_lines = 0   # lines before _searched_to
+        self._cancelled = None     # threading.Event of the running scan
+        self._signals = _LogSearchSignals(self)
+        self._signals.found.connect(self._on_found)
+        self._signals.finished.connect(self._on_finished)
+        # One scan at a time, off the global pool
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+
+    def start(self, pattern):
+        """Search the whole log for pattern (a compiled regex, see textsearch.compile_query)."""
+        self.cancel()
+        self.pattern = pattern
+        self._restart()
+
+    def cancel(self):
+        """Stop searching and forget the query."""
+        if self._cancelled is not None:
+            self._cancelled.set()
+            self._cancelled = None
+        self.pattern = None
+        self.matches = array('Q')
+        self.truncated = False
+
+    def is_searching(self):
+        return self._cancelled is not None
+
+    def update(self):
+        """Search the output appended since the last scan; call after appending to the log."""
+        if self.pattern is None:
+            return
+        if self.log.generation != self._generation:
+            # Earlier output was dropped; line numbers start over
+            if self._cancelled is not None:
+                self._cancelled.set()
+                self._cancelled = None
+            self._restart()
+        elif self._cancelled is None and not self.truncated:
+            self._scan()
+
+    def next_match(self, line, backwards=False):
+        """The first matching line after line (before it if backwards), wrapping around; None without matches."""
+        if not self.matches:
+            return None
+        if backwards:
+            index = bisect.bisect_left(self.matches, line) - 1
+            return self.matches[index]  # -1 wraps to the last one
+        index = bisect.bisect_right(self.matches, line)
+        return self.matches[index % len(self.matches)]
+
+    def matches_between(self, first, last):
+        """Matching lines from first up to, not including, last."""
+        return self.matches[bisect.bisect_left(self.matches, first):bisect.bisect_left(self.matches, last)]
+
+    def _restart(self):
+        self.matches = array('Q')
+        self.truncated = False
+        self._generation = self.log.generation
+        self._searched_to = 0
+        self._searched_lines = 0
+        self._scan()
+        self.changed.emit()
+
+    def _scan(self):
+        mapping, end, lines = self.log.snapshot()
+        if mapping is None:
+            return
+        if end <= self._searched_to:
+            mapping.close()
+            return
+        start, first_line = self._searched_to, self._searched_lines
+        self._searched_to, self._searched_lines = end, lines
+        self._cancelled = threading.Event()
+        self._pool.start(_LogSearchJob(mapping, start, end, first_line, self.pattern,
+                                       MAX_SEARCH_MATCHES - len(self.matches), self._cancelled, self._signals))
+
+    def _on_found(self, cancelled, lines):
+        if cancelled is not self._cancelled:
+            return  # a search that has been replaced since
+        self.matches.extend(lines)
+        self.changed.emit()
+
+    def _on_finished(self, cancelled, truncated):
+        if cancelled is not self._cancelled:
+            return
+        self._cancelled = None
+        self.truncated = truncated
+        self.changed.emit()
+        # Output that came in while this scan ran
+        self.update()
+
+
+class TerminalLogView(PagedView):
+    """Read-only view of a SessionLog that reads back only the lines on screen.
+
+    It follows the output while scrolled to the bottom. Clicking selects a
+    line, dragging or shift-clicking selects a range of lines to copy.
+    """
+    def __init__(self, log, parent=None):
+        super().__init__(parent)
+        self.log = log
+        self.search = None      # LogSearch whose matches are highlighted
+        self._follow = True
+        self._screenful = (None, 0, [])  # (log generation and size, first line, lines) last read back
+
+    def set_search(self, search):
+        self.search = search
+        search.changed.connect(self.viewport().update)
+
+    def log_changed(self):
+        """Show the lines appended to the log (or that it was cleared)."""
+        if self._current_row is not None and self._current_row >= self.log.line_count():
+            self._anchor_row = self._current_row = None
+        self._update_scrollbars()
+        if self._follow:
+            self.scroll_to_bottom()
+        self.viewport().update()
+
+    def reset(self):
+        """Forget the selection and width after the log was cleared."""
+        self._anchor_row = self._current_row = None
+        self._widest = 0
+        self._follow = True
+        self.log_changed()
+
+    def scroll_to_bottom(self):
+        vertical = self.verticalScrollBar()
+        vertical.setValue(vertical.maximum())
+
+    def show_line(self, line):
+        """Scroll a 0-based line into view and select it."""
+        self._select_row(line)
+
+    def current_line(self):
+        """The selected line, or the first one on screen."""
+        return self._current_row if self._current_row is not None else self.verticalScrollBar().value()
+
+    def row_count(self):
+        return self.log.line_count()
+
+    def row_text(self, line):
+        # Painting asks for the lines one at a time; read them back a screenful at a time
+        state, first, lines = self._screenful
+        if state != (self.log.generation, self.log.size) or not first <= line < first + len(lines):
+            first = line
+            lines = self.log.lines(first, self._visible_rows() + 1)
+            self._screenful = ((self.log.generation, self.log.size), first, lines)
+        return lines[line - first] if line - first < len(lines) else ''
+
+    def selected_text(self):
+        if self._current_row is None:
+            return ''
+        first, last = sorted((self._anchor_row, self._current_row))
+        return '\n'.join(self.log.lines(first, min(last - first + 1, MAX_COPY_LINES)))
+
+    def _on_scrolled(self, value):
+        self._follow = value >= self.verticalScrollBar().maximum()
+        super()._on_scrolled(value)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self._follow:
+            self.scroll_to_bottom()
+
+    def _paint_row(self, painter, line, top):
+        palette = self.palette()
+        metrics = self.fontMetrics()
+        line_height = metrics.lineSpacing()
+        if self._is_selected(line):
+            painter.fillRect(0, top, self.viewport().width(), line_height, palette.highlight())
+            painter.setPen(palette.highlightedText().color())
+        else:
+            if self.search and self.search.matches_between(line, line + 1):
+                painter.fillRect(0, top, self.viewport().width(), line_height, QColor(255, 200, 0, 80))
+            painter.setPen(palette.text().color())
+        painter.drawText(2 - self.horizontalScrollBar().value(), top + metrics.ascent(), self.row_text(line))
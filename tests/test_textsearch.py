@@ -0,0 +1,49 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import textsearch
+from textsearch import compile_query, search_file, search_text, SEARCH_CHUNK_BYTES
+
+
+def _search(path, query, max_matches=1000):
+    """search_file() with a time limit, so a hang fails the test instead of the run."""
+    results = []
+    worker = threading.Thread(target=lambda: results.append(search_file(path, compile_query(query), max_matches)),
+                              daemon=True)
+    worker.start()
+    worker.join(10)
+    assert not worker.is_alive(), f"search_file() did not return for {path}"
+    return results[0]
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+    assert _search(str(path), "zzzq") == []
+
+
+def test_file_bigger_than_a_chunk_ending_in_newline(tmp_path):
+    path = tmp_path / "big.txt"
+    line = b"some text on a line\n"
+    path.write_bytes(line * (SEARCH_CHUNK_BYTES // len(line) + 10))
+    assert _search(str(path), "zzzq") == []
+    matches = _search(str(path), "text", max_matches=3)
+    assert [line_number for line_number, _, _ in matches] == [1, 2, 3]
+
+
+def test_chunks_give_the_same_matches_as_one_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(textsearch, "SEARCH_CHUNK_BYTES", 64)
+    text = "".join(f"line {i} {'needle' if i % 7 == 0 else 'hay'}\n" for i in range(500))
+    path = tmp_path / "lines.txt"
+    path.write_text(text)
+    pattern = compile_query("needle")
+    assert _search(str(path), "needle") == search_text(text, pattern, 1000)
+
+
+def test_binary_file(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"\0" * 100 + b"needle\n")
+    assert _search(str(path), "needle") == []
@@ -0,0 +1,95 @@
+"""Searching file contents for Find in Files.
+
+search_files() runs in worker processes, so this module must not import Qt.
+"""
+import re
+from filesniff import looks_binary, BINARY_SNIFF_BYTES
+
+# Lines shown in the results are cut to about this many characters around the match
+MAX_EXCERPT_CHARS = 200
+# Files are read and searched this much at a time, so a huge log never has to fit in memory
+SEARCH_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def compile_query(text, regex=False, match_case=False, whole_word=False):
+    """The pattern Find in Files looks for. Raises re.error for a bad regex."""
+    pattern = text if regex else re.escape(text)
+    if whole_word:
+        pattern = rf'\b(?:{pattern})\b'
+    return re.compile(pattern, re.MULTILINE | (0 if match_case else re.IGNORECASE))
+
+
+def _excerpt(line, column):
+    line = line.rstrip('\r')
+    if len(line) <= MAX_EXCERPT_CHARS:
+        return line.strip()
+    start = max(0, column - MAX_EXCERPT_CHARS // 4)
+    return ('...' if start else '') + line[start:start + MAX_EXCERPT_CHARS].strip() + '...'
+
+
+def search_text(text, pattern, max_matches):
+    """[(line number, column, line excerpt), ...] of the lines of text pattern matches; 1-based lines."""
+    matches = []
+    line_number = 1
+    counted_to = 0     # newlines before this offset are counted in line_number
+    last_line_end = -1
+    for match in pattern.finditer(text):
+        start = match.start()
+        if start <= last_line_end:
+            continue  # one entry per line
+        line_number += text.count('\n', counted_to, start)
+        counted_to = start
+        line_start = text.rfind('\n', 0, start) + 1
+        last_line_end = text.find('\n', start)
+        if last_line_end < 0:
+            last_line_end = len(text)
+        matches.append((line_number, start - line_start,
+                        _excerpt(text[line_start:last_line_end], start - line_start)))
+        if len(matches) >= max_matches:
+            break
+    return matches
+
+
+def search_file(path, pattern, max_matches):
+    """search_text() on a file's contents; [] for binary and unreadable files.
+
+    Only the first BINARY_SNIFF_BYTES are read before deciding a file is text;
+    after that it is searched SEARCH_CHUNK_BYTES of whole lines at a time (a
+    match spanning lines can't cross from one chunk to the next).
+    """
+    matches = []
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(BINARY_SNIFF_BYTES)
+            if looks_binary(data):
+                return []
+            lines_before = 0
+            while True:
+                more = f.read(SEARCH_CHUNK_BYTES)
+                data += more
+                # Up to the last line break; what follows goes with the next chunk
+                end = data.rfind(b'\n') + 1 if more else len(data)
+                if not end:
+                    if more:
+                        continue  # a line longer than a chunk: read on to its end
+                    break  # the file ended on a line break, and all of it has been searched
+                chunk, data = data[:end], data[end:]
+                for line, column, excerpt in search_text(chunk.decode('utf-8', errors='replace'), pattern,
+                                                         max_matches - len(matches)):
+                    matches.append((lines_before + line, column, excerpt))
+                if not more or len(matches) >= max_matches:
+                    break
+                lines_before += chunk.count(b'\n')
+    except OSError:
+        return []
+    return matches
+
+
+def search_files(paths, pattern, max_matches):
+    """[(path, matches), ...] for the files in paths that have any. One worker task."""
+    results = []
+    for path in paths:
+        matches = search_file(path, pattern, max_matches)
+        if matches:
+            results.append((path, matches))
+    return results
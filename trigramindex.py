@@ -0,0 +1,484 @@
+"""On-disk trigram index of the project's files, to narrow down Find in Files.
+
+Every text file under the root (less what ignore.py excludes) is fed to a
+SQLite FTS5 table with the trigram tokenizer, in a database in INDEX_DIR, one
+per root. The table is contentless and keeps no positions (detail=none), so
+it is essentially an inverted index from each trigram to the files containing
+it, maintained in C by SQLite.
+
+A search turns its pattern into the trigrams any match must contain (see
+match_expression()), asks the index which files have all of them, and only
+reads those. The regex is still what decides; the index just rules files out.
+
+The index is kept up to date incrementally: a refresh walks the tree and
+re-indexes only files whose size or mtime changed. FTS5 in this SQLite can't
+delete a row of a contentless table without its old text, so a changed file
+gets a new document and the old one is left as a tombstone that the files
+table no longer points to. Once tombstones outnumber live documents the next
+refresh rebuilds the table from scratch.
+"""
+import os
+import sqlite3
+import hashlib
+import re
+import threading
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+from filesniff import looks_binary, BINARY_SNIFF_BYTES
+from ignore import IgnoreRules, walk_files
+
+INDEX_DIR = os.path.join(os.path.expanduser("~"), ".ide_index")
+# Larger files aren't indexed; searches always read them
+MAX_INDEXED_FILE_BYTES = 8 * 1024 * 1024
+# Commit after indexing this much text, so searches see the index fill up
+COMMIT_EVERY_BYTES = 64 * 1024 * 1024
+# Trigrams looked up per alternative of a pattern; more rarely rules out more files
+MAX_QUERY_TRIGRAMS = 16
+# Refreshes are started at most this long after the changes that call for them
+REFRESH_DELAY_MS = 2000
+
+# files.doc values other than an FTS rowid
+_NOT_INDEXED = None  # too big to index: always a candidate
+_BINARY = -1         # never a candidate, Find in Files skips binaries
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, doc INTEGER);
+CREATE INDEX IF NOT EXISTS files_doc ON files (doc);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+CREATE VIRTUAL TABLE IF NOT EXISTS grams USING fts5(body, tokenize='trigram', detail='none', content='');
+"""
+
+
+def index_path_for(root):
+    """Where the trigram database of a project root lives; one per absolute path."""
+    digest = hashlib.blake2b(os.path.abspath(root).encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(INDEX_DIR, digest + '.trigrams.sqlite')
+
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+# Escapes standing for a class of characters or a position, and for one literal character
+_CLASS_ESCAPES = set('dDwWsSbBAZ')
+_CHAR_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v', 'a': '\a'}
+# {m}, {m,}, {,n}, {m,n} and {,}; anything else after a '{' is literal text to re
+_QUANTIFIER = re.compile(r'\{(?=[\d,])(\d*)(?:,\d*)?\}')
+
+
+class _Unsure(Exception):
+    """The pattern uses a construct the literal scan doesn't follow."""
+
+
+def _required_literals(source, limit=16):
+    """Alternatives of literal strings a match of a regex's source must contain.
+
+    Returns a list of alternatives, each a list of strings that all occur in
+    any match taking that alternative; [[]] means nothing is known. The source
+    is scanned for runs of literal characters, and anything the scan doesn't
+    follow (inline flags, \\x escapes, backreferences, ...) raises _Unsure.
+    """
+    alternatives, end = _scan_alternation(source, 0, limit)
+    if end != len(source):
+        raise _Unsure  # a stray ')'
+    return alternatives
+
+
+def _scan_alternation(source, position, limit):
+    """Branches separated by '|', up to the ')' closing them or the end; returns
+    (alternatives, position of that ')' or the end)."""
+    options = []
+    while True:
+        branch, position = _scan_sequence(source, position, limit)
+        options.extend(branch)
+        if source[position:position + 1] != '|':
+            break
+        position += 1
+    # Too many alternatives: keep what every one of them requires, i.e. nothing
+    return (options if len(options) <= limit else [[]]), position
+
+
+def _scan_sequence(source, position, limit):
+    """One branch, up to a '|', a ')' or the end; returns (alternatives, position)."""
+    alternatives = [[]]
+    run = []
+
+    def flush():
+        if run:
+            for alternative in alternatives:
+                alternative.append(''.join(run))
+            run.clear()
+
+    def combine(options):
+        nonlocal alternatives
+        product = [a + o for a in alternatives for o in options]
+        alternatives = product if len(product) <= limit else alternatives
+
+    while position < len(source) and source[position] not in '|)':
+        char = source[position]
+        literal = group = None
+        if char == '\\':
+            escaped = source[position + 1:position + 2]
+            if escaped.isascii() and escaped.isalnum():
+                if escaped in _CHAR_ESCAPES:
+                    literal = _CHAR_ESCAPES[escaped]
+                elif escaped not in _CLASS_ESCAPES:
+                    raise _Unsure  # \x41, \u00e9, \N{...}, backreferences, ...
+            elif escaped:
+                literal = escaped
+            else:
+                raise _Unsure
+            position += 2
+        elif char == '[':
+            position = _skip_class(source, position)
+        elif char == '(':
+            group, position = _scan_group(source, position, limit)
+        elif char in '.^$':
+            position += 1
+        elif char in '*+?' or _QUANTIFIER.match(source, position):
+            raise _Unsure  # a quantifier with nothing to repeat
+        else:
+            literal = char
+            position += 1
+
+        low, position = _scan_quantifier(source, position)
+        if literal is not None and low is None:
+            run.append(literal)
+            continue
+        flush()
+        if low == 0:
+            continue  # may be left out of a match
+        if literal is not None:
+            # Repeated: it ends what comes before and starts what comes after
+            run.append(literal)
+            flush()
+            run.append(literal)
+        elif group is not None:
+            combine(group)
+    flush()
+    return alternatives, position
+
+
+def _scan_quantifier(source, position):
+    """(minimum repeats, position after it) of a quantifier at position; the minimum is None if there's none."""
+    char = source[position:position + 1]
+    match = _QUANTIFIER.match(source, position)
+    if char and char in '*?':
+        low, position = 0, position + 1
+    elif char == '+':
+        low, position = 1, position + 1
+    elif match:
+        low, position = int(match.group(1) or 0), match.end()
+    else:
+        return None, position
+    if source[position:position + 1] in ('?', '+'):
+        position += 1  # lazy or possessive
+    return low, position
+
+
+def _skip_class(source, position):
+    """Position after the [...] class starting at position."""
+    position += 1
+    if source[position:position + 1] == '^':
+        position += 1
+    if source[position:position + 1] == ']':
+        position += 1  # a ']' first is part of the class
+    while position < len(source):
+        if source[position] == '\\':
+            position += 2
+        elif source[position] == ']':
+            return position + 1
+        else:
+            position += 1
+    raise _Unsure
+
+
+def _scan_group(source, position, limit):
+    """(alternatives, position after the group) of the (...) starting at position;
+    alternatives is None for groups that don't consume text, e.g. lookarounds."""
+    required = True
+    if source.startswith('(?', position):
+        kind = source[position + 2:position + 3]
+        if kind in (':', '>'):
+            start = position + 3
+        elif source.startswith('(?P<', position):
+            start = source.find('>', position) + 1
+            if not start:
+                raise _Unsure
+        elif kind in ('=', '!') or source.startswith(('(?<=', '(?<!'), position):
+            # Lookarounds: what they see needn't be part of the match
+            required = False
+            start = position + (3 if kind in ('=', '!') else 4)
+        else:
+            raise _Unsure  # inline flags, comments, conditionals, named backreferences
+    else:
+        start = position + 1
+    alternatives, end = _scan_alternation(source, start, limit)
+    if end >= len(source):
+        raise _Unsure  # no ')'
+    return (alternatives if required else None), end + 1
+
+
+def match_expression(pattern):
+    """FTS5 MATCH expression for the files a compiled pattern can match in, or None if
+    the pattern doesn't pin down any trigram (e.g. '\\w+') and every file is a candidate."""
+    if not isinstance(pattern.pattern, str) or pattern.flags & re.VERBOSE:
+        return None  # whitespace and comments in verbose patterns aren't literal
+    try:
+        alternatives = _required_literals(pattern.pattern)
+    except _Unsure:
+        return None  # a construct the scan doesn't follow; don't narrow
+    clauses = []
+    for alternative in alternatives:
+        trigrams = []
+        for literal in alternative:
+            for i in range(len(literal) - 2):
+                trigram = literal[i:i + 3]
+                if trigram not in trigrams:
+                    trigrams.append(trigram)
+        if not trigrams:
+            return None  # this alternative could match any file
+        if len(trigrams) > MAX_QUERY_TRIGRAMS:
+            # Spread the picks over the literal rather than taking its start
+            step = len(trigrams) / MAX_QUERY_TRIGRAMS
+            trigrams = [trigrams[int(i * step)] for i in range(MAX_QUERY_TRIGRAMS)]
+        clauses.append(' AND '.join('"' + trigram.replace('"', '""') + '"' for trigram in trigrams))
+    return ' OR '.join(f'({clause})' for clause in clauses)
+
+
+def _meta(connection, key):
+    row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else 0
+
+
+def _set_meta(connection, key, value):
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+class _TrigramIndexSignals(QObject):
+    progress = Signal(int, int)  # bytes indexed so far, bytes to index
+    finished = Signal(object, int, str)  # the job's cancel event, files indexed, error
+
+class _TrigramIndexJob(QRunnable):
+    """Brings the trigram index of a root up to date on a thread of TrigramIndex's pool."""
+    def __init__(self, rules, db_path, cancelled, signals):
+        super().__init__()
+        self.rules = rules
+        self.db_path = db_path
+        self.cancelled = cancelled
+        self.signals = signals
+
+    def run(self):
+        indexed = 0
+        error = ""
+        try:
+            connection = _connect(self.db_path)
+            try:
+                indexed = self._update(connection)
+            finally:
+                connection.close()
+        except (OSError, sqlite3.Error) as e:
+            error = str(e)
+        except RuntimeError:
+            return  # a progress report found the index deleted
+        try:
+            self.signals.finished.emit(self.cancelled, indexed, error)
+        except RuntimeError:
+            pass
+
+    def _update(self, connection):
+        live = connection.execute("SELECT count(*) FROM files WHERE doc > 0").fetchone()[0]
+        dead = _meta(connection, 'dead_docs')
+        if dead > max(live, 1000):
+            # Mostly tombstones: start over rather than carry them along
+            with connection:
+                connection.execute("DROP TABLE grams")
+                connection.execute("DELETE FROM files")
+                _set_meta(connection, 'dead_docs', 0)
+            connection.executescript(_SCHEMA)
+
+        on_disk = {}
+        for _, entry in walk_files(self.rules, self.cancelled):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            on_disk[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        if self.cancelled.is_set():
+            return 0
+        known = {path: (size, mtime_ns, doc) for path, size, mtime_ns, doc in
+                 connection.execute("SELECT path, size, mtime_ns, doc FROM files")}
+
+        gone = [path for path in known if path not in on_disk]
+        changed = [path for path, stamp in on_disk.items() if known.get(path, (None, None))[:2] != stamp]
+        dead = _meta(connection, 'dead_docs')
+        with connection:
+            for path in gone:
+                connection.execute("DELETE FROM files WHERE path = ?", (path,))
+                dead += (known[path][2] or 0) > 0
+            _set_meta(connection, 'dead_docs', dead)
+
+        total = sum(on_disk[path][0] for path in changed)
+        done = pending = indexed = 0
+        next_doc = (connection.execute("SELECT max(rowid) FROM grams").fetchone()[0] or 0) + 1
+        for path in changed:
+            if self.cancelled.is_set():
+                break
+            size, mtime_ns = on_disk[path]
+            doc = _NOT_INDEXED
+            if size <= MAX_INDEXED_FILE_BYTES:
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    continue
+                if looks_binary(data[:BINARY_SNIFF_BYTES]):
+                    doc = _BINARY
+                else:
+                    doc = next_doc
+                    next_doc += 1
+                    # Same decoding as textsearch, so the trigrams are those the regex sees
+                    connection.execute("INSERT INTO grams (rowid, body) VALUES (?, ?)",
+                                       (doc, data.decode('utf-8', errors='replace')))
+                    pending += len(data)
+            if (known.get(path, (0, 0, 0))[2] or 0) > 0:
+                dead += 1
+            connection.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, doc) VALUES (?, ?, ?, ?)",
+                               (path, size, mtime_ns, doc))
+            indexed += 1
+            done += size
+            if pending >= COMMIT_EVERY_BYTES:
+                _set_meta(connection, 'dead_docs', dead)
+                connection.commit()
+                pending = 0
+                self.signals.progress.emit(done, total)
+        _set_meta(connection, 'dead_docs', dead)
+        connection.commit()
+        return indexed
+
+
+class TrigramIndex(QObject):
+    """The trigram index of the current project root.
+
+    set_root() opens the root's database and refreshes it in the background;
+    schedule_refresh() asks for another refresh soon, e.g. after the watcher
+    saw files change. candidate_paths() answers from any thread.
+    """
+    progress = Signal(int, int)  # bytes indexed so far, bytes to index
+    indexing_finished = Signal(int)  # files (re-)indexed
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self._rules = None
+        self._ready = False       # a refresh has completed since set_root()
+        self._cancelled = None    # threading.Event of the running refresh
+        self._refresh_again = False
+        self._changed_paths = set()  # known changed and not re-indexed yet
+        self._indexing_changed = set()  # those of them the running refresh will pick up
+        self._changed_lock = threading.Lock()
+        self._signals = _TrigramIndexSignals(self)
+        self._signals.progress.connect(self.progress)
+        self._signals.finished.connect(self._on_job_finished)
+        # Indexing a big tree takes a while; keep it off the global pool
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self._refresh)
+
+    def set_root(self, root):
+        root = os.path.abspath(root)
+        if root == self.root:
+            return
+        self.close()
+        self.root = root
+        self._rules = IgnoreRules(root)
+        self._ready = False
+        self._refresh()
+
+    def close(self):
+        """Stop indexing."""
+        if self._cancelled is not None:
+            self._cancelled.set()
+            self._cancelled = None
+        self._refresh_timer.stop()
+        self._refresh_again = False
+        with self._changed_lock:
+            self._changed_paths.clear()
+
+    def is_ready(self):
+        return self._ready
+
+    def is_indexing(self):
+        return self._cancelled is not None
+
+    def file_changed(self, file_path):
+        """A file was written: searches read it regardless until the index has caught up."""
+        if self.root is None:
+            return
+        with self._changed_lock:
+            self._changed_paths.add(os.path.abspath(file_path))
+        self.schedule_refresh()
+
+    def schedule_refresh(self):
+        if self.root is not None:
+            self._refresh_timer.start(REFRESH_DELAY_MS)
+
+    def candidate_paths(self, pattern):
+        """Absolute paths of the files pattern may match in, or None if the index can't
+        tell (not built yet, or the pattern has no literal part) and all files must be read.
+
+        Opens its own connection, so it can run on the search thread.
+        """
+        if not self._ready:
+            return None
+        expression = match_expression(pattern)
+        if expression is None:
+            return None
+        rules = self._rules
+        try:
+            connection = sqlite3.connect(index_path_for(rules.root), timeout=30)
+            try:
+                paths = [path for path, in connection.execute(
+                    "SELECT path FROM files WHERE doc IN (SELECT rowid FROM grams WHERE grams MATCH ?) "
+                    "OR doc IS NULL", (expression,))]
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            print(f"Trigram index lookup failed: {e}")
+            return None
+        with self._changed_lock:
+            changed = self._changed_paths - set(paths)
+        paths.extend(path for path in changed if os.path.isfile(path))
+        return paths
+
+    def _refresh(self):
+        if self._cancelled is not None:
+            self._refresh_again = True
+            return
+        self._cancelled = threading.Event()
+        with self._changed_lock:
+            self._indexing_changed = set(self._changed_paths)
+        self._pool.start(_TrigramIndexJob(self._rules, index_path_for(self.root),
+                                          self._cancelled, self._signals))
+
+    def _on_job_finished(self, cancelled, indexed, error):
+        if cancelled is not self._cancelled:
+            return  # a refresh that close() has since cancelled
+        self._cancelled = None
+        if error:
+            print(f"Error indexing {self.root}: {error}")
+        else:
+            self._ready = True
+            # What changed before the refresh started is in the index now
+            with self._changed_lock:
+                self._changed_paths -= self._indexing_changed
+        self.indexing_finished.emit(indexed)
+        if self._refresh_again:
+            self._refresh_again = False
+            self._refresh()
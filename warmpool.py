@@ -0,0 +1,115 @@
+"""Pre-started Python interpreters for running scripts without the startup cost.
+
+WarmPythonPool keeps a worker (see warmrun.py) running for the interpreter a
+terminal's `python` starts, with the modules listed in the
+IDE_PRELOAD_MODULES environment variable (comma-separated, e.g.
+"numpy,pandas") imported already. command() gives the terminal command that
+runs a script in a child forked from it, and run_started reports how long it
+took from Run to the script's first line.
+"""
+import os
+import sys
+import shlex
+import shutil
+import tempfile
+import warmrun
+from PySide6.QtCore import QObject, QProcess, Signal
+
+# Modules every worker imports before its first run
+PRELOAD_MODULES = [name.strip() for name in os.environ.get("IDE_PRELOAD_MODULES", "").split(",") if name.strip()]
+# A worker that dies is started again this many times in a row at most
+MAX_RESTARTS = 3
+
+
+def is_supported():
+    """Whether warm runs work here (they need fork() and file descriptor passing)."""
+    return hasattr(os, "fork") and hasattr(os, "setsid") and hasattr(warmrun.socket, "send_fds")
+
+
+class WarmPythonPool(QObject):
+    ready = Signal()                      # a worker has imported its modules and takes runs
+    run_started = Signal(str, float)      # script, seconds from Run until it started
+    failed = Signal(str)                  # the worker couldn't be started, or keeps dying
+
+    def __init__(self, modules=None, parent=None):
+        super().__init__(parent)
+        self.modules = PRELOAD_MODULES if modules is None else modules
+        # The interpreter a terminal runs for `python`: a worker for any other would be turned down
+        self.interpreter = shutil.which("python") or sys.executable
+        self._directory = None  # holds the socket
+        self._process = None
+        self._ready = False
+        self._restarts = 0
+        self._output = b''
+
+    def start(self):
+        """Start the worker (if it isn't running already); ready is emitted once it takes runs."""
+        if self._process is not None or not is_supported():
+            return
+        if self._directory is None:
+            # Private to the user, and short: a socket path can't be much longer than 100 bytes
+            self._directory = tempfile.mkdtemp(prefix="ide-warm-")
+        socket_path = self.socket_path()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self._ready = False
+        self._output = b''
+        self._process = QProcess(self)
+        self._process.setProcessChannelMode(QProcess.ForwardedErrorChannel)
+        self._process.readyReadStandardOutput.connect(self._on_output)
+        self._process.finished.connect(self._on_finished)
+        self._process.errorOccurred.connect(self._on_error)
+        self._process.start(self.interpreter, [os.path.abspath(warmrun.__file__), "serve", socket_path]
+                            + self.modules)
+
+    def shutdown(self):
+        """Stop the worker. Runs in progress carry on; they're processes of their own."""
+        if self._process is not None:
+            process, self._process = self._process, None
+            process.finished.disconnect(self._on_finished)
+            process.kill()
+            process.waitForFinished(1000)
+        self._ready = False
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def is_ready(self):
+        return self._ready
+
+    def socket_path(self):
+        return os.path.join(self._directory, "worker.sock") if self._directory else None
+
+    def command(self, script, since):
+        """The terminal command running script in a warm interpreter; since is time.time() when Run was chosen."""
+        # The client only needs the standard library: no site-packages, nothing from the script's directory
+        return shlex.join(["python", "-I", "-S", os.path.abspath(warmrun.__file__), "run", self.socket_path(),
+                           f"{since:.6f}", script])
+
+    def _on_output(self):
+        self._output += self._process.readAllStandardOutput().data()
+        *lines, self._output = self._output.split(b'\n')
+        for line in lines:
+            words = line.decode('utf-8', errors='replace').split(' ', 2)
+            if words[0] == "ready":
+                self._ready = True
+                self._restarts = 0
+                self.ready.emit()
+            elif words[0] == "started" and len(words) == 3:
+                self.run_started.emit(words[2], float(words[1]))
+
+    def _on_error(self, error):
+        if error == QProcess.FailedToStart:
+            self._process.deleteLater()
+            self._process = None
+            self.failed.emit(f"Could not start {self.interpreter} for warm runs")
+
+    def _on_finished(self, code, status):
+        self._process.deleteLater()
+        self._process = None
+        self._ready = False
+        if self._restarts >= MAX_RESTARTS:
+            self.failed.emit(f"The warm Python worker keeps exiting (code {code})")
+            return
+        self._restarts += 1
+        self.start()
@@ -0,0 +1,245 @@
+"""Running Python scripts in interpreters that have started already.
+
+A worker, started by the IDE (see warmpool.py) as
+
+    python warmrun.py serve SOCKET [MODULE ...]
+
+imports the modules given once, then waits for runs on a Unix socket. For
+each run the terminal executes the client,
+
+    python -I -S warmrun.py run SOCKET SINCE script.py [arguments ...]
+
+which hands the worker its stdin, stdout and stderr (the terminal), working
+directory, environment and arguments. The worker forks, and the child runs
+the script on the terminal with the modules already imported: no interpreter
+startup, no imports paid again, and nothing left behind by earlier runs. The
+client stays in the terminal as the command being run; it passes Ctrl+C and
+the like on to the child and exits with the child's exit code.
+
+The child tells the worker how long after SINCE (a time.time() value, taken
+when Run was chosen) the script started, and the worker prints it for the
+IDE: "started SECONDS SCRIPT" on its stdout.
+
+POSIX only: it needs fork() and passing file descriptors over a socket. When
+there's no worker, or it runs a different interpreter than the client, the
+client just becomes a plain `python script.py`.
+
+This module runs as a script in its own processes, so it must not import Qt.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import struct
+import select
+import runpy
+import traceback
+import importlib
+
+# Signals the client passes on to the script (it gets them as the terminal's foreground command)
+FORWARDED_SIGNALS = ("SIGINT", "SIGTERM", "SIGHUP", "SIGQUIT", "SIGWINCH", "SIGUSR1", "SIGUSR2")
+_LENGTH = struct.Struct('!I')
+
+
+def _interpreter():
+    """What a run needs to match to be served by a worker: the interpreter (a venv's has a path of its own)."""
+    # Not sys.prefix: the client runs without site, which is what sets it for a venv
+    return [sys.executable, sys.version]
+
+
+def _receive_request(connection):
+    """(request, [stdin, stdout, stderr]) sent by a client."""
+    data, fds, _, _ = socket.recv_fds(connection, 65536, 3)
+    if len(data) < _LENGTH.size or len(fds) != 3:
+        for fd in fds:
+            os.close(fd)
+        raise ValueError("incomplete request")
+    length, = _LENGTH.unpack_from(data)
+    data = data[_LENGTH.size:]
+    while len(data) < length:
+        more = connection.recv(length - len(data))
+        if not more:
+            break
+        data += more
+    return json.loads(data), fds
+
+
+def _send(connection, message):
+    try:
+        connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+    except OSError:
+        pass  # the client is gone (killed along with its terminal)
+
+
+def _exit_code(status):
+    # Like a shell: 128 + N for a child killed by signal N
+    return os.waitstatus_to_exitcode(status) if not os.WIFSIGNALED(status) else 128 + os.WTERMSIG(status)
+
+
+def serve(socket_path, modules):
+    """Import modules, then fork a child for every run; returns (in the child) the request to run."""
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            print(f"warmrun: could not preload {module}:", file=sys.stderr)
+            traceback.print_exc()
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(16)
+    report = os.dup(1)  # stdout, read by the IDE; children get the terminal instead
+    # Woken up by children exiting, to pass their exit codes on
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_write, False)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGCHLD, lambda number, frame: None)
+    clients = {}  # pid of a running child: connection to its client
+    os.write(report, b"ready\n")
+
+    while True:
+        try:
+            readable, _, _ = select.select([listener, wakeup_read], [], [])
+        except InterruptedError:
+            continue
+        if wakeup_read in readable:
+            os.read(wakeup_read, 4096)
+            while clients:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if not pid:
+                    break
+                connection = clients.pop(pid, None)
+                if connection is not None:
+                    _send(connection, {"exit": _exit_code(status)})
+                    connection.close()
+        if listener not in readable:
+            continue
+        connection, _ = listener.accept()
+        try:
+            request, fds = _receive_request(connection)
+        except (OSError, ValueError):
+            connection.close()
+            continue
+        if request.get("interpreter") != _interpreter():
+            _send(connection, {"cold": True})
+            connection.close()
+            for fd in fds:
+                os.close(fd)
+            continue
+        pid = os.fork()
+        if pid == 0:
+            # The child: drop the worker's side of things and become the run
+            signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            for fd in (wakeup_read, wakeup_write):
+                os.close(fd)
+            listener.close()
+            connection.close()
+            for other in clients.values():
+                other.close()
+            _start_child(request, fds, report)
+            return request
+        for fd in fds:
+            os.close(fd)
+        clients[pid] = connection
+        _send(connection, {"pid": pid})
+
+
+def _start_child(request, fds, report):
+    """Set the forked child up like a fresh `python script.py` started on the client's terminal."""
+    os.setsid()  # its own process group, out of reach of signals meant for the worker
+    signal.signal(signal.SIGINT, signal.default_int_handler)  # Ctrl+C raises KeyboardInterrupt
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    # Streams as the interpreter would have made them for the terminal: line buffered if interactive
+    sys.stdin = open(0, 'r', closefd=False)
+    sys.stdout = open(1, 'w', buffering=1 if os.isatty(1) else -1, closefd=False)
+    sys.stderr = open(2, 'w', buffering=1, closefd=False)
+    script = request["argv"][0]
+    sys.argv = request["argv"]
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+    started = time.time() - request["since"]
+    os.write(report, f"started {started:.6f} {script}\n".encode('utf-8', errors='replace'))
+    os.close(report)
+
+
+def _run_script(script):
+    """Run script as __main__ like the interpreter would; its exit code."""
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException:
+        # Without the frames of warmrun and runpy, as a cold run would show it
+        kind, value, tb = sys.exc_info()
+        while tb is not None and tb.tb_frame.f_code.co_filename != os.path.abspath(script) and \
+                tb.tb_frame.f_code.co_filename != script:
+            tb = tb.tb_next
+        traceback.print_exception(kind, value, tb)
+        return 130 if kind is KeyboardInterrupt else 1
+    return 0
+
+
+def _run_cold(argv):
+    """Run argv as a plain `python script.py ...`, replacing this process."""
+    os.execv(sys.executable, [sys.executable] + argv)
+
+
+def client(socket_path, since, argv):
+    """Have the worker at socket_path run argv ([script, arguments...]) on this terminal; its exit code."""
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        _run_cold(argv)  # no worker (any more)
+    request = json.dumps({"interpreter": _interpreter(), "since": since, "cwd": os.getcwd(),
+                          "env": dict(os.environ), "argv": argv}).encode('utf-8')
+    socket.send_fds(connection, [_LENGTH.pack(len(request)) + request], [0, 1, 2])
+    replies = connection.makefile('rb')
+    reply = json.loads(replies.readline() or b'{"cold": true}')
+    if "pid" not in reply:
+        _run_cold(argv)  # a different interpreter (another venv active in this shell)
+    pid = reply["pid"]
+
+    def forward(number, frame):
+        try:
+            os.kill(pid, number)
+        except ProcessLookupError:
+            pass
+    for name in FORWARDED_SIGNALS:
+        signal.signal(getattr(signal, name), forward)
+    signal.signal(signal.SIGTSTP, signal.SIG_IGN)  # can't be stopped halfway
+
+    line = replies.readline()  # retried after the signals above, see PEP 475
+    if not line:
+        return 1  # the worker went away
+    return json.loads(line).get("exit", 1)
+
+
+def main(argv):
+    if len(argv) >= 2 and argv[0] == "serve":
+        request = serve(argv[1], argv[2:])
+        # Only the forked children get here
+        return _run_script(request["argv"][0])
+    if len(argv) >= 4 and argv[0] == "run":
+        return client(argv[1], float(argv[2]), argv[3:])
+    print("usage: warmrun.py serve SOCKET [MODULE ...] | run SOCKET SINCE script.py [arguments ...]",
+          file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))